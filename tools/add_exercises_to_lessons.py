@@ -5,18 +5,11 @@ It purposefully uses templated SQL answers so it's safe and non-destructive.
 
 Usage: python tools/add_exercises_to_lessons.py
 """
-import json, glob, os
-ROOT = os.path.dirname(os.path.dirname(__file__))
-EXAMPLES = os.path.join(ROOT, 'examples')
-files = sorted(glob.glob(os.path.join(EXAMPLES, '*.json')))
-count = 0
-for p in files:
-    with open(p,'r') as f:
-        try:
-            j = json.load(f)
-        except Exception as e:
-            print('SKIP (parse error):', p, e)
-            continue
+import lesson_corpus
+
+
+def add_exercises(j):
+    """Add templated exercises and the description note to lesson data `j`; returns True if modified."""
     modified = False
     if 'exercises' not in j:
         # templated exercises
@@ -38,9 +31,20 @@ for p in files:
     if isinstance(j.get('description',''), str) and 'Exercises added' not in j.get('description'):
         j['description'] = j.get('description','').rstrip() + ' Exercises added in the `exercises` field with templated answers.'
         modified = True
-    if modified:
-        with open(p,'w') as f:
-            json.dump(j, f, indent=2, ensure_ascii=False)
-        count += 1
-        print('Updated', p)
-print('Updated', count, 'files')
+    return modified
+
+
+def main():
+    corpus = lesson_corpus.load()
+    for p, e in corpus.errors:
+        print('SKIP (parse error):', p, e)
+    count = 0
+    for lesson in corpus:
+        if add_exercises(lesson.data) and lesson_corpus.write_lesson(lesson.path, lesson.data):
+            count += 1
+            print('Updated', lesson.path)
+    print('Updated', count, 'files')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+Run the lesson corpus as a benchmark suite at growing data volumes.
+
+The lesson tables hold a handful of hand-typed rows. For every scale N this tool opens a
+fresh in-memory DuckDB connection per lesson, runs the lesson's setup examples
+(Lesson.setup_count), and then inflates every table the setup created to N rows:
+
+  - tables with seed rows are extended by cycling through those rows, so values, CHECK
+    constraints and foreign-key references stay realistic; PRIMARY KEY / UNIQUE columns get
+    fresh values instead (max + i for numbers and dates, '<value>#i' for strings)
+  - empty tables are filled from range(N) with a per-type generator cast to the declared type
+
+The remaining examples are then executed statement by statement and timed. The report shows
+each example's latency and throughput (table rows / second) at every scale, plus its growth
+exponent between the two largest scales that took at least --min-ms: ~1 is linear, ~2 is
+quadratic. Examples whose exponent exceeds --superlinear are flagged.
+
+Each example is bounded by --timeout; an example that times out is not run at larger scales.
+
+Usage:
+    pipenv run python tools/benchmark_lessons.py --lesson joins --lesson window
+    pipenv run python tools/benchmark_lessons.py --scale 1000 --scale 100000 --json .cache/bench.json
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+import duckdb
+
+import lesson_corpus
+import sql_statements
+
+DEFAULT_SCALES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+TABLES_SQL = """
+SELECT c.schema_name, c.table_name, c.column_name, c.data_type,
+       EXISTS (
+           SELECT 1 FROM duckdb_constraints() k
+           WHERE k.database_name = c.database_name AND k.schema_name = c.schema_name
+             AND k.table_name = c.table_name AND k.constraint_type IN ('PRIMARY KEY', 'UNIQUE')
+             AND list_contains(k.constraint_column_names, c.column_name)
+       ) AS is_key
+FROM duckdb_columns() c
+JOIN duckdb_tables() t USING (database_name, schema_name, table_name)
+WHERE c.database_name = current_database() AND NOT c.internal AND NOT t.temporary
+ORDER BY c.schema_name, c.table_name, c.column_index
+"""
+
+INTEGER_TYPES = ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT', 'USMALLINT', 'UINTEGER', 'UBIGINT', 'UHUGEINT')
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def type_class(type_name):
+    t = type_name.upper()
+    if t in INTEGER_TYPES:
+        return 'integer'
+    if t.startswith(('DECIMAL', 'DOUBLE', 'FLOAT', 'REAL')):
+        return 'number'
+    if t == 'VARCHAR':
+        return 'string'
+    if t == 'DATE':
+        return 'date'
+    if t.startswith('TIMESTAMP'):
+        return 'timestamp'
+    if t == 'BOOLEAN':
+        return 'boolean'
+    if t == 'UUID':
+        return 'uuid'
+    return None
+
+
+def generated_value(col, type_name, i='r.__i'):
+    """Synthetic value for row `i` of an empty table."""
+    kind = type_class(type_name)
+    if kind == 'integer':
+        expr = f'{i} + 1'
+    elif kind == 'number':
+        expr = f'({i} % 100000) / 100.0'
+    elif kind == 'string':
+        expr = f"'{col}_' || {i}"
+    elif kind == 'date':
+        expr = f"DATE '2024-01-01' + ({i} % 3650)::INTEGER"
+    elif kind == 'timestamp':
+        expr = f"TIMESTAMP '2024-01-01' + to_seconds({i})"
+    elif kind == 'boolean':
+        expr = f'{i} % 2 = 0'
+    elif kind == 'uuid':
+        expr = 'gen_random_uuid()'
+    else:
+        expr = 'NULL'
+    return f'({expr})::{type_name}'
+
+
+def cycled_value(table, col, type_name, is_key, i='r.__i'):
+    """Value for row `i` when extending a table by cycling through its seed rows `s`."""
+    c = quote(col)
+    if not is_key:
+        return f's.{c}'
+    kind = type_class(type_name)
+    if kind in ('integer', 'number'):
+        expr = f'coalesce((SELECT max({c}) FROM {table}), 0) + {i} + 1'
+    elif kind == 'string':
+        expr = f"s.{c} || '#' || {i}"
+    elif kind == 'date':
+        expr = f'coalesce((SELECT max({c}) FROM {table}), DATE \'2024-01-01\') + ({i} + 1)::INTEGER'
+    elif kind == 'timestamp':
+        expr = f"coalesce((SELECT max({c}) FROM {table}), TIMESTAMP '2024-01-01') + to_seconds({i} + 1)"
+    elif kind == 'uuid':
+        expr = 'gen_random_uuid()'
+    else:
+        return f's.{c}'
+    return f'({expr})::{type_name}'
+
+
+def inflate(con, rows):
+    """Grow every table in the current database to `rows` rows; returns {table: error} for failures."""
+    tables = {}
+    for schema, table, col, type_name, is_key in con.execute(TABLES_SQL).fetchall():
+        tables.setdefault(f'{quote(schema)}.{quote(table)}', []).append((col, type_name, is_key))
+    errors = {}
+    for table, cols in tables.items():
+        seed = con.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+        need = rows - seed
+        if need <= 0:
+            continue
+        names = ', '.join(quote(c) for c, _, _ in cols)
+        if seed:
+            exprs = ', '.join(cycled_value(table, c, t, k) for c, t, k in cols)
+            sql = (f'INSERT INTO {table} ({names}) SELECT {exprs} FROM range({need}) AS r(__i) '
+                   f'JOIN (SELECT *, row_number() OVER () - 1 AS __rn FROM {table}) AS s ON s.__rn = r.__i % {seed}')
+        else:
+            exprs = ', '.join(generated_value(c, t) for c, t, _ in cols)
+            sql = f'INSERT INTO {table} ({names}) SELECT {exprs} FROM range({need}) AS r(__i)'
+        try:
+            con.execute(sql)
+        except Exception as e:
+            errors[table] = str(e)
+    return errors
+
+
+def timed_execute(con, sql, timeout):
+    """Execute every statement of `sql`; returns (status, ms, error). Interrupted after `timeout` s."""
+    timer = threading.Timer(timeout, con.interrupt) if timeout else None
+    if timer:
+        timer.start()
+    t0 = time.perf_counter()
+    try:
+        for stmt in sql_statements.split_statements(sql):
+            con.execute(stmt)
+    except Exception as e:
+        ms = (time.perf_counter() - t0) * 1000.0
+        if timer and not timer.is_alive():
+            return 'timeout', ms, f'interrupted after {timeout:g}s'
+        return 'error', ms, str(e)
+    finally:
+        if timer:
+            timer.cancel()
+    return 'ok', (time.perf_counter() - t0) * 1000.0, None
+
+
+def prepare_lesson(con, lesson, rows):
+    """Run the lesson's setup on `con` and inflate its tables to `rows` (0 keeps the seed data).
+
+    Returns (setup_error, inflate_errors); setup_error is None when the setup succeeded.
+    """
+    for _, _, ex in lesson.examples[:lesson.setup_count]:
+        status, _, err = timed_execute(con, ex.get('sql', ''), None)
+        if status != 'ok':
+            return f"{ex.get('name')}: {err}", {}
+    return None, inflate(con, rows) if rows else {}
+
+
+def bench_lesson(lesson, rows, timeout=None, threads=None, skip=()):
+    """Run `lesson` at `rows` rows per table; returns {'inflate_errors': .., 'examples': {name: result}}."""
+    con = duckdb.connect()
+    if threads:
+        con.execute(f'PRAGMA threads={int(threads)}')
+    out = {'inflate_errors': {}, 'examples': {}}
+    try:
+        t0 = time.perf_counter()
+        setup_error, out['inflate_errors'] = prepare_lesson(con, lesson, rows)
+        if setup_error:
+            out['setup_error'] = setup_error
+            return out
+        out['prepare_ms'] = (time.perf_counter() - t0) * 1000.0
+        for _, _, ex in lesson.examples[lesson.setup_count:]:
+            name = ex.get('name', '<unnamed>')
+            if not ex.get('sql', '').strip():
+                continue
+            if name in skip:
+                out['examples'][name] = {'status': 'skipped', 'ms': None, 'error': None}
+                continue
+            status, ms, err = timed_execute(con, ex['sql'], timeout)
+            out['examples'][name] = {'status': status, 'ms': ms, 'error': err}
+    finally:
+        con.close()
+    return out
+
+
+def growth_exponent(points, min_ms):
+    """log-log slope of latency against scale between the two largest scales above `min_ms`."""
+    pts = [(n, ms) for n, ms in points if ms is not None and ms >= min_ms]
+    if len(pts) < 2:
+        return None
+    (n1, t1), (n2, t2) = pts[-2], pts[-1]
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+
+def run(lessons, scales, timeout=None, threads=None, min_ms=1.0, superlinear=1.5, progress=None):
+    report = []
+    for lesson in lessons:
+        per_scale = {}
+        timed_out = set()
+        for rows in scales:
+            if progress:
+                progress(lesson, rows)
+            r = bench_lesson(lesson, rows, timeout=timeout, threads=threads, skip=timed_out)
+            per_scale[rows] = r
+            timed_out.update(name for name, e in r['examples'].items() if e['status'] == 'timeout')
+            if 'setup_error' in r:
+                break
+        names = []
+        for r in per_scale.values():
+            names.extend(n for n in r['examples'] if n not in names)
+        examples = []
+        for name in names:
+            points = []
+            timings = {}
+            for rows, r in per_scale.items():
+                e = r['examples'].get(name)
+                if e is None:
+                    continue
+                timings[rows] = e
+                if e['status'] == 'ok':
+                    points.append((rows, e['ms']))
+                    e['rows_per_s'] = rows / (e['ms'] / 1000.0) if e['ms'] else None
+            exp = growth_exponent(points, min_ms)
+            examples.append({
+                'name': name,
+                'timings': timings,
+                'exponent': exp,
+                'superlinear': exp is not None and exp > superlinear,
+            })
+        report.append({
+            'lesson': lesson.name,
+            'scales': list(per_scale),
+            'setup_error': next((r['setup_error'] for r in per_scale.values() if 'setup_error' in r), None),
+            'inflate_errors': {rows: r['inflate_errors'] for rows, r in per_scale.items() if r['inflate_errors']},
+            'prepare_ms': {rows: r.get('prepare_ms') for rows, r in per_scale.items()},
+            'examples': examples,
+        })
+    return report
+
+
+def fmt_scale(n):
+    exp = math.log10(n)
+    return f'1e{exp:.0f}' if exp.is_integer() else str(n)
+
+
+def print_report(report, scales):
+    head = ''.join(f'{fmt_scale(n) + " ms":>12}' for n in scales)
+    for les in report:
+        print(f"\nLESSON: {les['lesson']}")
+        if les['setup_error']:
+            print(f"  setup failed: {les['setup_error']}")
+            continue
+        for rows, errs in les['inflate_errors'].items():
+            for table, err in errs.items():
+                print(f'  could not inflate {table} to {fmt_scale(rows)} rows: {err}')
+        print(f"  {'example':<40}{head}{'rows/s @max':>14}{'exp':>7}")
+        for e in les['examples']:
+            cells = ''
+            best = None
+            for n in scales:
+                t = e['timings'].get(n)
+                if t is None:
+                    cells += f'{"":>12}'
+                elif t['status'] == 'ok':
+                    cells += f"{t['ms']:12.2f}"
+                    best = t
+                else:
+                    cells += f"{t['status']:>12}"
+            rps = f"{best['rows_per_s']:14.3g}" if best and best.get('rows_per_s') else f'{"-":>14}'
+            exp = f"{e['exponent']:7.2f}" if e['exponent'] is not None else f'{"-":>7}'
+            flag = '  SUPERLINEAR' if e['superlinear'] else ''
+            print(f"  {e['name'][:39]:<40}{cells}{rps}{exp}{flag}")
+    flagged = [(les['lesson'], e) for les in report for e in les['examples'] if e['superlinear']]
+    print(f'\nSuperlinear examples: {len(flagged)}')
+    for lesson, e in sorted(flagged, key=lambda t: t[1]['exponent'], reverse=True):
+        print(f"  {e['exponent']:5.2f}  {lesson}:{e['name']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the lesson examples with their tables inflated to N rows')
+    parser.add_argument('--scale', type=int, action='append', metavar='N', help='Rows per table; repeat for several scales (default: 1e3 1e4 1e5 1e6 1e7)')
+    parser.add_argument('--lesson', action='append', metavar='NAME', help='Only benchmark these lessons (default: all)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds before an example is interrupted (default: 30, 0 disables)')
+    parser.add_argument('--threads', type=int, default=None, help='DuckDB threads (default: DuckDB default)')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='Ignore timings below this when computing growth exponents (default: 1)')
+    parser.add_argument('--superlinear', type=float, default=1.5, help='Flag examples whose growth exponent exceeds this (default: 1.5)')
+    parser.add_argument('--json', metavar='PATH', default=None, help='Also write the report as JSON to PATH')
+    args = parser.parse_args(argv)
+    scales = sorted(set(args.scale or DEFAULT_SCALES))
+    if scales[0] < 1:
+        parser.error('--scale must be >= 1')
+
+    corpus = lesson_corpus.load()
+    lessons = list(corpus)
+    if args.lesson:
+        missing = [n for n in args.lesson if n not in corpus.lessons]
+        if missing:
+            parser.error('unknown lesson(s): ' + ', '.join(missing))
+        lessons = [corpus.lessons[n] for n in args.lesson]
+
+    def progress(lesson, rows):
+        print(f'  {lesson.name} @ {fmt_scale(rows)} rows ...', file=sys.stderr)
+
+    report = run(lessons, scales, timeout=args.timeout or None, threads=args.threads, min_ms=args.min_ms, superlinear=args.superlinear, progress=progress)
+    print_report(report, scales)
+    if args.json:
+        d = os.path.dirname(args.json)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({'duckdb_version': duckdb.__version__, 'scales': scales, 'lessons': report}, f, indent=2, default=str)
+        print(f'\nReport written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
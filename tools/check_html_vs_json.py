@@ -1,81 +1,47 @@
 """
 Compare headings in examples/*.html with sections/examples in examples/*.json.
-Usage: python3 tools/check_html_vs_json.py
+Usage: python3 tools/check_html_vs_json.py [--threshold 0.8] [--html-dir DIR]
 
-Reports per-file missing headings.
+A heading counts as covered when the closest JSON topic (section title, example name,
+description or nerd_notes) scores at least --threshold on character-trigram similarity;
+--threshold 1 restores exact matching. Reports per-file missing headings together with
+the closest existing topic and its score.
 """
-import re
-import json
-from pathlib import Path
+import argparse
 
-BASE = Path(__file__).resolve().parent.parent
-EX_DIR = BASE / 'examples'
-
-heading_re = re.compile(r'<h([1-6])[^>]*>(.*?)</h\1>', re.IGNORECASE|re.DOTALL)
-strip_tags = re.compile(r'<[^>]+>')
-
-
-def extract_headings(html_text):
-    hs = []
-    for m in heading_re.finditer(html_text):
-        txt = m.group(2)
-        txt = strip_tags.sub('', txt).strip()
-        if txt:
-            hs.append(txt)
-    return hs
-
-
-def normalize(s):
-    return re.sub(r'\s+', ' ', s.strip().lower())
-
-
-def json_topics(jsdata):
-    topics = set()
-    # section titles
-    for sec in jsdata.get('sections', []):
-        if 'title' in sec:
-            topics.add(normalize(sec['title']))
-        # examples: name + description
-        for ex in sec.get('examples', []):
-            if 'name' in ex:
-                topics.add(normalize(ex['name']))
-            if 'description' in ex:
-                topics.add(normalize(ex['description']))
-            if 'nerd_notes' in ex:
-                topics.add(normalize(ex['nerd_notes']))
-    # top-level fields
-    if 'title' in jsdata:
-        topics.add(normalize(jsdata['title']))
-    if 'description' in jsdata:
-        topics.add(normalize(jsdata['description']))
-    return topics
+from lesson_corpus import EXAMPLES_DIR, load, normalize
 
 
 def main():
-    html_files = sorted(EX_DIR.glob('*.html'))
-    json_files = {p.stem: p for p in sorted(EX_DIR.glob('*.json'))}
+    ap = argparse.ArgumentParser(description='Report HTML headings that have no matching topic in the lesson JSON')
+    ap.add_argument('--threshold', type=float, default=0.8, help='Minimum similarity (0-1) for a heading to count as covered (default: 0.8)')
+    ap.add_argument('--html-dir', default=str(EXAMPLES_DIR), help='Directory holding the <lesson>.html pages (default: examples/)')
+    args = ap.parse_args()
+
+    corpus = load(html_dir=args.html_dir)
     total_missing = 0
-    for h in html_files:
-        name = h.stem
-        html_text = h.read_text(errors='replace')
-        headings = extract_headings(html_text)
+    for name, page in corpus.pages.items():
+        headings = page.headings
         norm_headings = [normalize(x) for x in headings]
-        jf = json_files.get(name)
-        if not jf:
+        lesson = corpus.lessons.get(name)
+        if not lesson:
             print(f'NO JSON: {name}.html -> missing json file {name}.json')
             total_missing += len(norm_headings)
             continue
-        jsdata = json.loads(jf.read_text())
-        jtopics = json_topics(jsdata)
+        index = lesson.topic_index
         missing = []
-        for hh,nh in zip(headings,norm_headings):
-            if nh not in jtopics:
-                missing.append(hh)
+        for hh in headings:
+            topic, score = index.closest(hh)
+            if score < args.threshold:
+                missing.append((hh, topic, score))
         if missing:
             total_missing += len(missing)
             print(f'--- {name}.html -> {name}.json: MISSING {len(missing)} topics ---')
-            for m in missing:
-                print('  *', m)
+            for m, topic, score in missing:
+                if topic:
+                    print(f'  * {m}  (closest: {topic[:60]!r} score={score:.2f})')
+                else:
+                    print('  *', m)
         else:
             print(f'+++ {name}.html -> {name}.json: all headings covered')
     print('\nSummary: total missing headings across files:', total_missing)
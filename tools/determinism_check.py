@@ -0,0 +1,343 @@
+"""
+Nondeterminism detector for the lesson examples.
+
+The validator pins `PRAGMA threads=1` so that every run returns the same rows in the same order
+and `sample_row` does not flap. This checker finds the examples that would flap with more
+threads, so the rest of the corpus can run in parallel (validate_duckdb_examples.py --threads).
+
+Every lesson is replayed on a fresh connection as in the validator. For each example whose last
+statement is a query, that query is first run several extra times against the state just before
+it, and each result is streamed through result_fingerprint.fingerprints() into an order-aware and
+an order-insensitive hash:
+
+  - twice with threads=1 on the unchanged tables (the validator's result)
+  - --repeat times per --threads value on the unchanged tables
+  - --repeat times per thread count (1 and --threads) with every table copied in random row
+    order into a scratch catalog that shadows the lesson's (views are re-created on top of the
+    copies); queries that list the catalog (see tools/example_deps.py) skip these runs
+
+The lesson tables are far too small for DuckDB to split them across threads, so the shuffled
+copies stand in for what parallel scans, joins and aggregations do on real data: rows reach the
+query in a different order. Verdicts:
+
+    stable      every run returned the same rows in the same order
+    order       the same rows, but in a different order (no total ORDER BY): sample_row flaps
+    rows        different rows (LIMIT over ties, first()/any_value(), ...)
+    volatile    the two plain threads=1 runs already differ (now(), random(), ...)
+    unchecked   the query failed on the shuffled copies, so only the plain runs were compared
+    error       the example fails in the validator as well
+    no_result   the example ends in a statement that neither returns nor writes rows
+    writes      the example writes rows that could not be compared (see below)
+
+An example ending in INSERT, UPDATE, DELETE or CREATE TABLE ... AS has no result of its own,
+but later examples read what it wrote. Its runs execute that statement inside a transaction
+that is rolled back and fingerprint the target table instead, so it gets one of the verdicts
+above. A rollback does not rewind sequences, so in a lesson that has any, and when the runs
+cannot open a transaction (the lesson left one open), the write is not replayed: `writes`.
+
+Examples can also be marked `"volatile": true` in their lesson JSON (volatile_keys()); --fingerprint
+and the run history's flaky list leave volatile examples out.
+
+--write records the verdicts in examples/expected/determinism.json, keyed like the fingerprints
+(`<lesson>:<example>`) with a hash of the example's SQL. validate_duckdb_examples.py --threads N
+runs examples recorded as stable, and examples that neither return nor write rows, on N
+threads and everything else, including edited examples, on one; check with the thread counts
+the validator will use.
+Requires pyarrow.
+
+Usage:
+    python tools/determinism_check.py                          # check every lesson
+    python tools/determinism_check.py --lesson window --threads 2 --threads 8 --repeat 5
+    python tools/determinism_check.py --write                  # record verdicts for --threads
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import duckdb
+
+import example_deps
+import lesson_corpus
+import parquet_fixtures
+import plan_store
+import result_fingerprint
+import sql_statements
+import validate_duckdb_examples as validator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_PATH = os.path.join(ROOT, 'examples', 'expected', 'determinism.json')
+SHUFFLE_DB = 'determinism_shuffle'
+
+# examples with these verdicts give the same report at any thread count
+PARALLEL_SAFE = ('stable', 'no_result')
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+limit_re = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+
+def default_threads():
+    return sorted({2, 4, os.cpu_count() or 1} - {1})
+
+
+def shuffle(con):
+    """Shadow every table of the current database with a copy in random row order."""
+    catalog = con.execute('SELECT current_database()').fetchone()[0]
+    con.execute(f"ATTACH ':memory:' AS {SHUFFLE_DB}")
+    tables = con.execute('SELECT schema_name, table_name FROM duckdb_tables() WHERE database_name = ? AND NOT temporary', [catalog]).fetchall()
+    for schema, table in tables:
+        con.execute(f'CREATE SCHEMA IF NOT EXISTS {SHUFFLE_DB}."{schema}"')
+        con.execute(f'CREATE TABLE {SHUFFLE_DB}."{schema}"."{table}" AS SELECT * FROM "{catalog}"."{schema}"."{table}" ORDER BY random()')
+    views = con.execute('SELECT sql FROM duckdb_views() WHERE database_name = ? AND NOT internal AND NOT temporary', [catalog]).fetchall()
+    con.execute(f'USE {SHUFFLE_DB}')
+    # macros, sequences and types are only found in the lesson's own catalog
+    con.execute(f"SET search_path = '{SHUFFLE_DB}.main,{catalog}.main'")
+    for (sql,) in views:
+        try:
+            con.execute(sql)
+        except duckdb.Error:
+            pass
+    return catalog
+
+
+def unshuffle(con, catalog):
+    con.execute(f'USE "{catalog}"')
+    con.execute('RESET search_path')
+    con.execute(f'DETACH {SHUFFLE_DB}')
+
+
+def written_table(stmt):
+    """Quoted name of the table whose rows `stmt` writes (INSERT, UPDATE, DELETE, CREATE TABLE
+    ... AS), or None."""
+    sc = example_deps.Scanner(stmt)
+    head = sc.word()
+    sc.i += 1
+    if head in WRITES:
+        if head == 'INSERT':
+            sc.accept('OR') and sc.accept('REPLACE', 'IGNORE')
+            sc.accept('INTO')
+        elif head == 'DELETE':
+            sc.accept('FROM')
+        parts = sc.name()
+    elif head == 'CREATE':
+        sc.accept('OR') and sc.accept('REPLACE')
+        while sc.accept('TEMP', 'TEMPORARY'):
+            pass
+        if not sc.accept('TABLE'):
+            return None
+        sc.accept('IF') and sc.accept('NOT') and sc.accept('EXISTS')
+        parts = sc.name()
+        if not sc.accept('AS'):
+            return None
+    else:
+        return None
+    return '.'.join('"' + p.replace('"', '""') + '"' for p in parts) if parts else None
+
+
+def probe(con, stmt, threads=1, shuffled=False, timeout=None, table=None):
+    """(rows, ordered hash, unordered hash) of query `stmt`, or None when it fails.
+
+    With `table` (see written_table) `stmt` writes it instead: it runs in a transaction that is
+    rolled back, and the hashes are those of the table's rows after it.
+    """
+    con.execute(f'SET threads={threads}')
+    catalog = None
+    began = False
+    try:
+        if shuffled:
+            catalog = shuffle(con)
+        if table:
+            con.execute('BEGIN')
+            began = True
+        with validator.Watchdog(con, timeout):
+            res = con.execute(stmt)
+            if table:
+                res = con.execute(f'SELECT * FROM {table}')
+            return result_fingerprint.fingerprints(res)[:3]
+    except duckdb.Error:
+        return None
+    finally:
+        if began:
+            con.execute('ROLLBACK')
+        if catalog is None and shuffled:
+            # the scratch catalog may be half built
+            con.execute(f'DETACH DATABASE IF EXISTS {SHUFFLE_DB}')
+        elif catalog is not None:
+            unshuffle(con, catalog)
+        con.execute('SET threads=1')
+
+
+def classify(base, again, runs):
+    """Verdict from the plain threads=1 results and the (label, result) pairs of the other runs."""
+    if again != base:
+        return 'volatile'
+    results = [r for _, r in runs if r is not None]
+    if any(r[2] != base[2] for r in results):
+        return 'rows'
+    if any(r[1] != base[1] for r in results):
+        return 'order'
+    if any(r is None for label, r in runs if label.startswith('shuffled')):
+        return 'unchecked'
+    return 'stable'
+
+
+def hint(stmt, verdict):
+    if verdict == 'order':
+        if result_fingerprint.has_top_level_order_by(stmt):
+            return 'ORDER BY leaves ties'
+        return 'no top-level ORDER BY'
+    if verdict == 'rows' and limit_re.search(stmt):
+        return 'LIMIT over ties or unordered rows'
+    return ''
+
+
+def check_lesson(lesson, threads, repeat, search_path=None, timeout=None):
+    """Replay `lesson` and return [{'key', 'name', 'verdict', 'hint', 'differs'}] per example."""
+    con = validator.connect(search_path=search_path)
+    out = []
+    keys = list(validator.example_keys(lesson))
+    try:
+        for (key, sql_key), (_, _, ex) in zip(keys, lesson.examples):
+            stmts = sql_statements.split_statements(ex.get('sql', ''))
+            entry = {'key': key, 'sql': sql_key, 'name': ex.get('name', '<unnamed>'), 'verdict': 'no_result', 'hint': '', 'differs': []}
+            out.append(entry)
+            try:
+                for stmt in stmts[:-1]:
+                    with validator.Watchdog(con, timeout):
+                        con.execute(stmt)
+            except duckdb.Error:
+                entry['verdict'] = 'error'
+                continue
+            last = stmts[-1] if stmts else None
+            table = written_table(last) if last and not plan_store.is_query(last) else None
+            if table and con.execute('SELECT count(*) FROM duckdb_sequences()').fetchone()[0]:
+                entry['verdict'] = 'writes'
+            elif last and (table or plan_store.is_query(last)):
+                base = probe(con, last, timeout=timeout, table=table)
+                if base is None:
+                    entry['verdict'] = 'writes' if table else 'error'
+                else:
+                    again = probe(con, last, timeout=timeout, table=table)
+                    runs = [(f'threads={t} #{r + 1}', probe(con, last, t, timeout=timeout, table=table)) for t in threads for r in range(repeat)]
+                    # catalog listings would see the scratch catalog itself
+                    if not any(op == 'catalog' for op, _ in example_deps.analyze(last)):
+                        runs += [(f'shuffled threads={t} #{r + 1}', probe(con, last, t, shuffled=True, timeout=timeout, table=table))
+                                 for t in [1] + threads for r in range(repeat)]
+                    entry['verdict'] = classify(base, again, runs)
+                    entry['hint'] = hint(last, entry['verdict'])
+                    entry['differs'] = [label for label, r in runs if r is not None and r != base]
+            if last:
+                # the example's own run, so the next examples see the state they see in the validator
+                try:
+                    with validator.Watchdog(con, timeout):
+                        res = con.execute(last)
+                        if res.description is not None:
+                            for _ in result_fingerprint.arrow_reader(res):
+                                pass
+                except duckdb.Error:
+                    entry['verdict'] = 'error'
+    finally:
+        con.close()
+    return out
+
+
+def load_store(path=STORE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_store(results, path=STORE_PATH):
+    """Merge the verdicts of `results` (check_lesson() entries) into the store at `path`."""
+    entries = load_store(path)
+    for entry in results:
+        entries[entry['key']] = {'sql': entry['sql'], 'verdict': entry['verdict']}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(dict(sorted(entries.items())), f, indent=2)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def pinned_examples(lessons, path=STORE_PATH):
+    """{lesson name: example indexes} that must stay on one thread: every example not recorded
+    as PARALLEL_SAFE for its current SQL."""
+    entries = load_store(path)
+    pinned = {}
+    for les in lessons:
+        for idx, (key, sql_key) in enumerate(validator.example_keys(les)):
+            entry = entries.get(key)
+            if entry is None or entry.get('sql') != sql_key or entry.get('verdict') not in PARALLEL_SAFE:
+                pinned.setdefault(les.name, set()).add(idx)
+    return pinned
+
+
+def volatile_keys(lessons, path=STORE_PATH):
+    """Store keys of the examples whose results change from run to run (now(), random(), ...):
+    those marked `"volatile": true` in their lesson and those recorded as volatile for their
+    current SQL."""
+    entries = load_store(path)
+    keys = set()
+    for les in lessons:
+        for (key, sql_key), (_, _, ex) in zip(validator.example_keys(les), les.examples):
+            entry = entries.get(key)
+            if ex.get('volatile') or (entry is not None and entry.get('sql') == sql_key and entry.get('verdict') == 'volatile'):
+                keys.add(key)
+    return keys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find lesson examples whose results depend on row order or thread count')
+    parser.add_argument('--lesson', action='append', metavar='NAME', help='Only check these lessons (default: all)')
+    parser.add_argument('--threads', type=int, action='append', metavar='N', help='Thread count to compare with threads=1; repeat for several (default: 2, 4 and the CPU count)')
+    parser.add_argument('--repeat', type=int, default=3, help='Plain and shuffled runs per thread count (default: 3)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds before a run is interrupted (default: 60, 0 disables)')
+    parser.add_argument('--no-fixtures', action='store_true', help='Do not build the Parquet fixtures or point file_search_path at them')
+    parser.add_argument('--write', action='store_true', help='Record the verdicts in examples/expected/determinism.json')
+    parser.add_argument('--store-path', default=STORE_PATH, help='Verdict store (default: examples/expected/determinism.json)')
+    args = parser.parse_args(argv)
+    threads = sorted(set(args.threads or default_threads()))
+    if threads[0] < 1 or args.repeat < 0:
+        parser.error('--threads must be >= 1 and --repeat >= 0')
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        parser.error('the checker needs pyarrow: pip install pyarrow')
+
+    corpus = lesson_corpus.load()
+    lessons = list(corpus)
+    if args.lesson:
+        missing = [n for n in args.lesson if n not in corpus.lessons]
+        if missing:
+            parser.error('unknown lesson(s): ' + ', '.join(missing))
+        lessons = [corpus.lessons[n] for n in args.lesson]
+    search_path = None if args.no_fixtures else parquet_fixtures.build(parquet_fixtures.parse_spec(None))
+
+    results = []
+    for les in lessons:
+        print(f'  {les.name} ...', file=sys.stderr)
+        results += check_lesson(les, threads, args.repeat, search_path, args.timeout or None)
+
+    counts = {}
+    for entry in results:
+        counts[entry['verdict']] = counts.get(entry['verdict'], 0) + 1
+    print(f"Checked {len(results)} examples (threads 1 vs {', '.join(map(str, threads))}, {args.repeat} shuffled run(s) each):",
+          ', '.join(f'{k}={v}' for k, v in sorted(counts.items())))
+    for verdict in ('rows', 'order', 'volatile', 'unchecked', 'writes'):
+        flagged = [e for e in results if e['verdict'] == verdict]
+        if flagged:
+            print(f'\n{verdict.upper()} ({len(flagged)}):')
+        for e in flagged:
+            detail = '; '.join(x for x in (e['hint'], ', '.join(e['differs'][:3])) if x)
+            print(f"  {e['key']}" + (f'  ({detail})' if detail else ''))
+    if args.write:
+        save_store(results, args.store_path)
+        print('\nVerdicts written to', os.path.relpath(args.store_path, ROOT))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
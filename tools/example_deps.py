@@ -0,0 +1,489 @@
+"""
+Dependency graph of the lesson examples.
+
+Each example's SQL is split into statements and scanned (sql_statements.iter_tokens) for the
+objects it creates, reads, alters and drops:
+
+    CREATE [OR REPLACE] [TEMP] TABLE/VIEW/SEQUENCE/MACRO/TYPE/SCHEMA name    create
+    DROP ... name[, name]                                                   drop
+    ALTER / INSERT INTO / UPDATE / DELETE FROM / TRUNCATE / COMMENT ON / COPY name FROM,
+    CREATE INDEX ... ON name                                                alter
+    names after FROM / JOIN / DESCRIBE / SUMMARIZE / SHOW (not CTEs), macro calls,
+    nextval('seq'), pragma_table_info('t')                                  read
+    COPY ... TO 'file', EXPORT DATABASE 'dir'                               write file
+    read_csv('file'), read_parquet(...), FROM 'file.csv', COPY t FROM 'f'   read file
+    SET / RESET / PRAGMA / ATTACH / DETACH / USE / LOAD / INSTALL           session
+    information_schema.*, duckdb_tables() and friends, SHOW TABLES          catalog
+
+Replaying the examples in validator order (lessons by file name, examples in lesson order)
+turns that into a DAG: an example depends on the example that last (re)created each object it
+touches and on every example that altered it since; on the last writer of each file it reads;
+on every earlier session-changing example of its lesson; and, when it lists the catalog, on
+every earlier example of its lesson that created, altered or dropped something. Names nobody creates (catalog
+functions, the Parquet fixtures) are treated as external.
+
+The validator gives every lesson a fresh connection, so an object read without being created
+earlier in the same lesson only works when some other lesson happens to leave it behind
+(--persistent-db). These and files read from another lesson are reported as *leaks*. File
+edges from an earlier lesson are kept in the DAG, and the validator runs such lessons together
+(lesson_groups). Objects created only in another lesson stay leaks and get no edge.
+
+Usage:
+    python tools/example_deps.py                     # summary
+    python tools/example_deps.py --leaks             # cross-lesson leaks
+    python tools/example_deps.py --prereqs joins:inner_join_basic
+    python tools/example_deps.py --components window # independent example sets of a lesson
+"""
+import argparse
+import fnmatch
+import os
+import sys
+
+import lesson_corpus
+import sql_statements
+
+KINDS = {'TABLE': 'table', 'VIEW': 'table', 'SEQUENCE': 'seq', 'MACRO': 'macro', 'FUNCTION': 'macro', 'TYPE': 'type', 'SCHEMA': 'schema'}
+SESSION = {'SET', 'RESET', 'PRAGMA', 'ATTACH', 'DETACH', 'USE', 'LOAD', 'INSTALL'}
+READ_CONTEXT = {'FROM', 'JOIN', 'DESCRIBE', 'SUMMARIZE', 'SHOW'}
+# words that end a FROM item (so they are never read as a table or alias)
+CLAUSE_WORDS = {
+    'WHERE', 'GROUP', 'ORDER', 'LIMIT', 'OFFSET', 'HAVING', 'QUALIFY', 'WINDOW', 'UNION', 'EXCEPT', 'INTERSECT',
+    'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'FULL', 'CROSS', 'NATURAL', 'ASOF', 'POSITIONAL', 'ANTI', 'SEMI',
+    'LATERAL', 'ON', 'USING', 'AS', 'SELECT', 'SET', 'VALUES', 'RETURNING', 'PIVOT', 'UNPIVOT', 'SAMPLE',
+    'TABLESAMPLE', 'WITH', 'BY', 'FETCH', 'TO', 'FROM', 'INTO', 'DEFAULT', 'ALL', 'DISTINCT',
+}
+FILE_FUNCTIONS = ('read_', 'parquet_', 'glob', 'sniff_csv')
+# catalog listings see every object created or dropped before them
+CATALOG_FUNCTIONS = {'duckdb_tables', 'duckdb_views', 'duckdb_columns', 'duckdb_indexes', 'duckdb_constraints', 'duckdb_schemas',
+                     'duckdb_sequences', 'duckdb_types', 'duckdb_dependencies', 'pragma_show_tables', 'show_tables', 'show_tables_expanded',
+                     'duckdb_databases'}
+# functions whose first argument names a table
+TABLE_FUNCTIONS = {'pragma_table_info', 'pragma_storage_info', 'pragma_show', 'table_info', 'storage_info', 'show'}
+
+
+def object_key(parts):
+    """Normalized object name from its (possibly qualified) parts: lower case, no memory/main prefix."""
+    parts = [p.lower() for p in parts]
+    while len(parts) > 1 and parts[0] in ('memory', 'main'):
+        parts = parts[1:]
+    return '.'.join(parts)
+
+
+def file_key(path):
+    return os.path.normpath(path)
+
+
+class Scanner:
+    """Cursor over the tokens of one statement."""
+
+    def __init__(self, stmt):
+        self.toks = list(sql_statements.iter_tokens(stmt))
+        self.i = 0
+
+    def peek(self, k=0):
+        j = self.i + k
+        return self.toks[j] if j < len(self.toks) else (None, None)
+
+    def word(self, k=0):
+        kind, text = self.peek(k)
+        return text.upper() if kind == 'word' else None
+
+    def accept(self, *words):
+        if self.word() in words:
+            self.i += 1
+            return True
+        return False
+
+    def name(self):
+        """Consume a possibly qualified name; returns its parts or None."""
+        kind, text = self.peek()
+        if kind not in ('word', 'ident'):
+            return None
+        parts = [text]
+        self.i += 1
+        while self.peek() == ('punct', '.') and self.peek(1)[0] in ('word', 'ident'):
+            parts.append(self.peek(1)[1])
+            self.i += 2
+        return parts
+
+
+def analyze_statement(stmt):
+    """Ordered events [(op, key)] of one statement; see the module docstring."""
+    sc = Scanner(stmt)
+    events = []
+    head = sc.word()
+    if head in SESSION:
+        events = [('session', head)]
+        if head == 'PRAGMA' and sc.word(1) and sc.word(1).lower() in TABLE_FUNCTIONS and sc.peek(3)[0] == 'string':
+            events.append(('read', 'table:' + object_key(sc.peek(3)[1].split('.'))))
+        return events
+    if head in ('SHOW', 'DESCRIBE') and sc.word(1) in ('TABLES', 'ALL', None) and sc.peek(1)[0] != 'ident':
+        return [('catalog', 'tables')]
+    if head == 'CREATE' and sc.word(1) == 'SECRET' or head == 'CREATE' and sc.word(2) == 'SECRET':
+        return [('session', 'SECRET')]
+    written = []
+    if head == 'CREATE':
+        sc.i += 1
+        sc.accept('OR') and sc.accept('REPLACE')
+        while sc.accept('TEMP', 'TEMPORARY', 'PERSISTENT', 'UNIQUE'):
+            pass
+        kind = sc.word()
+        if kind == 'INDEX':
+            sc.i += 1
+            sc.accept('IF') and sc.accept('NOT') and sc.accept('EXISTS')
+            sc.name()
+            if sc.accept('ON'):
+                parts = sc.name()
+                if parts:
+                    events.append(('alter', 'table:' + object_key(parts)))
+        elif kind in KINDS:
+            sc.i += 1
+            sc.accept('IF') and sc.accept('NOT') and sc.accept('EXISTS')
+            parts = sc.name()
+            if parts:
+                written.append(('create', f'{KINDS[kind]}:{object_key(parts)}'))
+    elif head == 'DROP':
+        sc.i += 1
+        kind = sc.word()
+        if kind in KINDS:
+            sc.i += 1
+            sc.accept('IF') and sc.accept('EXISTS')
+            while True:
+                parts = sc.name()
+                if parts:
+                    events.append(('drop', f'{KINDS[kind]}:{object_key(parts)}'))
+                if sc.peek() != ('punct', ','):
+                    break
+                sc.i += 1
+            return events
+    elif head == 'ALTER':
+        sc.i += 1
+        kind = sc.word()
+        if kind in KINDS:
+            sc.i += 1
+            sc.accept('IF') and sc.accept('EXISTS')
+            parts = sc.name()
+            if parts:
+                key = f'{KINDS[kind]}:{object_key(parts)}'
+                events.append(('alter', key))
+                if sc.word() == 'RENAME' and sc.word(1) == 'TO':
+                    sc.i += 2
+                    new = sc.name()
+                    if new:
+                        events += [('drop', key), ('create', f'{KINDS[kind]}:{object_key(parts[:-1] + new)}')]
+    elif head in ('INSERT', 'UPDATE', 'DELETE', 'TRUNCATE'):
+        sc.i += 1
+        if head == 'INSERT':
+            sc.accept('OR') and sc.accept('REPLACE', 'IGNORE')
+            sc.accept('INTO')
+        elif head == 'DELETE':
+            sc.accept('FROM')
+        elif head == 'TRUNCATE':
+            sc.accept('TABLE')
+        parts = sc.name()
+        if parts:
+            events.append(('alter', 'table:' + object_key(parts)))
+    elif head == 'COMMENT' and sc.word(1) == 'ON':
+        sc.i += 2
+        kind = sc.word()
+        if kind in KINDS or kind == 'COLUMN':
+            sc.i += 1
+            parts = sc.name()
+            if parts:
+                events.append(('alter', f"{KINDS.get(kind, 'table')}:{object_key(parts[:-1] if kind == 'COLUMN' else parts)}"))
+    elif head == 'COPY':
+        sc.i += 1
+        if sc.word() == 'FROM' and sc.word(1) == 'DATABASE':
+            return events
+        parts = sc.name()
+        if parts and sc.accept('FROM'):
+            kind, text = sc.peek()
+            if kind == 'string':
+                events.append(('read_file', file_key(text)))
+            events.append(('alter', 'table:' + object_key(parts)))
+        elif parts:
+            events.append(('read', 'table:' + object_key(parts)))
+    elif head == 'EXPORT' and sc.word(1) == 'DATABASE':
+        kind, text = sc.peek(2)
+        if kind == 'string':
+            return [('write_file', file_key(text))]
+    events += scan_reads(sc.toks, copy=head == 'COPY')
+    return events + written
+
+
+def scan_reads(toks, copy=False):
+    """Read events of a token list: tables in FROM/JOIN/..., file scans, calls and, for a
+    COPY statement, the file it writes."""
+    events = []
+    ctes = set()
+    n = len(toks)
+    for k, (kind, text) in enumerate(toks):
+        # CTE: name [(columns)] AS [[NOT] MATERIALIZED] (
+        if kind not in ('word', 'ident') or k == 0 or toks[k - 1] not in (('word', 'WITH'), ('word', 'with'), ('word', 'RECURSIVE'), ('word', 'recursive'), ('punct', ',')):
+            continue
+        j = k + 1
+        if j < n and toks[j] == ('punct', '('):
+            while j < n and toks[j] != ('punct', ')'):
+                j += 1
+            j += 1
+        words = [t[1].upper() for t in toks[j:j + 3]]
+        if words[:1] == ['AS'] and ('(' in words[1:] or 'MATERIALIZED' in words[1:]):
+            ctes.add(text.lower())
+    k = 0
+    while k < n:
+        kind, text = toks[k]
+        up = text.upper() if kind == 'word' else None
+        if kind == 'word' and k + 1 < n and toks[k + 1] == ('punct', '(') and (k == 0 or toks[k - 1] != ('punct', '.')):
+            lo = text.lower()
+            arg = toks[k + 2] if k + 2 < n else (None, None)
+            if lo.startswith(FILE_FUNCTIONS) and arg[0] == 'string':
+                events.append(('read_file', file_key(arg[1])))
+            elif lo in ('nextval', 'currval') and arg[0] == 'string':
+                events.append(('read', 'seq:' + object_key(arg[1].split('.'))))
+            elif lo in TABLE_FUNCTIONS and arg[0] == 'string':
+                events.append(('read', 'table:' + object_key(arg[1].split('.'))))
+            elif lo in CATALOG_FUNCTIONS:
+                events.append(('catalog', lo))
+            else:
+                events.append(('call', 'macro:' + lo))
+        elif copy and up == 'TO' and k + 1 < n and toks[k + 1][0] == 'string':
+            events.append(('write_file', file_key(toks[k + 1][1])))
+        elif up in READ_CONTEXT:
+            k += 1
+            while k < n:
+                kind, text = toks[k]
+                if kind == 'string':
+                    events.append(('read_file', file_key(text)))
+                    k += 1
+                elif kind in ('word', 'ident') and not (kind == 'word' and text.upper() in CLAUSE_WORDS):
+                    parts = [text]
+                    while k + 2 < n and toks[k + 1] == ('punct', '.') and toks[k + 2][0] in ('word', 'ident'):
+                        parts.append(toks[k + 2][1])
+                        k += 2
+                    if k + 1 < n and toks[k + 1] == ('punct', '('):
+                        break  # table function: handled as a call
+                    if len(parts) > 1 and parts[-2].lower() in ('information_schema', 'pg_catalog'):
+                        events.append(('catalog', object_key(parts)))
+                    elif not (len(parts) == 1 and parts[0].lower() in ctes):
+                        events.append(('read', 'table:' + object_key(parts)))
+                    k += 1
+                    # optional alias
+                    if k < n and toks[k][0] == 'word' and toks[k][1].upper() == 'AS':
+                        k += 1
+                    if k < n and toks[k][0] in ('word', 'ident') and not (toks[k][0] == 'word' and toks[k][1].upper() in CLAUSE_WORDS):
+                        k += 1
+                else:
+                    break
+                if k < n and toks[k] == ('punct', ','):
+                    k += 1
+                    continue
+                break
+            continue
+        k += 1
+    return events
+
+
+def analyze(sql):
+    """Ordered events of every statement of `sql`."""
+    events = []
+    for stmt in sql_statements.split_statements(sql):
+        events += analyze_statement(stmt)
+    return events
+
+
+class Graph:
+    """nodes: [(lesson, index, name)] in validator order; deps: {node: set(nodes)}; leaks: [dict]."""
+
+    def __init__(self):
+        self.nodes = []
+        self.deps = {}
+        self.leaks = []
+        self.session = set()
+
+    def prerequisites(self, targets):
+        """Every node the `targets` transitively depend on, plus the targets, in validator order."""
+        seen = set()
+        stack = list(targets)
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.extend(self.deps.get(node, ()))
+        return [n for n in self.nodes if n in seen]
+
+    def cross_lesson_edges(self):
+        return [(a, b) for a, ds in self.deps.items() for b in ds if a[0] != b[0]]
+
+    def lesson_groups(self):
+        """Sets of lesson names that must run together, in the same process and order."""
+        parent = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for node in self.nodes:
+            find(node[0])
+        for a, b in self.cross_lesson_edges():
+            parent[find(a[0])] = find(b[0])
+        groups = {}
+        for lesson in parent:
+            groups.setdefault(find(lesson), set()).add(lesson)
+        return sorted(groups.values(), key=lambda g: min(g))
+
+    def components(self, lesson):
+        """Independent example sets of `lesson` (lists of indexes), connected by in-lesson edges."""
+        nodes = [n for n in self.nodes if n[0] == lesson]
+        parent = {n: n for n in nodes}
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for a in nodes:
+            for b in self.deps.get(a, ()):
+                if b in parent:
+                    parent[find(a)] = find(b)
+        comps = {}
+        for n in nodes:
+            comps.setdefault(find(n), []).append(n[1])
+        return sorted(comps.values())
+
+
+def node_id(node):
+    return f'{node[0]}:{node[2]}'
+
+
+def build(lessons):
+    """Replay `lessons` (in validator order) and return their dependency Graph."""
+    g = Graph()
+    events = [[analyze(ex.get('sql', '')) for _, _, ex in les.examples] for les in lessons]
+    creators = {}   # object -> lessons that create it
+    for les, lesson_events in zip(lessons, events):
+        for example_events in lesson_events:
+            for op, key in example_events:
+                if op == 'create':
+                    creators.setdefault(key, set()).add(les.name)
+    file_writers = {}  # file -> latest writer node in an earlier (or the current) lesson
+    for les, lesson_events in zip(lessons, events):
+        defs = {}
+        session = []
+        ddl = []
+        own_files = {}
+        for idx, (_, _, ex) in enumerate(les.examples):
+            node = (les.name, idx, ex.get('name', '<unnamed>'))
+            g.nodes.append(node)
+            deps = g.deps.setdefault(node, set())
+            deps.update(session)
+            local = set()
+            for op, key in lesson_events[idx]:
+                if op in ('create', 'alter', 'drop') and node not in ddl:
+                    ddl.append(node)
+                if op == 'catalog':
+                    deps.update(ddl)
+                elif op == 'session':
+                    g.session.add(node)
+                    if node not in session:
+                        session.append(node)
+                elif op == 'create':
+                    if key in defs:
+                        deps.update(defs[key])  # CREATE OR REPLACE / IF NOT EXISTS sees the old one
+                    defs[key] = [node]
+                    local.add(key)
+                elif op in ('read', 'alter', 'drop', 'call'):
+                    if key in defs:
+                        deps.update(defs[key])
+                        if op == 'alter':
+                            defs[key].append(node)
+                        elif op == 'drop':
+                            del defs[key]
+                    elif op in ('read', 'alter') and key not in local and creators.get(key, set()) - {les.name}:
+                        g.leaks.append({'node': node, 'kind': 'object', 'name': key,
+                                        'lessons': sorted(creators[key] - {les.name})})
+                elif op == 'write_file':
+                    if key in own_files:
+                        deps.add(own_files[key])  # keep writes of the same file in order
+                    own_files[key] = node
+                elif op == 'read_file':
+                    writer = own_files.get(key) or next((n for f, n in own_files.items() if fnmatch.fnmatch(f, key)), None)
+                    if writer is None:
+                        writer = file_writers.get(key) or next((n for f, n in file_writers.items() if fnmatch.fnmatch(f, key)), None)
+                        if writer is not None:
+                            g.leaks.append({'node': node, 'kind': 'file', 'name': key, 'lessons': [writer[0]]})
+                    if writer is not None:
+                        deps.add(writer)
+            deps.discard(node)
+        file_writers.update(own_files)
+    return g
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Dependency graph of the lesson examples')
+    ap.add_argument('--leaks', action='store_true', help='list objects and files shared between lessons')
+    ap.add_argument('--prereqs', metavar='LESSON:EXAMPLE', action='append', default=[],
+                    help='list the examples needed to run LESSON:EXAMPLE (repeatable)')
+    ap.add_argument('--components', metavar='LESSON', help='list the independent example sets of LESSON')
+    args = ap.parse_args(argv)
+
+    corpus = lesson_corpus.load()
+    lessons = [corpus.lessons[k] for k in sorted(corpus.lessons)]
+    g = build(lessons)
+    if args.prereqs:
+        try:
+            targets = resolve(g, args.prereqs)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        for node in g.prerequisites(targets):
+            print(('* ' if node in targets else '  ') + node_id(node))
+        return 0
+    if args.components:
+        if args.components not in corpus.lessons:
+            print(f'unknown lesson {args.components!r}', file=sys.stderr)
+            return 2
+        names = [ex.get('name', '<unnamed>') for _, _, ex in corpus.lessons[args.components].examples]
+        for comp in g.components(args.components):
+            print(f'{len(comp):3d}  ' + ', '.join(names[i] for i in comp))
+        return 0
+    if args.leaks:
+        for leak in g.leaks:
+            print(f"{node_id(leak['node'])}: {leak['kind']} {leak['name']} from {', '.join(leak['lessons'])}")
+        return 0
+    edges = sum(len(d) for d in g.deps.values())
+    groups = [grp for grp in g.lesson_groups() if len(grp) > 1]
+    print(f'{len(g.nodes)} examples, {edges} dependencies, {len(g.leaks)} cross-lesson leaks')
+    for grp in groups:
+        print('run together: ' + ', '.join(sorted(grp)))
+    for les in lessons:
+        comps = g.components(les.name)
+        print(f'  {les.name:<28} {len(les.examples):4d} examples  {len(comps):3d} independent sets')
+    return 0
+
+
+def resolve(g, specs):
+    """Graph nodes for 'lesson:example' specs (example by name, name#n for a repeated name, or
+    index); raises ValueError."""
+    out = []
+    for spec in specs:
+        lesson, sep, name = spec.partition(':')
+        base, _, nth = name.rpartition('#') if '#' in name else (name, '', '1')
+        nodes = [n for n in g.nodes if n[0] == lesson]
+        match = [n for n in nodes if n[2] == base]
+        if name.isdigit():
+            match = [n for n in nodes if n[1] == int(name)]
+        elif nth.isdigit() and int(nth) >= 1:
+            match = match[int(nth) - 1:]
+        if not sep or not match:
+            raise ValueError(f'no example {spec!r}; expected lesson:example (name, name#n or index)')
+        out.append(match[0])
+    return out
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,32 +6,45 @@ Logic:
  - Create 2-3 tailored exercises with full SQL answers using detected table and columns.
  - If detection fails, the file is skipped and left unchanged.
 
-Usage: pipenv run python tools/expand_exercises.py
+With --catalog the regexes are not used. Each lesson's setup (everything up to and including
+its first "Setup" section, or its first section with examples) runs in an in-memory DuckDB
+session, and a single duckdb_columns()/duckdb_tables() query returns every table, its
+estimated row count and its column names and types. The largest table becomes the main table.
+All generated answers are then executed in the same warm session. Their row counts are stored
+as `answer_rows`, and a lesson whose setup or any answer fails is skipped and left unchanged.
+
+Usage: pipenv run python tools/expand_exercises.py [--catalog]
 """
-import re, json, glob, os
-ROOT = os.path.dirname(os.path.dirname(__file__))
-EXAMPLES = os.path.join(ROOT, 'examples')
-files = sorted(glob.glob(os.path.join(EXAMPLES, '*.json')))
+import argparse, re, os, sys
+import lesson_corpus
+import sql_statements
 
 create_re = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w\.\"]+)\s*\((.*?)\)", re.I | re.S)
 insert_re = re.compile(r"INSERT\s+INTO\s+([\w\.\"]+)", re.I)
 col_split_re = re.compile(r"\s*,\s*(?![^()]*\))")
 col_name_re = re.compile(r"^\s*\"?([A-Za-z_][A-Za-z0-9_]*)\"?\s+([A-Za-z0-9\(\) ]+)", re.I)
+plain_ident_re = re.compile(r"^[a-z_][a-z0-9_]*$")
 
-updated = []
-skipped = []
-for p in files:
-    with open(p,'r') as f:
-        try:
-            j = json.load(f)
-        except Exception as e:
-            skipped.append((p, 'parse error'))
-            continue
-    # find section 1 SQL
-    sections = j.get('sections', [])
+NUMERIC_TYPES = ('INT', 'DOUBLE', 'NUMERIC', 'DECIMAL', 'REAL', 'FLOAT')
+
+CATALOG_SQL = """
+SELECT c.table_name, c.column_name, c.data_type, t.estimated_size
+FROM duckdb_columns() c
+JOIN duckdb_tables() t USING (database_name, schema_name, table_name)
+WHERE c.database_name = current_database() AND NOT c.internal AND NOT t.temporary
+ORDER BY c.table_name, c.column_index
+"""
+
+
+def is_numeric(type_name):
+    return any(x in type_name.upper() for x in NUMERIC_TYPES)
+
+
+def regex_target(lesson):
+    """(table, cols, types) guessed from the first section's SQL, or a skip reason string."""
+    sections = lesson.sections
     if not sections:
-        skipped.append((p, 'no sections'))
-        continue
+        return 'no sections'
     sec1 = sections[0]
     sql_block = ''
     for ex in sec1.get('examples', []):
@@ -57,71 +70,155 @@ for p in files:
         if m2:
             table = m2.group(1).strip().strip('"')
     if not table:
-        skipped.append((p, 'no table detected'))
-        continue
-    # pick key_col and agg_col
-    key_col = None
-    agg_col = None
-    if cols:
-        key_col = cols[0]
-        # prefer numeric types for agg_col
-        for c in cols:
-            t = types.get(c,'').upper()
-            if any(x in t for x in ('INT','DOUBLE','NUMERIC','DECIMAL','REAL','FLOAT')):
-                agg_col = c
-                break
-        if not agg_col and len(cols) > 1:
-            agg_col = cols[1]
-    else:
+        return 'no table detected'
+    return table, cols, types
+
+
+def catalog_target(con, lesson):
+    """Run the lesson's setup on `con` and read the main table from the catalog.
+
+    Returns (table, cols, types) or a skip reason string.
+    """
+    for _, _, ex in lesson.examples[:lesson.setup_count]:
+        sql = ex.get('sql', '')
+        for stmt in sql_statements.split_statements(sql):
+            try:
+                con.execute(stmt)
+            except Exception as e:
+                return f'setup failed: {e}'
+    tables = {}
+    for table, col, type_name, size in con.execute(CATALOG_SQL).fetchall():
+        t = tables.setdefault(table, {'size': size, 'cols': [], 'types': {}})
+        t['cols'].append(col)
+        t['types'][col] = type_name
+    if not tables:
+        return 'setup creates no tables'
+    # the main table is the one holding the most data, then the widest
+    table = max(tables, key=lambda name: (tables[name]['size'] or 0, len(tables[name]['cols']), name))
+    return table, tables[table]['cols'], tables[table]['types']
+
+
+_reserved = None
+
+
+def quote_ident(con, name):
+    """Quote `name` when it is not a plain lower-case identifier or is a reserved keyword."""
+    global _reserved
+    if _reserved is None:
+        _reserved = {r[0] for r in con.execute("SELECT keyword_name FROM duckdb_keywords() WHERE keyword_category = 'reserved'").fetchall()}
+    if plain_ident_re.match(name) and name not in _reserved:
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+
+def pick_columns(cols, types, catalog=False):
+    """Choose the grouping column and the column to aggregate."""
+    if not cols:
         # fallbacks
-        key_col = 'id'
-        agg_col = 'value'
-    # build exercises
+        return 'id', 'value'
+    key_col = cols[0]
+    if catalog:
+        # the catalog has exact types, so group by the first non-numeric column when there is one
+        key_col = next((c for c in cols if not is_numeric(types[c])), cols[0])
+    agg_col = None
+    candidates = cols
+    if catalog:
+        # summing surrogate keys is meaningless; use them only when nothing else is numeric
+        candidates = [c for c in cols if c != key_col]
+        candidates.sort(key=lambda c: c.lower() == 'id' or c.lower().endswith('_id'))
+    # prefer numeric types for agg_col
+    for c in candidates:
+        if is_numeric(types.get(c, '')):
+            agg_col = c
+            break
+    if not agg_col and len(cols) > 1:
+        agg_col = cols[1]
+    return key_col, agg_col
+
+
+def build_exercises(table, key_col, agg_col, types, q=lambda name: name):
+    """The three templated exercises; `q` quotes identifiers (names from the catalog may need it)."""
+    t, k = q(table), q(key_col)
     exercises = []
     # 1: basic select
     exercises.append({
         'id':'basic-select',
         'prompt': f'Show the first 5 rows from `{table}`.',
-        'answer_sql': f'SELECT * FROM {table} LIMIT 5;'
+        'answer_sql': f'SELECT * FROM {t} LIMIT 5;'
     })
     # 2: aggregation
-    if agg_col:
-        # if agg_col same as key_col and likely non-numeric, do COUNT only
-        if agg_col == key_col:
-            exercises.append({
-                'id':'aggregate-1',
-                'prompt': f'Count rows grouped by `{key_col}`.',
-                'answer_sql': f'SELECT {key_col}, COUNT(*) AS cnt FROM {table} GROUP BY {key_col} ORDER BY cnt DESC;'
-            })
-        else:
-            exercises.append({
-                'id':'aggregate-1',
-                'prompt': f'Group by `{key_col}` and compute COUNT and SUM({agg_col}).',
-                'answer_sql': f'SELECT {key_col}, COUNT(*) AS cnt, SUM({agg_col}) AS total_{agg_col} FROM {table} GROUP BY {key_col} ORDER BY cnt DESC;'
-            })
+    # if agg_col same as key_col and likely non-numeric, do COUNT only
+    if agg_col and agg_col != key_col:
+        a = q(agg_col)
+        exercises.append({
+            'id':'aggregate-1',
+            'prompt': f'Group by `{key_col}` and compute COUNT and SUM({agg_col}).',
+            'answer_sql': f'SELECT {k}, COUNT(*) AS cnt, SUM({a}) AS {q("total_" + agg_col)} FROM {t} GROUP BY {k} ORDER BY cnt DESC;'
+        })
     else:
         exercises.append({
             'id':'aggregate-1',
             'prompt': f'Count rows grouped by `{key_col}`.',
-            'answer_sql': f'SELECT {key_col}, COUNT(*) AS cnt FROM {table} GROUP BY {key_col} ORDER BY cnt DESC;'
+            'answer_sql': f'SELECT {k}, COUNT(*) AS cnt FROM {t} GROUP BY {k} ORDER BY cnt DESC;'
         })
     # 3: filter / top
     if agg_col:
+        a = q(agg_col)
         # build a numeric condition only if the detected type looks numeric
-        agg_type = types.get(agg_col, '').upper()
-        is_numeric = any(x in agg_type for x in ("INT", "DOUBLE", "NUMERIC", "DECIMAL", "REAL", "FLOAT"))
-        numeric_cond = f" AND {agg_col} > 0" if is_numeric else ""
+        numeric_cond = f" AND {a} > 0" if is_numeric(types.get(agg_col, '')) else ""
         exercises.append({
             'id':'filter-top',
             'prompt': f'Select the top 10 rows where `{agg_col}` is positive (if numeric) or not null otherwise.',
-            'answer_sql': f'SELECT * FROM {table} WHERE {agg_col} IS NOT NULL{numeric_cond} LIMIT 10;'
+            'answer_sql': f'SELECT * FROM {t} WHERE {a} IS NOT NULL{numeric_cond} LIMIT 10;'
         })
     else:
         exercises.append({
             'id':'filter-top',
             'prompt': f'Select any 10 non-null rows.',
-            'answer_sql': f'SELECT * FROM {table} WHERE {key_col} IS NOT NULL LIMIT 10;'
+            'answer_sql': f'SELECT * FROM {t} WHERE {k} IS NOT NULL LIMIT 10;'
         })
+    return exercises
+
+
+def verify_answers(con, exercises):
+    """Execute every answer on the warm session and record `answer_rows`; returns an error or None."""
+    for ex in exercises:
+        try:
+            ex['answer_rows'] = len(con.execute(ex['answer_sql']).fetchall())
+        except Exception as e:
+            return f"answer {ex['id']} failed: {e}"
+    return None
+
+
+def expand_lesson(lesson, catalog=False):
+    """Replace the exercises of `lesson` in memory.
+
+    Returns (table, key_col, agg_col), or a skip reason string when the lesson is left unchanged.
+    """
+    j = lesson.data
+    if catalog:
+        import duckdb
+
+        con = duckdb.connect()
+        try:
+            target = catalog_target(con, lesson)
+            if isinstance(target, str):
+                return target
+            table, cols, types = target
+            key_col, agg_col = pick_columns(cols, types, catalog=True)
+            exercises = build_exercises(table, key_col, agg_col, types, q=lambda name: quote_ident(con, name))
+            err = verify_answers(con, exercises)
+        finally:
+            con.close()
+        if err:
+            return err
+    else:
+        target = regex_target(lesson)
+        if isinstance(target, str):
+            return target
+        table, cols, types = target
+        key_col, agg_col = pick_columns(cols, types)
+        exercises = build_exercises(table, key_col, agg_col, types)
     # replace exercises
     j['exercises'] = exercises
     # update description
@@ -129,16 +226,37 @@ for p in files:
     note = f' Concrete exercises auto-generated for table `{table}`.'
     if note.strip() not in desc:
         j['description'] = desc.rstrip() + ' ' + note
-    with open(p,'w') as f:
-        json.dump(j, f, indent=2, ensure_ascii=False)
-    updated.append((p,table,key_col,agg_col))
-
-# summary
-print('Updated', len(updated), 'files')
-if skipped:
-    print('Skipped', len(skipped), 'files:')
-    for s in skipped[:10]:
-        print(' ', s)
-
-for u in updated[:10]:
-    print(' ', os.path.basename(u[0]), '-> table=', u[1], 'key=', u[2], 'agg=', u[3])
+    return table, key_col, agg_col
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replace templated exercises in examples/*.json with concrete ones')
+    parser.add_argument('--catalog', action='store_true', help="Run each lesson's setup in DuckDB, generate exercises from the real catalog and verify every answer")
+    args = parser.parse_args(argv)
+
+    corpus = lesson_corpus.load()
+    updated = []
+    skipped = [(str(p), 'parse error') for p, _ in corpus.errors]
+    for lesson in corpus:
+        p = str(lesson.path)
+        result = expand_lesson(lesson, catalog=args.catalog)
+        if isinstance(result, str):
+            skipped.append((p, result))
+            continue
+        lesson_corpus.write_lesson(p, lesson.data)
+        updated.append((p,) + result)
+
+    # summary
+    print('Updated', len(updated), 'files')
+    if skipped:
+        print('Skipped', len(skipped), 'files:')
+        for s in skipped[:10]:
+            print(' ', s)
+
+    for u in updated[:10]:
+        print(' ', os.path.basename(u[0]), '-> table=', u[1], 'key=', u[2], 'agg=', u[3])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,11 +3,7 @@ Add narratives and nerd_notes to all JSON lessons in the examples/ folder.
 Idempotent: will only add fields when missing.
 Run: python3 tools/expand_narratives.py
 """
-import json
-from pathlib import Path
-
-BASE = Path(__file__).resolve().parent.parent
-EXAMPLES_DIR = BASE / 'examples'
+import lesson_corpus
 
 def make_section_narrative(title):
     # Simple heuristics to make a short narrative based on section title
@@ -41,18 +37,15 @@ def make_example_nerdnotes(name):
     return "Nerd note: shows basic usage; for production, consider types, null handling, and performance trade-offs."
 
 
-def process_file(p: Path):
+def add_narratives(data):
+    """Fill in missing narratives and nerd notes in lesson data; returns True if anything was added."""
     changed = False
-    data = json.loads(p.read_text())
     sections = data.get('sections')
     if not sections:
         # add a short top-level note if file has no sections
-        meta = data.get('meta', {})
         if 'note' not in data:
             data['note'] = data.get('description', '') + ' (auto-enhanced with narratives)'
             changed = True
-        if changed:
-            p.write_text(json.dumps(data, indent=2, ensure_ascii=False) + '\n')
         return changed
 
     for sec in sections:
@@ -71,20 +64,27 @@ def process_file(p: Path):
             if 'nerd_notes' not in ex:
                 ex['nerd_notes'] = make_example_nerdnotes(ex.get('name','example'))
                 changed = True
+    return changed
+
+
+def process_lesson(lesson: lesson_corpus.Lesson):
+    changed = add_narratives(lesson.data)
     if changed:
-        p.write_text(json.dumps(data, indent=2, ensure_ascii=False) + '\n')
+        lesson_corpus.write_lesson(lesson.path, lesson.data)
     return changed
 
 
 def main():
-    files = sorted(EXAMPLES_DIR.glob('*.json'))
+    corpus = lesson_corpus.load()
     updated = []
-    for p in files:
+    for p, e in corpus.errors:
+        print('ERROR processing', p, e)
+    for lesson in corpus:
         try:
-            if process_file(p):
-                updated.append(p.name)
+            if process_lesson(lesson):
+                updated.append(lesson.path.name)
         except Exception as e:
-            print('ERROR processing', p, e)
+            print('ERROR processing', lesson.path, e)
     print('Updated files:', len(updated))
     for u in updated:
         print(' -', u)
@@ -0,0 +1,387 @@
+"""
+Shared, cached loader for the lesson corpus (examples/*.json and the matching *.html pages).
+
+Every tool in tools/ used to glob and json.load the corpus on its own and re-implement
+`normalize`, `json_topics` and `extract_headings`. This module owns that logic and exposes a
+parsed, indexed model:
+
+    corpus = lesson_corpus.load()
+    corpus.lessons['joins'].sections / .examples / .topics
+    corpus.pages['joins'].headings
+    corpus.example('joins', 'inner_join_basic')
+    corpus.lessons['joins'].topic_index.closest('Inner joins')   # -> (topic, score)
+
+Parsed files are kept in an on-disk cache (.cache/lesson_corpus.pickle). An entry is reused
+when the file's mtime and size are unchanged; otherwise the file is re-read and hashed, and the
+cached parse is kept when its SHA-256 is unchanged (touching a file does not invalidate it).
+
+HTML pages are read in fixed-size chunks and fed to an html.parser-based HeadingParser, so
+hashing and heading extraction happen in one pass with bounded memory regardless of page size.
+TopicIndex answers "closest existing topic and similarity score" for a heading using a
+character-trigram inverted index (Dice coefficient), so near-miss titles can count as covered.
+
+Usage: python tools/lesson_corpus.py        # print a short corpus summary (warms the cache)
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent.parent
+EXAMPLES_DIR = BASE / 'examples'
+CACHE_PATH = BASE / '.cache' / 'lesson_corpus.pickle'
+CACHE_VERSION = 2
+CHUNK_SIZE = 64 * 1024
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+setup_title_re = re.compile(r'\bsetup\b', re.IGNORECASE)
+
+
+class HeadingParser(HTMLParser):
+    """Collect the text of <h1>..<h6> elements; feed() it any number of chunks."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.headings = []
+        self._tag = None
+        self._buf = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HEADING_TAGS and self._tag is None:
+            self._tag = tag
+            self._buf = []
+
+    def handle_endtag(self, tag):
+        if tag == self._tag:
+            txt = re.sub(r'\s+', ' ', ''.join(self._buf)).strip()
+            if txt:
+                self.headings.append(txt)
+            self._tag = None
+            self._buf = []
+
+    def handle_data(self, data):
+        if self._tag is not None:
+            self._buf.append(data)
+
+
+def extract_headings(html_text):
+    parser = HeadingParser()
+    parser.feed(html_text)
+    parser.close()
+    return parser.headings
+
+
+def read_page(path, chunk_size=CHUNK_SIZE):
+    """Hash and extract headings from an HTML file in one streaming pass -> (sha256, headings)."""
+    h = hashlib.sha256()
+    parser = HeadingParser()
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk.encode('utf-8', errors='replace'))
+            parser.feed(chunk)
+    parser.close()
+    return h.hexdigest(), parser.headings
+
+
+def normalize(s):
+    return re.sub(r'\s+', ' ', s.strip().lower())
+
+
+def json_topics(jsdata):
+    topics = set()
+    # section titles
+    for sec in jsdata.get('sections', []):
+        if 'title' in sec:
+            topics.add(normalize(sec['title']))
+        # examples: name + description
+        for ex in sec.get('examples', []):
+            if 'name' in ex:
+                topics.add(normalize(ex['name']))
+            if 'description' in ex:
+                topics.add(normalize(ex['description']))
+            if 'nerd_notes' in ex:
+                topics.add(normalize(ex['nerd_notes']))
+    # top-level fields
+    if 'title' in jsdata:
+        topics.add(normalize(jsdata['title']))
+    if 'description' in jsdata:
+        topics.add(normalize(jsdata['description']))
+    return topics
+
+
+def trigrams(s):
+    s = f'  {s} '
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class TopicIndex:
+    """Character-trigram inverted index over normalized topic strings."""
+
+    def __init__(self, topics):
+        self.topics = []
+        self._exact = set()
+        self._grams = []
+        self._postings = {}
+        for t in sorted(topics):
+            self.add(t)
+
+    def add(self, topic):
+        topic = normalize(topic)
+        if topic in self._exact:
+            return
+        i = len(self.topics)
+        self.topics.append(topic)
+        self._exact.add(topic)
+        grams = trigrams(topic)
+        self._grams.append(grams)
+        for g in grams:
+            self._postings.setdefault(g, []).append(i)
+
+    def closest(self, text):
+        """Return (topic, score) for the most similar topic, score in [0, 1]; (None, 0.0) if empty."""
+        q = normalize(text)
+        if q in self._exact:
+            return q, 1.0
+        qg = trigrams(q)
+        shared = {}
+        for g in qg:
+            for i in self._postings.get(g, ()):
+                shared[i] = shared.get(i, 0) + 1
+        best, best_score = None, 0.0
+        for i, n in shared.items():
+            score = 2.0 * n / (len(qg) + len(self._grams[i]))
+            if score > best_score:
+                best, best_score = self.topics[i], score
+        return best, best_score
+
+    def covers(self, text, threshold):
+        return self.closest(text)[1] >= threshold
+
+
+class Lesson:
+    """One parsed examples/<name>.json file."""
+
+    def __init__(self, path, data, sha256):
+        self.path = Path(path)
+        self.name = self.path.stem
+        self.data = data
+        self.sha256 = sha256
+        self._topics = None
+        self._topic_index = None
+
+    @property
+    def title(self):
+        return self.data.get('title', self.path.name)
+
+    @property
+    def sections(self):
+        return self.data.get('sections', [])
+
+    @property
+    def examples(self):
+        """(section_index, section, example) for every example, in lesson order."""
+        return [(i, s, ex) for i, s in enumerate(self.sections) for ex in s.get('examples', [])]
+
+    @property
+    def setup_count(self):
+        """How many leading examples build the lesson's data.
+
+        That is everything up to and including the first section titled "... Setup ...", or
+        the first section that has examples when there is no setup section.
+        """
+        n = 0
+        for s in self.sections:
+            n += len(s.get('examples', []))
+            if setup_title_re.search(s.get('title', '')):
+                return n
+        for s in self.sections:
+            if s.get('examples'):
+                return len(s['examples'])
+        return 0
+
+    @property
+    def topics(self):
+        if self._topics is None:
+            self._topics = json_topics(self.data)
+        return self._topics
+
+    @property
+    def topic_index(self):
+        if self._topic_index is None:
+            self._topic_index = TopicIndex(self.topics)
+        return self._topic_index
+
+
+class Page:
+    """Headings of one <name>.html page."""
+
+    def __init__(self, path, headings, sha256):
+        self.path = Path(path)
+        self.name = self.path.stem
+        self.headings = headings
+        self.sha256 = sha256
+
+
+class Corpus:
+    def __init__(self, lessons, pages):
+        self.lessons = lessons
+        self.pages = pages
+        self._examples = None
+
+    def __iter__(self):
+        return iter(self.lessons.values())
+
+    def example(self, lesson, name):
+        """Look up an example dict by lesson stem and example name (None if absent)."""
+        if self._examples is None:
+            self._examples = {}
+            for les in self.lessons.values():
+                for _, _, ex in les.examples:
+                    self._examples.setdefault((les.name, ex.get('name')), ex)
+        return self._examples.get((lesson, name))
+
+
+def _read_lesson(p):
+    raw = p.read_bytes()
+    return hashlib.sha256(raw).hexdigest(), json.loads(raw.decode('utf-8'))
+
+
+def _read_cache(path):
+    try:
+        with open(path, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+        return {}
+    if not isinstance(cached, dict) or cached.get('version') != CACHE_VERSION:
+        return {}
+    return cached.get('files', {})
+
+
+def _write_cache(path, files):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # per-process temp name: parallel workers loading the corpus must not write into one file
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'files': files}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _load_entry(p, kind, cached, read):
+    """Return a cache entry for `p`, re-reading only when mtime/size changed.
+
+    `read(p)` hashes and parses the file in one pass and returns (sha256, value); when the hash
+    matches the cached one the cached value is kept, so consumers see a stable object.
+    """
+    st = p.stat()
+    entry = cached.get(str(p))
+    if entry and entry['kind'] == kind and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+        return entry, False
+    digest, value = read(p)
+    if entry and entry['kind'] == kind and entry['sha256'] == digest:
+        return dict(entry, mtime_ns=st.st_mtime_ns, size=st.st_size), True
+    return {'kind': kind, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': digest, 'value': value}, True
+
+
+def load(examples_dir=EXAMPLES_DIR, html_dir=None, cache_path=CACHE_PATH, use_cache=True):
+    """Load every lesson in `examples_dir` and every page in `html_dir` (default: examples_dir).
+
+    Lessons that fail to parse are skipped and listed in `corpus.errors` as (path, message).
+    """
+    examples_dir = Path(examples_dir)
+    html_dir = Path(html_dir) if html_dir is not None else examples_dir
+    cached = _read_cache(cache_path) if use_cache else {}
+    files = {}
+    dirty = False
+    lessons = {}
+    pages = {}
+    errors = []
+    for p in sorted(examples_dir.glob('*.json')):
+        try:
+            entry, changed = _load_entry(p, 'lesson', cached, _read_lesson)
+        except (OSError, ValueError) as e:
+            errors.append((p, str(e)))
+            continue
+        files[str(p)] = entry
+        dirty = dirty or changed
+        lessons[p.stem] = Lesson(p, entry['value'], entry['sha256'])
+    for p in sorted(html_dir.glob('*.html')):
+        entry, changed = _load_entry(p, 'page', cached, read_page)
+        files[str(p)] = entry
+        dirty = dirty or changed
+        pages[p.stem] = Page(p, entry['value'], entry['sha256'])
+    # drop entries for files that no longer exist in the directories we just scanned
+    scanned = {str(examples_dir), str(html_dir)}
+    for k, v in cached.items():
+        if k not in files and str(Path(k).parent) not in scanned:
+            files[k] = v
+    if use_cache and (dirty or len(files) != len(cached)):
+        try:
+            _write_cache(cache_path, files)
+        except OSError:
+            pass
+    corpus = Corpus(lessons, pages)
+    corpus.errors = errors
+    return corpus
+
+
+def load_lesson(path, use_cache=True):
+    """Load a single lesson file (through the cache); raises on parse errors like json.load."""
+    path = Path(path).resolve()
+    cached = _read_cache(CACHE_PATH) if use_cache else {}
+    entry, changed = _load_entry(path, 'lesson', cached, _read_lesson)
+    if use_cache and changed:
+        cached[str(path)] = entry
+        try:
+            _write_cache(CACHE_PATH, cached)
+        except OSError:
+            pass
+    return Lesson(path, entry['value'], entry['sha256'])
+
+
+def dumps_lesson(data):
+    """Serialize a lesson the way every tool writes examples/*.json."""
+    return json.dumps(data, indent=2, ensure_ascii=False) + '\n'
+
+
+def write_lesson(path, data):
+    """Write `data` to `path` via a temp file and rename, unless the bytes are unchanged.
+
+    Returns True when the file was written. A crash mid-write leaves the old file intact.
+    """
+    path = Path(path)
+    raw = dumps_lesson(data).encode('utf-8')
+    try:
+        if path.read_bytes() == raw:
+            return False
+    except OSError:
+        pass
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return True
+
+
+if __name__ == '__main__':
+    corpus = load()
+    n_ex = sum(len(les.examples) for les in corpus)
+    print(f'{len(corpus.lessons)} lessons, {n_ex} examples, {len(corpus.pages)} html pages')
+    for p, msg in corpus.errors:
+        print('  PARSE ERROR:', p, msg)
@@ -0,0 +1,144 @@
+"""
+Run the lesson-rewriting tools as one pass over the corpus.
+
+add_exercises_to_lessons.py, expand_exercises.py, expand_narratives.py and
+sync_html_to_json.py each parse and rewrite every lesson. This runner loads the corpus once
+(lesson_corpus.load) and applies the selected transforms to each lesson in memory, always in
+this order:
+
+    sync-html         placeholder sections for uncovered HTML headings  (sync_html_to_json)
+    narratives        missing narratives / nerd notes                    (expand_narratives)
+    add-exercises     templated exercises + description note             (add_exercises_to_lessons)
+    expand-exercises  concrete exercises for the lesson's main table     (expand_exercises)
+
+A lesson is serialized once at the end and written (temp file + rename, see
+lesson_corpus.write_lesson) only when a transform changed it and the bytes differ from the
+file on disk. Lessons are processed in a process pool; output follows corpus order.
+--dry-run writes nothing and prints a diff summary instead (--diff for the full unified diff).
+
+Usage:
+    python tools/lesson_pipeline.py                          # all transforms
+    python tools/lesson_pipeline.py narratives sync-html --dry-run --diff
+"""
+import argparse
+import difflib
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import add_exercises_to_lessons
+import expand_exercises
+import expand_narratives
+import lesson_corpus
+import sync_html_to_json
+
+TRANSFORMS = ['sync-html', 'narratives', 'add-exercises', 'expand-exercises']
+
+
+def apply_transforms(lesson, page, names, threshold=0.8, catalog=False):
+    """Apply the transforms in `names` to lesson.data in TRANSFORMS order; returns [(name, note)] of changes."""
+    changes = []
+    for name in TRANSFORMS:
+        if name not in names:
+            continue
+        if name == 'sync-html':
+            added = sync_html_to_json.add_missing_sections(lesson, page, threshold) if page else []
+            if added:
+                changes.append((name, f'{len(added)} section(s)'))
+        elif name == 'narratives':
+            if expand_narratives.add_narratives(lesson.data):
+                changes.append((name, ''))
+        elif name == 'add-exercises':
+            if add_exercises_to_lessons.add_exercises(lesson.data):
+                changes.append((name, ''))
+        elif name == 'expand-exercises':
+            result = expand_exercises.expand_lesson(lesson, catalog=catalog)
+            if not isinstance(result, str):
+                changes.append((name, f'table {result[0]}'))
+    return changes
+
+
+def process_lesson(lesson, page, names, threshold=0.8, catalog=False, dry_run=False, diff=False):
+    """Transform one lesson and write it if its bytes changed (pool entry point)."""
+    out = {'file': str(lesson.path), 'changes': [], 'written': False, 'added': 0, 'removed': 0, 'diff': None, 'error': None}
+    try:
+        out['changes'] = apply_transforms(lesson, page, names, threshold, catalog)
+        if not out['changes']:
+            return out
+        new = lesson_corpus.dumps_lesson(lesson.data)
+        if hashlib.sha256(new.encode('utf-8')).hexdigest() == lesson.sha256:
+            out['changes'] = []
+            return out
+        if dry_run:
+            old = lesson.path.read_text(encoding='utf-8')
+            lines = list(difflib.unified_diff(old.splitlines(keepends=True), new.splitlines(keepends=True),
+                                              fromfile=f'a/{lesson.path.name}', tofile=f'b/{lesson.path.name}'))
+            out['added'] = sum(1 for ln in lines if ln.startswith('+') and not ln.startswith('+++'))
+            out['removed'] = sum(1 for ln in lines if ln.startswith('-') and not ln.startswith('---'))
+            if diff:
+                out['diff'] = ''.join(lines)
+        else:
+            out['written'] = lesson_corpus.write_lesson(lesson.path, lesson.data)
+    except Exception as e:
+        out['error'] = str(e)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply the lesson-rewriting transforms in one pass with atomic writes')
+    parser.add_argument('transforms', nargs='*', metavar='TRANSFORM', help=f'Transforms to apply, from: {", ".join(TRANSFORMS)} (default: all; always run in this order)')
+    parser.add_argument('--dry-run', action='store_true', help='Write nothing; print which lessons would change and by how many lines')
+    parser.add_argument('--diff', action='store_true', help='With --dry-run, also print the unified diff')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+    parser.add_argument('--threshold', type=float, default=0.8, help='sync-html: minimum similarity for a heading to count as present (default: 0.8)')
+    parser.add_argument('--html-dir', default=str(lesson_corpus.EXAMPLES_DIR), help='sync-html: directory holding the <lesson>.html pages (default: examples/)')
+    parser.add_argument('--catalog', action='store_true', help='expand-exercises: build exercises from the DuckDB catalog and verify the answers')
+    args = parser.parse_args(argv)
+    if args.diff and not args.dry_run:
+        parser.error('--diff requires --dry-run')
+    if args.jobs < 1:
+        parser.error('--jobs must be >= 1')
+    unknown = [t for t in args.transforms if t not in TRANSFORMS]
+    if unknown:
+        parser.error(f'unknown transform(s): {", ".join(unknown)}; choose from {", ".join(TRANSFORMS)}')
+    names = set(args.transforms or TRANSFORMS)
+
+    corpus = lesson_corpus.load(html_dir=args.html_dir)
+    for p, e in corpus.errors:
+        print('SKIP (parse error):', p, e, file=sys.stderr)
+    lessons = list(corpus)
+    tasks = [(les, corpus.pages.get(les.name)) for les in lessons]
+    kwargs = {'names': names, 'threshold': args.threshold, 'catalog': args.catalog, 'dry_run': args.dry_run, 'diff': args.diff}
+    if args.jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            # collect futures in submission order, so the output order matches a serial run
+            futures = [pool.submit(process_lesson, les, page, **kwargs) for les, page in tasks]
+            results = [f.result() for f in futures]
+    else:
+        results = [process_lesson(les, page, **kwargs) for les, page in tasks]
+
+    changed = errors = 0
+    for r in results:
+        name = os.path.basename(r['file'])
+        if r['error']:
+            errors += 1
+            print(f"ERROR {name}: {r['error']}")
+            continue
+        if not r['changes']:
+            continue
+        changed += 1
+        what = ', '.join(f'{t}({note})' if note else t for t, note in r['changes'])
+        if args.dry_run:
+            print(f"would update {name}: {what}  (+{r['added']} -{r['removed']} lines)")
+            if r['diff']:
+                print(r['diff'], end='')
+        else:
+            print(f'updated {name}: {what}')
+    verb = 'would change' if args.dry_run else 'changed'
+    print(f'{len(results)} lessons, {changed} {verb}' + (f', {errors} failed' if errors else ''))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Setup-section snapshots for tools/validate_duckdb_examples.py.
+
+Most lessons start with a setup section that creates and fills the tables every later example
+reads. After a lesson has executed its setup section the validator copies the database state
+into .cache/snapshots/<lesson>-<key>.duckdb with `COPY FROM DATABASE` (tables, views, macros,
+types, sequences and their current values). `<key>` is the validation_cache key of the last
+setup example, i.e. a hash of the DuckDB version and all SQL up to the end of setup, so
+editing the setup (or upgrading DuckDB) invalidates the snapshot and the stale file is pruned.
+
+When only examples after the setup changed, the validator restores the snapshot into a fresh
+in-memory connection and executes from the first post-setup example instead of replaying the
+whole lesson; parallel workers do the same independently.
+
+Setups that leave state COPY FROM DATABASE cannot carry (TEMP objects, SET/PRAGMA settings,
+ATTACH/USE, extensions, secrets) are never snapshotted.
+"""
+import os
+import re
+import uuid
+
+import lesson_corpus
+import sql_statements
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.path.join(ROOT, '.cache', 'snapshots')
+
+unsafe_re = re.compile(
+    r'(?:^|;)\s*(?:SET|RESET|PRAGMA|ATTACH|DETACH|USE|LOAD|INSTALL)\b'
+    r'|\bCREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMP|TEMPORARY)\b'
+    r'|\bCREATE\s+(?:OR\s+REPLACE\s+)?(?:PERSISTENT\s+)?SECRET\b',
+    re.IGNORECASE,
+)
+
+
+def setup_end(lesson):
+    """Flat index of the last setup example of `lesson` (a lesson_corpus.Lesson), or None.
+
+    None is returned when the lesson has no setup section (Lesson.setup_count then falls back
+    to the first section, which is not necessarily setup), or when the SQL up to that point
+    creates state a snapshot cannot reproduce.
+    """
+    if not any(lesson_corpus.setup_title_re.search(s.get('title', '')) for s in lesson.sections):
+        return None
+    n = lesson.setup_count
+    if not n or not snapshot_safe('\n;\n'.join(ex.get('sql', '') for _, _, ex in lesson.examples[:n])):
+        return None
+    return n - 1
+
+
+def snapshot_safe(sql):
+    sql = sql_statements.string_re.sub("''", sql_statements.comment_re.sub('', sql))
+    return unsafe_re.search(sql) is None
+
+
+def path_for(lesson_name, key, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, f'{lesson_name}-{key[:16]}.duckdb')
+
+
+def save(con, path):
+    """Copy the connection's current database into a new snapshot file at `path`."""
+    d = os.path.dirname(path)
+    os.makedirs(d, exist_ok=True)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    alias = 'snap_' + uuid.uuid4().hex[:8]
+    db = con.execute('SELECT current_database()').fetchone()[0]
+    try:
+        con.execute(f"ATTACH '{tmp}' AS {alias}")
+        con.execute(f'COPY FROM DATABASE "{db}" TO {alias}')
+        con.execute(f'DETACH {alias}')
+        os.replace(tmp, path)
+    finally:
+        for leftover in (tmp, tmp + '.wal'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    prune(os.path.basename(path).rsplit('-', 1)[0], keep=path)
+
+
+def restore(con, path):
+    """Load a snapshot into the connection's (empty) current database."""
+    alias = 'snap_' + uuid.uuid4().hex[:8]
+    db = con.execute('SELECT current_database()').fetchone()[0]
+    con.execute(f"ATTACH '{path}' AS {alias} (READ_ONLY)")
+    try:
+        con.execute(f'COPY FROM DATABASE {alias} TO "{db}"')
+    finally:
+        con.execute(f'DETACH {alias}')
+
+
+def prune(lesson_name, keep=None, directory=SNAPSHOT_DIR):
+    """Remove snapshots of `lesson_name` other than `keep` (stale setup hashes)."""
+    if not os.path.isdir(directory):
+        return
+    for fn in os.listdir(directory):
+        p = os.path.join(directory, fn)
+        if fn.endswith('.duckdb') and fn.rsplit('-', 1)[0] == lesson_name and p != keep:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
@@ -0,0 +1,182 @@
+"""
+Hive-partitioned Parquet fixtures for lessons that scan files (duckadv.json reads
+`events_parquet/year=YYYY/*.parquet`).
+
+A fixture is described by a small spec:
+
+    rows                 total events across all years             (default 100000)
+    years                partition values, comma separated          (default 2023,2024)
+    files_per_partition  Parquet files written under each year=     (default 2)
+    row_group_size       rows per row group                         (default 10000)
+    compression          zstd, snappy, gzip, lz4, brotli or uncompressed (default zstd)
+
+and is built into .cache/fixtures/<spec hash>/events_parquet/year=<year>/part-<k>.parquet.
+The rows are deterministic and sorted by event_ts inside every file, so row-group min/max
+statistics are tight and pruning is measurable. A directory is only reused when its
+spec.json is present (it is written last), so an interrupted build is rebuilt, and a
+different spec never reuses another spec's files.
+
+The validator points DuckDB's `file_search_path` at the fixture directory, so the lessons'
+relative paths resolve without copying anything into the working tree.
+
+Usage:
+    python tools/parquet_fixtures.py                                   # build the default spec
+    python tools/parquet_fixtures.py --set rows=10000000 --set compression=snappy
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(ROOT, '.cache', 'fixtures')
+FIXTURE_VERSION = 1
+COMPRESSIONS = ('zstd', 'snappy', 'gzip', 'lz4', 'brotli', 'uncompressed')
+
+DEFAULT_SPEC = {
+    'rows': 100_000,
+    'years': [2023, 2024],
+    'files_per_partition': 2,
+    'row_group_size': 10_000,
+    'compression': 'zstd',
+}
+
+EVENTS_SQL = """
+SELECT
+    i::INTEGER AS id,
+    TIMESTAMP '{year}-01-01' + to_microseconds((i - {first}) * {step}) AS event_ts,
+    (hash(i) % 1000)::INTEGER AS user_id,
+    (['view', 'click', 'cart', 'purchase'])[(hash(i) % 4)::INTEGER + 1] AS event_type,
+    round((hash(i * 31) % 100000) / 100.0, 2) AS val
+FROM range({start}, {stop}) AS r(i)
+ORDER BY event_ts
+"""
+
+
+def parse_spec(items, base=None):
+    """Apply KEY=VALUE strings to a copy of `base` (default: DEFAULT_SPEC); raises ValueError."""
+    spec = dict(base or DEFAULT_SPEC)
+    for item in items or ():
+        key, sep, value = item.partition('=')
+        key = key.strip().replace('-', '_')
+        if not sep or key not in DEFAULT_SPEC:
+            raise ValueError(f'bad fixture setting {item!r}; expected one of {", ".join(DEFAULT_SPEC)}=VALUE')
+        if key == 'years':
+            spec[key] = [int(y) for y in value.split(',') if y.strip()]
+        elif key == 'compression':
+            spec[key] = value.strip().lower()
+        else:
+            spec[key] = int(value)
+    if spec['compression'] not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {', '.join(COMPRESSIONS)}")
+    if spec['rows'] < 0 or spec['files_per_partition'] < 1 or spec['row_group_size'] < 1 or not spec['years']:
+        raise ValueError('rows must be >= 0, files_per_partition and row_group_size >= 1, and years non-empty')
+    return spec
+
+
+def spec_hash(spec):
+    blob = json.dumps({'version': FIXTURE_VERSION, **spec}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+
+def path_for(spec, directory=FIXTURE_DIR):
+    return os.path.join(directory, spec_hash(spec))
+
+
+def build(spec=None, directory=FIXTURE_DIR, force=False):
+    """Build the fixture for `spec` unless a complete one exists; returns its directory."""
+    import duckdb
+
+    spec = spec or DEFAULT_SPEC
+    root = path_for(spec, directory)
+    if not force and os.path.exists(os.path.join(root, 'spec.json')):
+        return root
+    tmp = f'{root}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(tmp)
+    try:
+        con = duckdb.connect()
+        try:
+            years = spec['years']
+            per_year = spec['rows'] // len(years)
+            opts = f"FORMAT parquet, COMPRESSION {spec['compression']}, ROW_GROUP_SIZE {spec['row_group_size']}"
+            for n, year in enumerate(years):
+                first = n * per_year
+                count = per_year + (spec['rows'] % len(years) if n == len(years) - 1 else 0)
+                # spread the year's events evenly over the year
+                step = (365 * 24 * 3600 * 1_000_000) // max(count, 1)
+                part_dir = os.path.join(tmp, 'events_parquet', f'year={year}')
+                os.makedirs(part_dir)
+                per_file = -(-count // spec['files_per_partition']) if count else 0
+                for k in range(spec['files_per_partition']):
+                    start = first + k * per_file
+                    stop = min(first + count, start + per_file)
+                    sql = EVENTS_SQL.format(year=year, first=first, step=step, start=start, stop=max(start, stop))
+                    path = os.path.join(part_dir, f'part-{k}.parquet')
+                    con.execute(f"COPY ({sql}) TO '{path}' ({opts})")
+        finally:
+            con.close()
+        with open(os.path.join(tmp, 'spec.json'), 'w') as f:
+            json.dump(spec, f, indent=2, sort_keys=True)
+        if os.path.exists(root):
+            shutil.rmtree(root)
+        os.replace(tmp, root)
+    finally:
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp, ignore_errors=True)
+    return root
+
+
+def describe(root):
+    """(files, row_groups, rows, bytes) of every Parquet file under `root`."""
+    import duckdb
+
+    con = duckdb.connect()
+    try:
+        glob = os.path.join(root, '**', '*.parquet')
+        files, groups, rows = con.execute(
+            'SELECT count(DISTINCT file_name), count(DISTINCT (file_name, row_group_id)), '
+            'coalesce(sum(num_rows), 0) FROM (SELECT DISTINCT file_name, row_group_id, row_group_num_rows AS num_rows '
+            f"FROM parquet_metadata('{glob}'))").fetchone()
+    finally:
+        con.close()
+    size = sum(os.path.getsize(os.path.join(d, fn)) for d, _, fns in os.walk(root) for fn in fns if fn.endswith('.parquet'))
+    return files, groups, rows, size
+
+
+def prune(keep=(), directory=FIXTURE_DIR):
+    """Remove built fixtures other than the directories in `keep`."""
+    if not os.path.isdir(directory):
+        return []
+    removed = []
+    for fn in os.listdir(directory):
+        p = os.path.join(directory, fn)
+        if p not in keep:
+            shutil.rmtree(p, ignore_errors=True)
+            removed.append(p)
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build hive-partitioned events_parquet fixtures (cached by spec hash)')
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE', help=f'Override a spec setting ({", ".join(DEFAULT_SPEC)}); repeatable')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the fixture already exists')
+    parser.add_argument('--prune', action='store_true', help='Remove every other built fixture')
+    args = parser.parse_args(argv)
+    try:
+        spec = parse_spec(args.set)
+    except ValueError as e:
+        parser.error(str(e))
+    root = build(spec, force=args.force)
+    files, groups, rows, size = describe(root)
+    print(f'{root}: {files} files, {groups} row groups, {rows} rows, {size / 1e6:.1f} MB')
+    if args.prune:
+        for p in prune(keep=(root,)):
+            print('removed', p)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Query-plan snapshots for tools/validate_duckdb_examples.py --plans.
+
+For every example whose last statement is a query (SELECT, WITH, FROM, VALUES, TABLE, PIVOT,
+UNPIVOT), the validator runs `EXPLAIN (FORMAT json)` on it just before executing it and
+normalizes the plan to one line per operator:
+
+    HASH_GROUP_BY  [Aggregates=sum(#1); Groups=#0]
+      HASH_JOIN  [Conditions=a = a; Join Type=INNER]
+        SEQ_SCAN  [Projections=a, b; Table=main.t; Type=Sequential Scan]
+
+Estimated cardinalities and internal CTE/table indexes are dropped and names lose the current
+database's catalog prefix, so the lines only change when the optimizer picks a different plan.
+The operator names alone form the plan's *shape* (join order, pushdown into scans, pruned
+projections show up as added, removed or moved operators); the bracketed details catch the rest.
+
+Plans are stored in examples/expected/plans.json keyed like the fingerprints
+(`<lesson>:<example>`), with one plan per DuckDB version:
+
+    {"agg:rollup_example": {"sql": <sql key>, "versions": {"1.5.6": [...lines...]}}}
+
+A run compares each plan with the one recorded for the running DuckDB version or, when there is
+none yet (after an upgrade), with the newest older version, and then records it for the running
+version. Differences are reported as `shape` or `details` changes with a before/after diff; they
+do not fail the run. --update-plans overwrites plans already recorded for the running version.
+Editing an example's SQL drops its recorded plans.
+"""
+import difflib
+import json
+import os
+import re
+
+import sql_statements
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLANS_PATH = os.path.join(ROOT, 'examples', 'expected', 'plans.json')
+
+QUERY_RE = re.compile(r'^\s*\(*\s*(SELECT|WITH|FROM|VALUES|TABLE|PIVOT|UNPIVOT)\b', re.IGNORECASE)
+
+# extra_info keys that vary between runs of the same plan
+VOLATILE_KEYS = {'Estimated Cardinality', 'Table Index', 'CTE Index'}
+
+
+def is_query(sql):
+    return QUERY_RE.match(sql_statements.comment_re.sub('', sql)) is not None
+
+
+def normalize(node, depth=0, out=None, catalog=None):
+    """Flatten one EXPLAIN (FORMAT json) operator tree into indented operator lines.
+
+    `catalog` (the current database name) is stripped from qualified names.
+    """
+    out = [] if out is None else out
+    catalog_re = re.compile(rf'(?<![\w."]){re.escape(catalog)}\.') if catalog else None
+    details = []
+    for k, v in sorted((node.get('extra_info') or {}).items()):
+        if k in VOLATILE_KEYS:
+            continue
+        if isinstance(v, list):
+            v = ', '.join(str(x) for x in v)
+        v = ' '.join(str(v).split())
+        if catalog_re:
+            v = catalog_re.sub('', v)
+        if v:
+            details.append(f'{k}={v}')
+    out.append('  ' * depth + node.get('name', '?') + (f"  [{'; '.join(details)}]" if details else ''))
+    for child in node.get('children') or ():
+        normalize(child, depth + 1, out, catalog)
+    return out
+
+
+def explain(con, sql):
+    """Normalized plan lines of query `sql` on `con`, or None if it cannot be explained."""
+    try:
+        catalog = con.execute('SELECT current_database()').fetchone()[0]
+        rows = con.execute(f'EXPLAIN (FORMAT json) {sql}').fetchall()
+        trees = json.loads(rows[0][1])
+    except Exception:
+        return None
+    lines = []
+    for tree in trees if isinstance(trees, list) else [trees]:
+        normalize(tree, 0, lines, catalog)
+    return lines
+
+
+def shape(lines):
+    return [ln.split('  [', 1)[0] for ln in lines]
+
+
+def diff(before, after):
+    return list(difflib.unified_diff(before, after, 'before', 'after', lineterm='', n=2))
+
+
+def version_key(version):
+    return tuple(int(p) if p.isdigit() else -1 for p in re.split(r'[.\-+]', version))
+
+
+class PlanStore:
+    def __init__(self, path=PLANS_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def check(self, key, sql_key, lines, version, update=False):
+        """Compare plan `lines` with the stored baseline for `version`.
+
+        Returns (verdict, baseline_version, baseline_lines): verdict is 'match', 'new',
+        'shape' or 'details'. The plan is recorded for `version` unless one is already
+        stored for it (or `update` is set).
+        """
+        cur = self.entries.get(key)
+        if cur is None or cur.get('sql') != sql_key:
+            cur = self.entries[key] = {'sql': sql_key, 'versions': {}}
+            self.dirty = True
+        versions = cur['versions']
+        if version in versions:
+            base_version = version
+        else:
+            older = [v for v in versions if version_key(v) < version_key(version)]
+            base_version = max(older, key=version_key, default=None)
+        base = versions.get(base_version) if base_version else None
+        if base is None:
+            verdict = 'new'
+        elif base == lines:
+            verdict = 'match'
+        else:
+            verdict = 'shape' if shape(base) != shape(lines) else 'details'
+        if version not in versions or (update and versions[version] != lines):
+            versions[version] = lines
+            self.dirty = True
+        return verdict, base_version, base
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(dict(sorted(self.entries.items())), f, indent=2)
+            f.write('\n')
+        os.replace(tmp, self.path)
+        self.dirty = False
@@ -0,0 +1,108 @@
+"""
+pytest plugin that collects every lesson example as its own test.
+
+    PYTHONPATH=tools python -m pytest -p pytest_lessons examples
+    PYTHONPATH=tools python -m pytest -p pytest_lessons examples -k "joins and inner"
+    PYTHONPATH=tools python -m pytest -p pytest_lessons examples -n 4 --dist loadgroup   # pytest-xdist
+
+Each examples/<lesson>.json file becomes a test file and each example a test item with the ID
+`examples/<lesson>.json::<example>` (`<example>#2` for a repeated name), so `-k`, `--lf`,
+`--deselect` and node IDs select examples as usual.
+
+Items run through a session-scoped validation_api.Workspace (the `lesson_workspace` fixture),
+which keeps one warm DuckDB connection per lesson: a full run replays every lesson once, in
+order, like the validator, and a selected example runs only its prerequisites. An example
+passes when the validator would report it ok or skipped (skipped examples are reported as
+skipped); any other status fails the test with the validator's error.
+
+Under pytest-xdist every worker has its own workspace, so each example is self-contained on any
+worker. Items carry an `xdist_group` mark with their lesson (or their lesson group when lessons
+pass files to each other), so `--dist loadgroup` keeps a lesson on one warm worker.
+
+Options: --lesson-timeout SECONDS (default 60, 0 disables), --lesson-no-fixtures.
+"""
+import pytest
+
+import validation_api
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('lessons', 'DuckDB lesson examples')
+    group.addoption('--lesson-timeout', type=float, default=60.0, help='Interrupt an example after SECONDS (default: 60, 0 disables)')
+    group.addoption('--lesson-no-fixtures', action='store_true', help='Do not build the Parquet fixtures for the lessons')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'xdist_group(name): run the items of one group on the same pytest-xdist worker')
+    config.addinivalue_line('markers', 'lesson(name): a DuckDB lesson example')
+    config._lesson_workspace = None
+
+
+def pytest_unconfigure(config):
+    ws = getattr(config, '_lesson_workspace', None)
+    if ws is not None:
+        ws.close()
+
+
+def workspace(config):
+    """The process-wide Workspace, created on first use."""
+    if config._lesson_workspace is None:
+        config._lesson_workspace = validation_api.Workspace(fixtures=not config.getoption('lesson_no_fixtures'),
+                                                            timeout=config.getoption('lesson_timeout'))
+    return config._lesson_workspace
+
+
+@pytest.fixture(scope='session')
+def lesson_workspace(request):
+    """Warm per-lesson DuckDB sessions: `.run(lesson, example)`, `.connection(lesson)`."""
+    return workspace(request.config)
+
+
+def pytest_collect_file(file_path, parent):
+    if validation_api.lesson_for_path(file_path):
+        return LessonFile.from_parent(parent, path=file_path)
+
+
+class LessonFile(pytest.File):
+    def collect(self):
+        name = validation_api.lesson_for_path(self.path)
+        ws = workspace(self.config)
+        lesson = ws.lessons.get(name)
+        if lesson is None:
+            return
+        group = next((g for g in ws.graph.lesson_groups() if name in g), {name})
+        for index, example_id in validation_api.example_ids(lesson):
+            item = ExampleItem.from_parent(self, name=example_id, lesson=name, index=index)
+            item.add_marker(pytest.mark.lesson(name))
+            item.add_marker(pytest.mark.xdist_group('+'.join(sorted(group))))
+            yield item
+
+
+class ExampleFailure(Exception):
+    def __init__(self, result):
+        super().__init__(result['error'])
+        self.result = result
+
+
+class ExampleItem(pytest.Item):
+    def __init__(self, *, lesson, index, **kwargs):
+        super().__init__(**kwargs)
+        self.lesson = lesson
+        self.index = index
+
+    def runtest(self):
+        result = workspace(self.config).run(self.lesson, self.index)
+        if result['status'] == 'skipped':
+            pytest.skip('example has no SQL')
+        if result['status'] in validation_api.FAILED:
+            raise ExampleFailure(result)
+
+    def repr_failure(self, excinfo):
+        if isinstance(excinfo.value, ExampleFailure):
+            r = excinfo.value.result
+            sql = workspace(self.config).sessions[self.lesson].examples[self.index].get('sql', '')
+            return f"{r['status'].upper().replace('_', ' ')}: {r['error']}\n\n{sql}"
+        return super().repr_failure(excinfo)
+
+    def reportinfo(self):
+        return self.path, None, f'{self.lesson}:{self.name}'
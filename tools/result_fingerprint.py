@@ -0,0 +1,172 @@
+"""
+Streaming result fingerprints and the expected-results store for
+tools/validate_duckdb_examples.py --fingerprint.
+
+The result of an example's last statement is streamed as Arrow record batches and scanned by
+a scratch DuckDB connection that reduces it to (row count, hash) without building Python rows:
+
+    unordered:  sum of md5(row::VARCHAR) over all rows (duplicates counted, order ignored)
+    ordered:    sum of md5(position || row::VARCHAR), so any reordering changes the hash
+
+`--fingerprint auto` (the default) hashes order-aware only when the last statement has a
+top-level ORDER BY; unordered results may legitimately come back in any order.
+
+Fingerprints are compared against examples/expected/fingerprints.json, keyed by
+`<lesson>:<example>`. Entries also store a hash of the example's SQL (and the SQL before it in
+the lesson, without the DuckDB version), so editing an example re-records it instead of failing,
+while a DuckDB upgrade that changes results is reported as a mismatch. Requires pyarrow.
+"""
+import hashlib
+import json
+import os
+import re
+
+import sql_statements
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXPECTED_PATH = os.path.join(ROOT, 'examples', 'expected', 'fingerprints.json')
+BATCH_ROWS = 64 * 1024
+
+order_by_re = re.compile(r'\bORDER\s+BY\b', re.IGNORECASE)
+
+UNORDERED_SQL = """
+SELECT count(*), sum(md5_number_upper(t::VARCHAR)), sum(md5_number_lower(t::VARCHAR))
+FROM fp_src AS t
+"""
+ORDERED_SQL = """
+SELECT count(*), sum(md5_number_upper(rn::VARCHAR || ':' || r::VARCHAR)), sum(md5_number_lower(rn::VARCHAR || ':' || r::VARCHAR))
+FROM (SELECT row_number() OVER () AS rn, t AS r FROM fp_src AS t)
+"""
+BOTH_SQL = """
+SELECT count(*),
+       sum(md5_number_upper(rn::VARCHAR || ':' || r::VARCHAR)), sum(md5_number_lower(rn::VARCHAR || ':' || r::VARCHAR)),
+       sum(md5_number_upper(r::VARCHAR)), sum(md5_number_lower(r::VARCHAR))
+FROM (SELECT row_number() OVER () AS rn, t AS r FROM fp_src AS t)
+"""
+
+
+def has_top_level_order_by(sql):
+    """True when `sql` has an ORDER BY outside any parentheses (i.e. not in OVER/subqueries)."""
+    sql = sql_statements.string_re.sub("''", sql_statements.comment_re.sub('', sql))
+    depth = 0
+    flat = []
+    for ch in sql:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        flat.append(ch if depth == 0 else ' ')
+    return order_by_re.search(''.join(flat)) is not None
+
+
+def arrow_reader(res, batch_rows=BATCH_ROWS):
+    to_reader = getattr(res, 'to_arrow_reader', None)
+    if to_reader is not None:
+        return to_reader(batch_rows)
+    return res.fetch_record_batch(batch_rows)
+
+
+_scratch = None
+
+
+def scratch_connection():
+    """Per-process connection used only to reduce Arrow streams to hashes."""
+    global _scratch
+    if _scratch is None:
+        import duckdb
+        _scratch = duckdb.connect()
+        _scratch.execute('PRAGMA threads=1')
+    return _scratch
+
+
+def _reduce(res, sql, scratch=None):
+    """Stream `res` into `sql` on a scratch connection -> (its result row, sample_row), or None
+    for an empty result. Consumes the result."""
+    import pyarrow as pa
+
+    scratch = scratch or scratch_connection()
+    reader = arrow_reader(res)
+    first = None
+    for batch in reader:
+        if batch.num_rows:
+            first = batch
+            break
+    if first is None:
+        return None
+    sample_row = tuple(first.slice(0, 1).to_pylist()[0].values())
+
+    def batches():
+        yield first
+        yield from reader
+
+    src = pa.RecordBatchReader.from_batches(first.schema, batches())
+    scratch.register('fp_src', src)
+    try:
+        return scratch.execute(sql).fetchone(), sample_row
+    finally:
+        scratch.unregister('fp_src')
+
+
+def _digest(ordered, upper, lower):
+    return hashlib.sha256(f'{"o" if ordered else "u"}:{upper}:{lower}'.encode()).hexdigest()[:32]
+
+
+def fingerprint(res, ordered, scratch=None):
+    """Stream `res` through a scratch connection -> (rows, hash, sample_row). Consumes the result."""
+    out = _reduce(res, ORDERED_SQL if ordered else UNORDERED_SQL, scratch)
+    if out is None:
+        return 0, None, None
+    (n, upper, lower), sample_row = out
+    return n, _digest(ordered, upper, lower), sample_row
+
+
+def fingerprints(res, scratch=None):
+    """Both hashes in one pass -> (rows, ordered hash, unordered hash, sample_row). Consumes the result."""
+    out = _reduce(res, BOTH_SQL, scratch)
+    if out is None:
+        return 0, None, None, None
+    (n, o_upper, o_lower, u_upper, u_lower), sample_row = out
+    return n, _digest(True, o_upper, o_lower), _digest(False, u_upper, u_lower), sample_row
+
+
+class ExpectedStore:
+    def __init__(self, path=EXPECTED_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def check(self, key, sql_key, rows, digest, update=False):
+        """Compare a fingerprint with the stored one.
+
+        Returns 'match', 'mismatch', 'new' or 'rerecorded' (the example's SQL changed);
+        new/rerecorded entries, and mismatches when `update` is set, are written back.
+        """
+        cur = self.entries.get(key)
+        fp = {'sql': sql_key, 'rows': rows, 'hash': digest}
+        if cur is None:
+            verdict = 'new'
+        elif cur.get('sql') != sql_key:
+            verdict = 'rerecorded'
+        elif cur.get('rows') == rows and cur.get('hash') == digest:
+            return 'match'
+        else:
+            if not update:
+                return 'mismatch'
+            verdict = 'rerecorded'
+        self.entries[key] = fp
+        self.dirty = True
+        return verdict
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(dict(sorted(self.entries.items())), f, indent=2)
+            f.write('\n')
+        os.replace(tmp, self.path)
+        self.dirty = False
@@ -0,0 +1,317 @@
+"""
+Run-history warehouse for tools/validate_duckdb_examples.py.
+
+Every validator run (unless --no-history) is appended to a local DuckDB file,
+.cache/run_history.duckdb, with two tables:
+
+    runs     run_id, started_at, finished_at, git commit, DuckDB version, host, platform,
+             threads, jobs, shard, source ('run' or 'merge'), examples, errors, partial,
+             instrumentation (e.g. 'profile,memory'; '' for a plain run), seeds (--seeds format)
+    results  run_id, lesson, idx, name, sql_key, status, wall_ms, sample_hash, error
+
+`sql_key` hashes the example's SQL and the SQL before it in its lesson, so an edited example
+starts a new series instead of looking slower or flaky. `wall_ms` is NULL for results served
+from the cache. `sample_hash` is a hash of the reported sample row.
+
+Timing queries (trend, lessons, regressions) only use complete, uninstrumented runs:
+--profile, --memory, --memory-budget, --plans and --fingerprint slow examples down. Each
+example's series is further split by thread count and --seeds format, so runs are only
+compared with runs that executed the same way.
+
+The CLI answers trend questions with SQL over those tables:
+
+    runs          the latest runs
+    trend         examples whose wall time grew most over the last --days (slope of a linear
+                  fit over time and the ratio of the medians of the newest and the oldest up
+                  to 3 runs, taken from disjoint halves of the series)
+    flaky         examples whose status or sample row changed between runs with unchanged SQL
+                  and DuckDB version; volatile examples (determinism_check.volatile_keys) are
+                  left out unless --include-volatile
+    lessons       per-lesson runtime per day
+    regressions   examples whose wall time in the latest --recent timed runs is significantly
+                  above their rolling baseline: the --baseline timed runs before them. The
+                  baseline's median and MAD give a robust z-score (MAD scaled by 1.4826); an
+                  example is flagged when z >= --z, the slowdown is at least --min-ratio and
+                  --min-ms
+    export DIR    write both tables as Parquet files to DIR
+
+Usage:
+    python tools/run_history.py runs
+    python tools/run_history.py trend --days 30 --top 20
+    python tools/run_history.py regressions --baseline 20 --recent 3
+    python tools/run_history.py export .cache/history-parquet
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import platform
+import socket
+import subprocess
+import sys
+
+import duckdb
+
+import validation_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(ROOT, '.cache', 'run_history.duckdb')
+
+SCHEMA = """
+CREATE SEQUENCE IF NOT EXISTS run_ids;
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY, started_at TIMESTAMP, finished_at TIMESTAMP, commit VARCHAR, duckdb_version VARCHAR,
+    host VARCHAR, platform VARCHAR, threads INTEGER, jobs INTEGER, shard VARCHAR, source VARCHAR,
+    examples INTEGER, errors INTEGER, partial BOOLEAN
+);
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS instrumentation VARCHAR;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS seeds VARCHAR;
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER, lesson VARCHAR, idx INTEGER, name VARCHAR, sql_key VARCHAR, status VARCHAR,
+    wall_ms DOUBLE, sample_hash VARCHAR, error VARCHAR
+);
+"""
+
+
+def open_store(path=HISTORY_PATH, read_only=False):
+    if read_only:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'no run history at {path}; run the validator first')
+        con = duckdb.connect(path, read_only=True)
+        if con.execute("SELECT count(*) FROM duckdb_columns() WHERE table_name = 'runs' AND column_name = 'seeds'").fetchone()[0]:
+            return con
+        # a history written before the latest columns were added: migrate it first
+        con.close()
+        open_store(path).close()
+        return duckdb.connect(path, read_only=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = duckdb.connect(path)
+    con.execute(SCHEMA)
+    return con
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def sample_hash(row):
+    return None if row is None else hashlib.sha256(repr(tuple(row)).encode()).hexdigest()[:16]
+
+
+def record(report, sql_keys, path=HISTORY_PATH, started_at=None, threads=1, jobs=1, shard=None, source='run', partial=False,
+           instrumentation=(), seeds=None):
+    """Append one run to the history; `sql_keys` maps (lesson, index) to the example's SQL key.
+
+    `instrumentation` names the options that slowed the run down (see the module docstring).
+
+    Returns the new run_id.
+    """
+    cols = {k: [] for k in ('lesson', 'idx', 'name', 'sql_key', 'status', 'wall_ms', 'sample_hash', 'error')}
+    for f in report:
+        lesson = validation_report.lesson_name(f['file'])
+        idx = 0
+        for s in f['sections']:
+            for ex in s['examples']:
+                i = ex.get('index', idx)
+                cols['lesson'].append(lesson)
+                cols['idx'].append(i)
+                cols['name'].append(ex['name'])
+                cols['sql_key'].append(sql_keys.get((lesson, i)))
+                cols['status'].append(ex['status'])
+                cols['wall_ms'].append(ex.get('wall_ms'))
+                cols['sample_hash'].append(sample_hash(ex.get('sample_row')))
+                cols['error'].append(None if ex.get('error') is None else str(ex['error']))
+                idx += 1
+    con = open_store(path)
+    try:
+        con.execute('BEGIN')
+        run_id = con.execute("SELECT nextval('run_ids')").fetchone()[0]
+        con.execute('INSERT INTO runs (run_id, started_at, finished_at, commit, duckdb_version, host, platform, threads, jobs, shard, '
+                    'source, examples, errors, partial, instrumentation, seeds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+            run_id, started_at or datetime.datetime.now(), datetime.datetime.now(), git_commit(), duckdb.__version__,
+            socket.gethostname(), platform.platform(), threads, jobs, shard, source,
+            len(cols['status']), sum(st in validation_report.FAILED for st in cols['status']), partial,
+            ','.join(sorted(instrumentation)), seeds,
+        ])
+        if cols['status']:
+            con.execute('INSERT INTO results SELECT ?, ' + ', '.join('unnest(?)' for _ in cols), [run_id, *cols.values()])
+        con.execute('COMMIT')
+    finally:
+        con.close()
+    return run_id
+
+
+# timed results of complete, uninstrumented runs, one row per (run, example); `series` is the
+# example's SQL key with the thread count and seeds format (runs recorded before those columns
+# existed count as plain)
+TIMED = """
+SELECT r.run_id, r.started_at, x.lesson, x.name, x.sql_key, x.wall_ms,
+       concat_ws('|', x.sql_key, r.threads, coalesce(r.seeds, '')) AS series
+FROM results x JOIN runs r USING (run_id)
+WHERE x.wall_ms IS NOT NULL AND x.status = 'ok' AND NOT r.partial AND coalesce(r.instrumentation, '') = ''
+"""
+
+QUERIES = {
+    'runs': """
+        SELECT run_id, strftime(started_at, '%Y-%m-%d %H:%M') AS started, left(commit, 10) AS commit, duckdb_version AS duckdb,
+               host, threads, jobs, coalesce(shard, '') AS shard, source, examples, errors,
+               round(epoch(finished_at - started_at), 1) AS secs, partial
+        FROM runs ORDER BY run_id DESC LIMIT $top
+    """,
+    'trend': f"""
+        WITH t AS ({TIMED} AND r.started_at >= now()::TIMESTAMP - to_days($days)),
+        runs_per AS (
+            SELECT lesson, name, series, count(*) AS n,
+                   regr_slope(wall_ms, epoch(started_at) / 86400.0) AS ms_per_day,
+                   min(started_at) AS first_at, max(started_at) AS last_at
+            FROM t GROUP BY ALL HAVING count(*) >= $min_runs
+        ),
+        ends AS (
+            -- the oldest and newest up to 3 runs, never overlapping, so short series are not biased towards 1
+            SELECT lesson, name, series,
+                   median(wall_ms) FILTER (WHERE rk_old <= least(3, n // 2)) AS first_ms,
+                   median(wall_ms) FILTER (WHERE rk_new <= least(3, n // 2)) AS last_ms
+            FROM (SELECT *, row_number() OVER (PARTITION BY lesson, name, series ORDER BY started_at) AS rk_old,
+                            row_number() OVER (PARTITION BY lesson, name, series ORDER BY started_at DESC) AS rk_new,
+                            count(*) OVER (PARTITION BY lesson, name, series) AS n FROM t)
+            GROUP BY ALL
+        )
+        SELECT lesson, name, n AS runs, round(first_ms, 2) AS first_ms, round(last_ms, 2) AS last_ms,
+               round(last_ms / nullif(first_ms, 0), 2) AS ratio, round(ms_per_day, 3) AS ms_per_day
+        FROM runs_per JOIN ends USING (lesson, name, series)
+        WHERE ms_per_day > 0
+        ORDER BY ratio DESC NULLS LAST, ms_per_day DESC LIMIT $top
+    """,
+    'flaky': """
+        SELECT x.lesson, x.name, r.duckdb_version AS duckdb, count(*) AS runs,
+               count(DISTINCT x.status) AS statuses, count(DISTINCT coalesce(x.sample_hash, '')) AS samples,
+               string_agg(DISTINCT x.status, ', ' ORDER BY x.status) AS seen, strftime(max(r.started_at), '%Y-%m-%d %H:%M') AS last_seen
+        FROM results x JOIN runs r USING (run_id)
+        WHERE x.status <> 'skipped' AND x.status <> 'missing' AND r.started_at >= now()::TIMESTAMP - to_days($days)
+          AND NOT coalesce(list_contains($volatile::VARCHAR[], x.sql_key), false)
+        GROUP BY x.lesson, x.name, x.sql_key, r.duckdb_version
+        HAVING count(DISTINCT x.status) > 1 OR count(DISTINCT coalesce(x.sample_hash, '')) > 1
+        ORDER BY statuses DESC, samples DESC, runs DESC LIMIT $top
+    """,
+    'lessons': f"""
+        WITH per_run AS (
+            SELECT run_id, started_at, lesson, sum(wall_ms) AS ms, count(*) AS examples
+            FROM ({TIMED} AND r.started_at >= now()::TIMESTAMP - to_days($days)) GROUP BY ALL
+        )
+        SELECT lesson, started_at::DATE AS day, count(*) AS runs, round(median(ms), 2) AS median_ms,
+               round(min(ms), 2) AS min_ms, round(max(ms), 2) AS max_ms
+        FROM per_run GROUP BY ALL ORDER BY lesson, day
+    """,
+    'regressions': f"""
+        WITH t AS (
+            SELECT *, row_number() OVER (PARTITION BY lesson, name, series ORDER BY run_id DESC) AS rk
+            FROM ({TIMED})
+        ),
+        recent AS (SELECT lesson, name, series, median(wall_ms) AS ms, count(*) AS n FROM t WHERE rk <= $recent GROUP BY ALL),
+        base AS (
+            SELECT lesson, name, series, median(wall_ms) AS ms, mad(wall_ms) AS mad, count(*) AS n
+            FROM t WHERE rk > $recent AND rk <= $recent + $baseline GROUP BY ALL
+        ),
+        scored AS (
+            SELECT recent.lesson, recent.name, base.n AS baseline_runs, base.ms AS baseline_ms, recent.ms AS recent_ms,
+                   recent.ms / nullif(base.ms, 0) AS ratio,
+                   (recent.ms - base.ms) / greatest(1.4826 * base.mad, 0.05 * base.ms, 0.01) AS z
+            FROM recent JOIN base USING (lesson, name, series)
+            WHERE base.n >= $min_runs
+        )
+        SELECT lesson, name, baseline_runs, round(baseline_ms, 2) AS baseline_ms, round(recent_ms, 2) AS recent_ms,
+               round(ratio, 2) AS ratio, round(z, 1) AS z
+        FROM scored
+        WHERE z >= $z AND ratio >= $min_ratio AND recent_ms - baseline_ms >= $min_ms
+        ORDER BY z DESC LIMIT $top
+    """,
+}
+
+
+def query(con, name, **params):
+    """(column names, rows) of one of QUERIES; unused parameters are dropped."""
+    sql = QUERIES[name]
+    res = con.execute(sql, {k: v for k, v in params.items() if f'${k}' in sql})
+    return [d[0] for d in res.description], res.fetchall()
+
+
+def volatile_sql_keys():
+    """SQL keys of the examples currently known to be volatile (see determinism_check.volatile_keys)."""
+    import determinism_check
+    import lesson_corpus
+    import validate_duckdb_examples as validator
+
+    lessons = list(lesson_corpus.load())
+    volatile = determinism_check.volatile_keys(lessons)
+    return [sql_key for les in lessons for key, sql_key in validator.example_keys(les) if key in volatile]
+
+
+def export(con, directory):
+    os.makedirs(directory, exist_ok=True)
+    for table in ('runs', 'results'):
+        con.execute(f"COPY {table} TO '{os.path.join(directory, table + '.parquet')}' (FORMAT parquet)")
+
+
+def print_table(columns, rows):
+    cells = [[('' if v is None else str(v)) for v in row] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print('  '.join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the validator run history')
+    parser.add_argument('--path', default=HISTORY_PATH, help='History database (default: .cache/run_history.duckdb)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('runs', help='List the latest runs')
+    p.add_argument('--top', type=int, default=20)
+    p = sub.add_parser('trend', help='Examples whose wall time grew most')
+    p.add_argument('--days', type=int, default=30)
+    p.add_argument('--min-runs', type=int, default=5, help='Ignore examples timed fewer times (default: 5)')
+    p.add_argument('--top', type=int, default=20)
+    p = sub.add_parser('flaky', help='Examples whose status or sample row changed without a SQL change')
+    p.add_argument('--days', type=int, default=30)
+    p.add_argument('--top', type=int, default=50)
+    p.add_argument('--include-volatile', action='store_true', help='Also list examples marked or recorded as volatile (now(), random(), ...)')
+    p = sub.add_parser('lessons', help='Per-lesson runtime per day')
+    p.add_argument('--days', type=int, default=30)
+    p = sub.add_parser('regressions', help='Examples significantly slower than their rolling baseline')
+    p.add_argument('--recent', type=int, default=3, help='Timed runs that form the current value (default: 3)')
+    p.add_argument('--baseline', type=int, default=20, help='Timed runs before them that form the baseline (default: 20)')
+    p.add_argument('--min-runs', type=int, default=5, help='Smallest usable baseline (default: 5)')
+    p.add_argument('--z', type=float, default=3.5, help='Robust z-score threshold (default: 3.5)')
+    p.add_argument('--min-ratio', type=float, default=1.5, help='Smallest flagged slowdown factor (default: 1.5)')
+    p.add_argument('--min-ms', type=float, default=1.0, help='Smallest flagged slowdown in ms (default: 1)')
+    p.add_argument('--top', type=int, default=50)
+    p = sub.add_parser('export', help='Write the history as Parquet files')
+    p.add_argument('directory')
+    args = parser.parse_args(argv)
+
+    try:
+        con = open_store(args.path, read_only=True)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    try:
+        if args.command == 'export':
+            export(con, args.directory)
+            print('Exported runs and results to', args.directory)
+            return 0
+        params = {k: v for k, v in vars(args).items() if k not in ('path', 'command', 'include_volatile')}
+        if args.command == 'flaky':
+            params['volatile'] = [] if args.include_volatile else volatile_sql_keys()
+        columns, rows = query(con, args.command, **params)
+    finally:
+        con.close()
+    print_table(columns, rows)
+    # regressions exit non-zero, so CI can fail on them
+    return 2 if args.command == 'regressions' and rows else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+Thread / memory_limit scaling matrix for the lesson corpus.
+
+The validator pins `PRAGMA threads=1` so its output is deterministic; this harness measures
+how the lesson queries behave on bigger hosts instead. For every lesson and every
+(threads, memory_limit) pair it opens a fresh in-memory connection with its own
+temp_directory, runs the lesson's setup and inflates the tables to --scale rows
+(benchmark_lessons.prepare_lesson), then times each remaining example:
+
+  - read-only examples (every statement is a SELECT/WITH/FROM/VALUES/TABLE/PIVOT/...) run
+    --warmup times untimed and --repeat times timed; the median is reported
+  - examples that change state run once, in lesson order, so later examples see the same
+    data they do in the validator
+
+While an example runs, a sampler thread polls the temp_directory and records the peak bytes
+spilled. The report gives per-example latency for every configuration, the speedup curve
+relative to threads=1 under the same memory_limit, and spill peaks. Examples whose speedup at
+the highest thread count stays below --min-speedup are summarised as not parallelizing.
+
+Usage:
+    pipenv run python tools/scaling_matrix.py --lesson window --threads 1 --threads 8 \\
+        --memory-limit 256MB --memory-limit 4GB --scale 1000000 --json .cache/matrix.json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import duckdb
+
+import benchmark_lessons
+import lesson_corpus
+import sql_statements
+
+READ_ONLY_RE = re.compile(r'^\s*\(*\s*(SELECT|WITH|FROM|VALUES|TABLE|PIVOT|UNPIVOT|EXPLAIN|SUMMARIZE|DESCRIBE|SHOW)\b', re.IGNORECASE)
+
+
+def default_threads():
+    n = os.cpu_count() or 1
+    out = [1]
+    while out[-1] * 2 <= n:
+        out.append(out[-1] * 2)
+    if out[-1] != n:
+        out.append(n)
+    return out
+
+
+def read_only(sql):
+    stmts = sql_statements.split_statements(sql)
+    return bool(stmts) and all(READ_ONLY_RE.match(sql_statements.comment_re.sub('', s)) for s in stmts)
+
+
+def dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for fn in files:
+            try:
+                total += os.path.getsize(os.path.join(root, fn))
+            except OSError:
+                pass
+    return total
+
+
+class SpillMonitor:
+    """Samples the size of a temp_directory in a background thread; `.peak` is the maximum seen."""
+
+    def __init__(self, path, interval=0.01):
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = dir_bytes(self.path)
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, dir_bytes(self.path))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, dir_bytes(self.path))
+
+
+def run_config(lesson, rows, threads, memory_limit, warmup=1, repeat=3, timeout=None):
+    """Time every post-setup example of `lesson` under one configuration."""
+    tmp = tempfile.mkdtemp(prefix='duckdb_spill_')
+    con = duckdb.connect()
+    out = {'examples': {}}
+    try:
+        con.execute(f'SET threads={int(threads)}')
+        if memory_limit:
+            con.execute(f"SET memory_limit='{memory_limit}'")
+        con.execute(f"SET temp_directory='{tmp}'")
+        setup_error, inflate_errors = benchmark_lessons.prepare_lesson(con, lesson, rows)
+        out['inflate_errors'] = inflate_errors
+        if setup_error:
+            out['setup_error'] = setup_error
+            return out
+        for _, _, ex in lesson.examples[lesson.setup_count:]:
+            sql = ex.get('sql', '')
+            if not sql.strip():
+                continue
+            runs = repeat if read_only(sql) else 1
+            for _ in range(warmup if runs > 1 else 0):
+                benchmark_lessons.timed_execute(con, sql, timeout)
+            times = []
+            spill = 0
+            status, err = 'ok', None
+            for _ in range(runs):
+                with SpillMonitor(tmp) as mon:
+                    status, ms, err = benchmark_lessons.timed_execute(con, sql, timeout)
+                spill = max(spill, mon.peak)
+                if status != 'ok':
+                    break
+                times.append(ms)
+            out['examples'][ex.get('name', '<unnamed>')] = {
+                'status': status,
+                'error': err,
+                'runs': len(times),
+                'ms': statistics.median(times) if status == 'ok' else None,
+                'spill_bytes': spill,
+            }
+    finally:
+        con.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+
+def run(lessons, rows, threads, memory_limits, warmup=1, repeat=3, timeout=None, min_ms=1.0, min_speedup=1.2, progress=None):
+    report = []
+    for lesson in lessons:
+        configs = {}
+        for mem in memory_limits:
+            for t in threads:
+                if progress:
+                    progress(lesson, t, mem)
+                configs[(t, mem)] = run_config(lesson, rows, t, mem, warmup=warmup, repeat=repeat, timeout=timeout)
+        errors = [c['setup_error'] for c in configs.values() if 'setup_error' in c]
+        names = []
+        for c in configs.values():
+            names.extend(n for n in c['examples'] if n not in names)
+        examples = []
+        for name in names:
+            curves = {}
+            for mem in memory_limits:
+                base = configs[(threads[0], mem)]['examples'].get(name, {}).get('ms')
+                curve = []
+                for t in threads:
+                    e = configs[(t, mem)]['examples'].get(name)
+                    if e is None:
+                        continue
+                    speedup = base / e['ms'] if base and e['ms'] else None
+                    curve.append(dict(e, threads=t, speedup=speedup))
+                curves[mem or 'default'] = curve
+            # judge parallelism under the last --memory-limit given, at the highest thread count
+            top = next(reversed(curves.values()))
+            last = top[-1] if top else None
+            base_ms = top[0]['ms'] if top else None
+            serial = (len(threads) > 1 and last is not None and last['speedup'] is not None
+                      and base_ms is not None and base_ms >= min_ms and last['speedup'] < min_speedup)
+            examples.append({
+                'name': name,
+                'curves': curves,
+                'spills': any(e['spill_bytes'] for curve in curves.values() for e in curve),
+                'not_parallel': serial,
+            })
+        report.append({
+            'lesson': lesson.name,
+            'setup_error': errors[0] if errors else None,
+            'inflate_errors': {f'{t}/{m or "default"}': c['inflate_errors'] for (t, m), c in configs.items() if c.get('inflate_errors')},
+            'examples': examples,
+        })
+    return report
+
+
+def fmt_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f'{n:.0f}{unit}' if unit == 'B' else f'{n:.1f}{unit}'
+        n /= 1024.0
+
+
+def print_report(report, threads, memory_limits):
+    head = ''.join(f'{"t=" + str(t):>11}' for t in threads)
+    for les in report:
+        print(f"\nLESSON: {les['lesson']}")
+        if les['setup_error']:
+            print(f"  setup failed: {les['setup_error']}")
+            continue
+        for cfg, errs in les['inflate_errors'].items():
+            for table, err in errs.items():
+                print(f'  could not inflate {table} ({cfg}): {err}')
+        for mem in memory_limits:
+            print(f"  memory_limit={mem or 'default'}")
+            print(f"    {'example (ms)':<40}{head}{'speedup':>9}{'spill':>10}")
+            for e in les['examples']:
+                curve = e['curves'][mem or 'default']
+                by_t = {c['threads']: c for c in curve}
+                cells = ''
+                for t in threads:
+                    c = by_t.get(t)
+                    if c is None:
+                        cells += f'{"":>11}'
+                    elif c['status'] != 'ok':
+                        cells += f"{c['status']:>11}"
+                    else:
+                        cells += f"{c['ms']:11.2f}"
+                last = curve[-1] if curve else None
+                speedup = f"{last['speedup']:8.2f}x" if last and last['speedup'] else f'{"-":>9}'
+                spill = max((c['spill_bytes'] for c in curve), default=0)
+                flag = '  NOT PARALLEL' if e['not_parallel'] and mem == memory_limits[-1] else ''
+                print(f"    {e['name'][:39]:<40}{cells}{speedup}{fmt_bytes(spill) if spill else '-':>10}{flag}")
+    serial = [(les['lesson'], e['name']) for les in report for e in les['examples'] if e['not_parallel']]
+    spilled = [(les['lesson'], e['name']) for les in report for e in les['examples'] if e['spills']]
+    print(f'\nExamples that do not parallelize: {len(serial)}')
+    for lesson, name in serial:
+        print(f'  {lesson}:{name}')
+    print(f'Examples that spilled to temp_directory: {len(spilled)}')
+    for lesson, name in spilled:
+        print(f'  {lesson}:{name}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run lesson examples across a matrix of DuckDB threads and memory_limit settings')
+    parser.add_argument('--lesson', action='append', metavar='NAME', help='Only run these lessons (default: all)')
+    parser.add_argument('--threads', type=int, action='append', metavar='N', help='Thread count; repeat for several (default: 1, 2, 4, ... up to the CPU count)')
+    parser.add_argument('--memory-limit', action='append', metavar='SIZE', help="memory_limit value such as 256MB; repeat for several (default: DuckDB's default)")
+    parser.add_argument('--scale', type=int, default=1_000_000, help='Inflate lesson tables to this many rows, 0 keeps the seed data (default: 1000000)')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed runs of each read-only example (default: 1)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs of each read-only example; the median is reported (default: 3)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds before a run is interrupted (default: 60, 0 disables)')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='Ignore examples faster than this at threads=1 when judging parallelism (default: 1)')
+    parser.add_argument('--min-speedup', type=float, default=1.2, help='Speedup at the highest thread count below which an example counts as not parallelizing (default: 1.2)')
+    parser.add_argument('--json', metavar='PATH', default=None, help='Also write the report as JSON to PATH')
+    args = parser.parse_args(argv)
+    threads = sorted(set(args.threads or default_threads()))
+    if threads[0] < 1:
+        parser.error('--threads must be >= 1')
+    if args.repeat < 1 or args.warmup < 0:
+        parser.error('--repeat must be >= 1 and --warmup >= 0')
+    memory_limits = args.memory_limit or [None]
+
+    corpus = lesson_corpus.load()
+    lessons = list(corpus)
+    if args.lesson:
+        missing = [n for n in args.lesson if n not in corpus.lessons]
+        if missing:
+            parser.error('unknown lesson(s): ' + ', '.join(missing))
+        lessons = [corpus.lessons[n] for n in args.lesson]
+
+    def progress(lesson, t, mem):
+        print(f"  {lesson.name} threads={t} memory_limit={mem or 'default'} ...", file=sys.stderr)
+
+    report = run(lessons, args.scale, threads, memory_limits, warmup=args.warmup, repeat=args.repeat,
+                 timeout=args.timeout or None, min_ms=args.min_ms, min_speedup=args.min_speedup, progress=progress)
+    print_report(report, threads, memory_limits)
+    if args.json:
+        d = os.path.dirname(args.json)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        out = {
+            'duckdb_version': duckdb.__version__,
+            'cpu_count': os.cpu_count(),
+            'scale': args.scale,
+            'threads': threads,
+            'memory_limits': memory_limits,
+            'lessons': report,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(out, f, indent=2, default=str)
+        print(f'\nReport written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Columnar fixtures for the lessons' seed rows.
+
+Lessons fill their tables with literal `INSERT INTO <table> [(<columns>)] VALUES (...), ...`
+statements. This converter replays every lesson as the validator does and, for each such
+statement whose values are all constants (numbers, strings, NULL/TRUE/FALSE, typed literals
+like DATE '...' and ::casts; no functions, DEFAULT, ON CONFLICT or RETURNING), first inserts the
+same VALUES into an empty temp copy of the target columns, so the rows carry exactly the types
+the INSERT would cast them to, and writes that copy to Parquet and, with pyarrow, to an Arrow
+IPC file:
+
+    .cache/seeds/<lesson>/manifest.json
+    .cache/seeds/<lesson>/<example key>-<statement>.parquet / .arrow
+
+The example key is the validator's cache key (a hash of the example's SQL, the SQL before it
+and the DuckDB version), so editing a lesson or upgrading DuckDB rebuilds its fixtures, and
+load() rebuilds a lesson whose manifest does not cover every example. Statements whose INSERT
+fails during the replay get no fixture.
+
+validate_duckdb_examples.py --seeds parquet|arrow then runs each converted statement as
+`INSERT INTO <table> [(<columns>)] SELECT * FROM read_parquet(...)`, or from the Arrow table
+registered zero-copy from the memory-mapped IPC file, instead of the literal VALUES. Column
+defaults, sequences and constraints still apply, in the same row order.
+
+--check replays every lesson on two connections, one with the INSERTs and one loading the
+fixtures, and after each example that loads one compares the status of the example and the
+types and an order-aware hash (result_fingerprint.fingerprints) of the loaded columns of every
+table; it exits with 1 on any difference. Requires pyarrow.
+
+Usage:
+    python tools/seed_fixtures.py                        # convert the lessons (changed ones only)
+    python tools/seed_fixtures.py --check                # ... and compare both ways of loading
+    python tools/seed_fixtures.py --lesson agg --force --check --format arrow
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import uuid
+
+import duckdb
+
+import lesson_corpus
+import parquet_fixtures
+import result_fingerprint
+import sql_statements
+import validate_duckdb_examples as validator
+import validation_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_DIR = os.path.join(ROOT, '.cache', 'seeds')
+FORMATS = ('parquet', 'arrow')
+CAPTURE_TABLE = 'temp.main.seed_fixture_capture'
+ARROW_VIEW = 'seed_fixture_rows'
+
+insert_re = re.compile(r'\s*INSERT\s+INTO\s+(?P<table>(?:"[^"]*"|\w+)(?:\s*\.\s*(?:"[^"]*"|\w+))*)\s*'
+                       r'(?P<columns>\([^()]*\))?\s*VALUES\b(?P<values>.*)', re.IGNORECASE | re.DOTALL)
+
+# words a constant VALUES list may contain besides type names after ::
+LITERAL_WORDS = {'NULL', 'TRUE', 'FALSE', 'DATE', 'TIME', 'TIMESTAMP', 'TIMESTAMPTZ', 'INTERVAL',
+                 'YEAR', 'YEARS', 'MONTH', 'MONTHS', 'DAY', 'DAYS', 'HOUR', 'HOURS', 'MINUTE', 'MINUTES', 'SECOND', 'SECONDS'}
+
+
+def _constant_rows(values):
+    """Whether `values` (the text after VALUES) is a list of tuples of constants."""
+    depth = 0
+    tuples = 0
+    prev = []
+    for kind, text in sql_statements.iter_tokens(values):
+        if depth == 0:
+            if kind != 'punct' or text not in '(,':
+                return False
+            if text == '(':
+                depth, tuples = 1, tuples + 1
+        elif kind == 'word' and text.upper() not in LITERAL_WORDS and prev[-2:] != [':', ':']:
+            return False
+        elif kind == 'punct':
+            if text in '?$;':
+                return False
+            depth += {'(': 1, ')': -1}.get(text, 0)
+        prev.append(text)
+    return depth == 0 and tuples > 0
+
+
+def parse_insert(stmt):
+    """(table, column list or None, values text) of a constant INSERT ... VALUES, else None."""
+    m = insert_re.match(stmt)
+    if not m or not _constant_rows(m.group('values')):
+        return None
+    return m.group('table'), m.group('columns'), m.group('values')
+
+
+class Seed:
+    """The rows of one converted INSERT ... VALUES statement, loaded in bulk by `load(con)`."""
+
+    def __init__(self, table, columns, path, fmt='parquet'):
+        self.table = table
+        self.columns = columns
+        self.path = path
+        self.fmt = fmt
+
+    def insert_sql(self, source):
+        return f"INSERT INTO {self.table}{' ' + self.columns if self.columns else ''} SELECT * FROM {source}"
+
+    def load(self, con):
+        """Insert the rows into the table on `con`; returns the INSERT's result like con.execute()."""
+        if self.fmt == 'parquet':
+            return con.execute(self.insert_sql(f'read_parquet({sql_statements.sql_string(self.path + ".parquet")})'))
+        import pyarrow as pa
+
+        # the table's buffers point into the mapped file; nothing is copied until DuckDB inserts
+        rows = pa.ipc.open_file(pa.memory_map(self.path + '.arrow')).read_all()
+        con.register(ARROW_VIEW, rows)
+        try:
+            return con.execute(self.insert_sql(ARROW_VIEW))
+        finally:
+            con.unregister(ARROW_VIEW)
+
+
+def _capture(con, parsed, path, arrow):
+    """Write the rows a parse_insert() result would insert to `path`.parquet (and .arrow);
+    returns the row count, or None when they cannot be captured."""
+    table, columns, values = parsed
+    select = columns[1:-1] if columns else '*'
+    try:
+        con.execute(f'CREATE TEMP TABLE {CAPTURE_TABLE} AS SELECT {select} FROM {table} LIMIT 0')
+    except duckdb.Error:
+        return None
+    try:
+        n = con.execute(f'INSERT INTO {CAPTURE_TABLE} VALUES {values}').fetchone()[0]
+        con.execute(f'COPY {CAPTURE_TABLE} TO {sql_statements.sql_string(path + ".parquet")} (FORMAT parquet)')
+        if arrow:
+            import pyarrow as pa
+
+            rows = con.execute(f'SELECT * FROM {CAPTURE_TABLE}').to_arrow_table()
+            with pa.OSFile(path + '.arrow', 'wb') as sink, pa.ipc.new_file(sink, rows.schema) as writer:
+                writer.write_table(rows)
+        return n
+    except duckdb.Error:
+        return None
+    finally:
+        try:
+            con.execute(f'DROP TABLE IF EXISTS {CAPTURE_TABLE}')
+        except duckdb.Error:
+            # an aborted transaction rolls the capture table back with it
+            pass
+
+
+def lesson_dir(name, directory=SEED_DIR):
+    return os.path.join(directory, name)
+
+
+def read_manifest(name, directory=SEED_DIR):
+    path = os.path.join(lesson_dir(name, directory), 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_lesson(lesson, directory=SEED_DIR, search_path=None, timeout=None):
+    """Replay `lesson` and convert its constant INSERT ... VALUES statements; returns its manifest."""
+    try:
+        import pyarrow  # noqa: F401
+        arrow = True
+    except ImportError:
+        arrow = False
+    root = lesson_dir(lesson.name, directory)
+    tmp = f'{root}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(tmp)
+    manifest = {}
+    con = validator.connect(search_path=search_path)
+    try:
+        for key, (_, _, ex) in zip(validation_cache.lesson_keys(lesson.data), lesson.examples):
+            seeds = manifest[key] = []
+            for i, stmt in enumerate(sql_statements.split_statements(ex.get('sql', '')), 1):
+                parsed = parse_insert(stmt)
+                name = f'{key[:16]}-{i}'
+                rows = _capture(con, parsed, os.path.join(tmp, name), arrow) if parsed else None
+                try:
+                    with validator.Watchdog(con, timeout):
+                        con.execute(stmt)
+                except duckdb.Error:
+                    # the validator stops the example here too
+                    break
+                if rows is not None:
+                    seeds.append({'statement': i, 'table': parsed[0], 'columns': parsed[1], 'rows': rows, 'file': name})
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        if os.path.exists(root):
+            shutil.rmtree(root)
+        os.replace(tmp, root)
+    finally:
+        con.close()
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp, ignore_errors=True)
+    return manifest
+
+
+def load(lessons, fmt='parquet', directory=SEED_DIR, search_path=None, force=False, timeout=None):
+    """{lesson name: {example index: {statement number: Seed}}} for `lessons`, converting the
+    lessons whose fixtures are missing or stale."""
+    out = {}
+    for les in lessons:
+        keys = validation_cache.lesson_keys(les.data)
+        manifest = {} if force else read_manifest(les.name, directory)
+        if any(k not in manifest for k in keys):
+            manifest = build_lesson(les, directory, search_path, timeout)
+        root = lesson_dir(les.name, directory)
+        for idx, key in enumerate(keys):
+            for s in manifest[key]:
+                seed = Seed(s['table'], s['columns'], os.path.join(root, s['file']), fmt)
+                if fmt == 'parquet' or os.path.exists(seed.path + '.arrow'):
+                    out.setdefault(les.name, {}).setdefault(idx, {})[s['statement']] = seed
+    return out
+
+
+def table_state(con, table, columns='*'):
+    """(column names and types, rows, order-aware hash) of `columns` of `table`, or None when it
+    cannot be read."""
+    try:
+        types = [tuple(r[:2]) for r in con.execute(f'DESCRIBE SELECT {columns} FROM {table}').fetchall()]
+        n, ordered, _, _ = result_fingerprint.fingerprints(con.execute(f'SELECT {columns} FROM {table}'))
+    except duckdb.Error:
+        return None
+    return types, n, ordered
+
+
+def check_lesson(lesson, seeds, search_path=None, timeout=None):
+    """Replay `lesson` with its INSERTs and with `seeds` ({example index: {statement: Seed}}) side
+    by side; returns [(example key, table or None, difference)]."""
+    plain = validator.connect(search_path=search_path)
+    bulk = validator.connect(search_path=search_path)
+    out = []
+    try:
+        for idx, ((key, _), (_, _, ex)) in enumerate(zip(validator.example_keys(lesson), lesson.examples)):
+            a = validator.run_example(plain, ex, timeout=timeout)
+            b = validator.run_example(bulk, ex, timeout=timeout, seeds=seeds.get(idx))
+            if (a['status'], a['error']) != (b['status'], b['error']):
+                out.append((key, None, f"{a['status']} with INSERT ... VALUES, {b['status']} with fixtures: {b['error'] or a['error']}"))
+            loaded = {}
+            for s in seeds.get(idx, {}).values():
+                loaded.setdefault(s.table, []).append(s.columns)
+            for table, lists in loaded.items():
+                # columns the INSERT leaves out get their defaults (e.g. CURRENT_TIMESTAMP) either way
+                columns = '*' if None in lists or len(set(lists)) > 1 else lists[0][1:-1]
+                before, after = table_state(plain, table, columns), table_state(bulk, table, columns)
+                if before != after:
+                    what = 'column types' if before and after and before[0] != after[0] else 'rows'
+                    out.append((key, table, f'{what} differ'))
+    finally:
+        plain.close()
+        bulk.close()
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert the lessons\' literal INSERT ... VALUES seed rows to Parquet/Arrow fixtures')
+    parser.add_argument('--lesson', action='append', metavar='NAME', help='Only these lessons (default: all)')
+    parser.add_argument('--force', action='store_true', help='Rebuild the fixtures even if they are up to date')
+    parser.add_argument('--check', action='store_true', help='Compare the tables loaded from the fixtures with the ones the INSERTs build')
+    parser.add_argument('--format', choices=FORMATS, action='append', help='Fixture format to --check; repeatable (default: both)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds before a statement is interrupted (default: 60, 0 disables)')
+    parser.add_argument('--no-fixtures', action='store_true', help='Do not build the Parquet fixtures or point file_search_path at them')
+    args = parser.parse_args(argv)
+    if args.check:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error('--check needs pyarrow: pip install pyarrow')
+
+    corpus = lesson_corpus.load()
+    lessons = list(corpus)
+    if args.lesson:
+        missing = [n for n in args.lesson if n not in corpus.lessons]
+        if missing:
+            parser.error('unknown lesson(s): ' + ', '.join(missing))
+        lessons = [corpus.lessons[n] for n in args.lesson]
+    search_path = None if args.no_fixtures else parquet_fixtures.build(parquet_fixtures.parse_spec(None))
+    timeout = args.timeout or None
+
+    seeds = load(lessons, search_path=search_path, force=args.force, timeout=timeout)
+    statements = [s for by_example in seeds.values() for by_stmt in by_example.values() for s in by_stmt.values()]
+    size = sum(os.path.getsize(s.path + '.parquet') for s in statements)
+    print(f'{len(statements)} INSERT ... VALUES statement(s) in {len(seeds)} of {len(lessons)} lesson(s) converted, '
+          f'{size / 1e3:.1f} kB of Parquet -> {os.path.relpath(SEED_DIR, ROOT)}')
+    if not args.check:
+        return 0
+    bad = 0
+    for fmt in args.format or FORMATS:
+        seeds = load(lessons, fmt, search_path=search_path, timeout=timeout)
+        diffs = []
+        for les in lessons:
+            diffs += check_lesson(les, seeds.get(les.name, {}), search_path, timeout)
+        print(f'{fmt}: ' + (f'{len(diffs)} difference(s)' if diffs else 'every loaded table matches the INSERTs'))
+        for key, table, what in diffs:
+            print(f'  {key}' + (f' {table}' if table else '') + f': {what}')
+        bad += len(diffs)
+    return 1 if bad else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,357 @@
+"""
+Inverted index of the SQL features used by the lesson examples.
+
+Every example's `sql` is tokenized (sql_statements.iter_tokens, so strings and comments never
+match) and reduced to terms:
+
+    kw:QUALIFY, kw:ASOF JOIN      keywords (DuckDB's duckdb_keywords()) and adjacent keyword pairs
+    fn:read_parquet               function calls (a word followed by '(' that is a known function
+                                  or not a keyword)
+    table:sales                   names after FROM / JOIN / INTO / UPDATE / TABLE / VIEW / DESCRIBE
+    col:amount                    other identifiers (aliases after AS and qualifiers are skipped)
+
+The index is kept in .cache/sql_index.json as term -> example ids (`<lesson>:<example>`, the
+same keys as examples/expected/). Each run reloads the corpus through lesson_corpus (which only
+re-reads changed files) and re-tokenizes just the lessons whose SHA-256 changed; a DuckDB
+upgrade (new keywords or functions) rebuilds everything.
+
+Queries are boolean expressions over terms:
+
+    QUALIFY                       bare word: any kind (kw:QUALIFY, fn:qualify, table:..., col:...)
+    "ASOF JOIN"                   keyword phrase (every adjacent pair must occur)
+    fn:read_*                     trailing * matches a prefix
+    a b, a AND b, a OR b, NOT a, ( ... )
+
+Usage:
+    python tools/sql_index.py query 'QUALIFY OR "ASOF JOIN"'
+    python tools/sql_index.py query 'fn:read_parquet AND NOT table:events'
+    python tools/sql_index.py matrix                       # default feature list per lesson
+    python tools/sql_index.py matrix '"RANGE BETWEEN"' fn:unnest
+    python tools/sql_index.py terms --kind fn              # term frequencies
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import lesson_corpus
+import sql_statements
+
+INDEX_PATH = str(lesson_corpus.BASE / '.cache' / 'sql_index.json')
+INDEX_VERSION = 1
+KINDS = ('kw', 'fn', 'table', 'col')
+
+# words after which a name refers to a table (or view)
+TABLE_CONTEXT = {'FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE', 'VIEW', 'DESCRIBE', 'SUMMARIZE'}
+# words after which an unreserved keyword is more likely a column name (year, name, value, ...)
+COLUMN_CONTEXT = {'SELECT', 'BY', 'WHERE', 'AND', 'OR', 'ON', 'SET', 'HAVING'}
+
+FEATURES = [
+    'QUALIFY', '"ASOF JOIN"', '"WITH RECURSIVE"', 'OVER', '"RANGE BETWEEN"', '"ROWS BETWEEN"',
+    '"GROUPING SETS"', 'ROLLUP', 'CUBE', 'PIVOT', 'UNPIVOT', 'LATERAL', 'EXCLUDE', 'FILTER',
+    'fn:unnest', 'fn:read_parquet', 'fn:read_csv*', 'fn:read_json*', 'fn:list_*', 'fn:struct_*',
+]
+
+
+def vocabulary():
+    """({keyword: category}, {function names}) of the installed DuckDB."""
+    import duckdb
+
+    con = duckdb.connect()
+    try:
+        keywords = dict(con.execute('SELECT upper(keyword_name), keyword_category FROM duckdb_keywords()').fetchall())
+        functions = {r[0] for r in con.execute('SELECT DISTINCT lower(function_name) FROM duckdb_functions()').fetchall()}
+    finally:
+        con.close()
+    return keywords, functions
+
+
+def sql_terms(sql, keywords, functions):
+    """The set of index terms for one example's SQL."""
+    toks = [t for t in sql_statements.iter_tokens(sql) if t[0] in ('word', 'ident', 'punct')]
+    terms = set()
+    prev_kw = None
+    last_table = None
+    for k, (kind, text) in enumerate(toks):
+        if kind == 'punct':
+            prev_kw = None
+            continue
+        up, lo = text.upper(), text.lower()
+        prev = toks[k - 1] if k else ('punct', '')
+        nxt = toks[k + 1] if k + 1 < len(toks) else ('punct', '')
+        prev_word = prev[1].upper() if prev[0] == 'word' else None
+        category = keywords.get(up) if kind == 'word' else None
+        if nxt == ('punct', '(') and prev != ('punct', '.') and (lo in functions or category is None):
+            if prev_word in TABLE_CONTEXT and lo not in functions:
+                terms.add('table:' + lo)  # INSERT INTO t (a, b)
+            else:
+                terms.add('fn:' + lo)
+            prev_kw = None
+            continue
+        if category is not None:
+            terms.add('kw:' + up)
+            if prev_kw:
+                terms.add(f'kw:{prev_kw} {up}')
+            prev_kw = up
+            # unreserved keywords double as names (year, name, value) where a name is expected
+            name_position = (prev[1] in (',', '(', '.') or prev_word in COLUMN_CONTEXT) and nxt[1].upper() != 'BY'
+            if category != 'unreserved' or not name_position:
+                continue
+        else:
+            prev_kw = None
+        if nxt == ('punct', '.'):
+            continue  # schema, table or alias qualifier
+        if prev_word in TABLE_CONTEXT or (prev_word == 'EXISTS' and k >= 3 and toks[k - 3][1].upper() == 'IF'):
+            terms.add('table:' + lo)
+            last_table = k
+        elif toks[k - 2:k] and toks[k - 2][1].upper() in TABLE_CONTEXT and prev == ('punct', '.'):
+            terms.add('table:' + lo)  # FROM main.sales
+            last_table = k
+        elif prev_word == 'AS' or last_table == k - 1 or (nxt[1].upper() == 'AS' and k + 2 < len(toks) and toks[k + 2] == ('punct', '(')):
+            continue  # alias (FROM orders AS o, FROM orders o), or the name of a CTE / macro being defined
+        else:
+            terms.add('col:' + lo)
+    return terms
+
+
+def lesson_docs(lesson, keywords, functions):
+    """[(doc id, section title, terms)] for every example of `lesson`."""
+    docs = []
+    seen = {}
+    for _, section, ex in lesson.examples:
+        name = ex.get('name', '<unnamed>')
+        n = seen[name] = seen.get(name, 0) + 1
+        doc = f'{lesson.name}:{name}' + (f'#{n}' if n > 1 else '')
+        docs.append((doc, section.get('title', ''), sql_terms(ex.get('sql', ''), keywords, functions)))
+    return docs
+
+
+class SqlIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.files = {}
+        self.postings = {}
+        self.duckdb_version = None
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            if data.get('version') == INDEX_VERSION:
+                self.files = data['files']
+                self.postings = {t: set(ids) for t, ids in data['postings'].items()}
+                self.duckdb_version = data.get('duckdb')
+
+    def refresh(self, corpus, full=False):
+        """Re-index lessons that changed since the last run; returns the names re-indexed."""
+        import duckdb
+
+        version = duckdb.__version__
+        if full or version != self.duckdb_version:
+            self.files, self.postings, self.duckdb_version = {}, {}, version
+        current = {les.name: les for les in corpus}
+        stale = [n for n in self.files if n not in current or self.files[n]['sha256'] != current[n].sha256]
+        fresh = [n for n in current if n not in self.files or n in stale]
+        if stale:
+            gone = {doc for n in stale for doc, _ in self.files[n]['docs']}
+            for term in list(self.postings):
+                self.postings[term] -= gone
+                if not self.postings[term]:
+                    del self.postings[term]
+            for n in stale:
+                del self.files[n]
+        keywords, functions = vocabulary() if fresh else ({}, set())
+        for n in fresh:
+            docs = lesson_docs(current[n], keywords, functions)
+            self.files[n] = {'sha256': current[n].sha256, 'docs': [[doc, title] for doc, title, _ in docs]}
+            for doc, _, terms in docs:
+                for term in terms:
+                    self.postings.setdefault(term, set()).add(doc)
+        if stale or fresh:
+            self.save()
+        return sorted(set(stale) | set(fresh))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'duckdb': self.duckdb_version,
+                'files': self.files,
+                'postings': {t: sorted(ids) for t, ids in sorted(self.postings.items())},
+            }, f)
+        os.replace(tmp, self.path)
+
+    def all_docs(self):
+        return {doc for entry in self.files.values() for doc, _ in entry['docs']}
+
+    def sections(self):
+        return {doc: title for entry in self.files.values() for doc, title in entry['docs']}
+
+    def lookup(self, term):
+        """Example ids matching one query term (see the module docstring)."""
+        if term.startswith('"'):
+            words = term.strip('"').upper().split()
+            if len(words) == 1:
+                return set(self.postings.get('kw:' + words[0], ()))
+            pairs = [f'kw:{a} {b}' for a, b in zip(words, words[1:])]
+            return set.intersection(*(set(self.postings.get(p, ())) for p in pairs))
+        kind, sep, value = term.partition(':')
+        if not sep or kind not in KINDS:
+            kind, value = None, term
+        kinds = [kind] if kind else list(KINDS)
+        out = set()
+        for k in kinds:
+            v = value.upper() if k == 'kw' else value.lower()
+            if v.endswith('*'):
+                prefix = f'{k}:{v[:-1]}'
+                for t, ids in self.postings.items():
+                    if t.startswith(prefix):
+                        out |= ids
+            else:
+                out |= self.postings.get(f'{k}:{v}', set())
+        return out
+
+    def query(self, text):
+        return QueryParser(self, text).parse()
+
+
+class QueryParser:
+    """Recursive-descent parser for `a AND (b OR NOT "c d")`; adjacent terms are ANDed."""
+
+    token_re = re.compile(r'\s*(\(|\)|"[^"]*"|[^\s()"]+)')
+
+    def __init__(self, index, text):
+        self.index = index
+        self.tokens = []
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            m = self.token_re.match(text, pos)
+            if not m:
+                raise ValueError(f'cannot parse query at {text[pos:]!r}')
+            self.tokens.append(m.group(1))
+            pos = m.end()
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        result = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f'unexpected {self.peek()!r} in query')
+        return result
+
+    def parse_or(self):
+        result = self.parse_and()
+        while self.peek() is not None and self.peek().upper() == 'OR':
+            self.take()
+            result = result | self.parse_and()
+        return result
+
+    def parse_and(self):
+        result = self.parse_not()
+        while self.peek() is not None and self.peek() != ')' and self.peek().upper() != 'OR':
+            if self.peek().upper() == 'AND':
+                self.take()
+            result = result & self.parse_not()
+        return result
+
+    def parse_not(self):
+        tok = self.peek()
+        if tok is not None and tok.upper() == 'NOT':
+            self.take()
+            return self.index.all_docs() - self.parse_not()
+        return self.parse_atom()
+
+    def parse_atom(self):
+        tok = self.take()
+        if tok is None:
+            raise ValueError('query ends unexpectedly')
+        if tok == '(':
+            result = self.parse_or()
+            if self.take() != ')':
+                raise ValueError('missing )')
+            return result
+        if tok == ')' or tok.upper() in ('AND', 'OR'):
+            raise ValueError(f'unexpected {tok!r} in query')
+        return self.index.lookup(tok)
+
+
+def doc_order(doc):
+    lesson, _, example = doc.partition(':')
+    return lesson, doc
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query an inverted index of the SQL features used by the lesson examples')
+    parser.add_argument('--index-path', default=INDEX_PATH, help='Index file (default: .cache/sql_index.json)')
+    parser.add_argument('--rebuild', action='store_true', help='Re-tokenize every lesson instead of only the changed ones')
+    sub = parser.add_subparsers(dest='command', required=True)
+    q = sub.add_parser('query', help='List the examples matching a boolean query')
+    q.add_argument('expr', help='e.g. \'QUALIFY OR "ASOF JOIN"\', \'fn:read_* AND NOT table:events\'')
+    q.add_argument('--count', action='store_true', help='Only print the number of matches')
+    m = sub.add_parser('matrix', help='Feature coverage per lesson (examples matching each feature)')
+    m.add_argument('features', nargs='*', help='Query expressions to use as columns (default: a built-in feature list)')
+    t = sub.add_parser('terms', help='List indexed terms with the number of examples using them')
+    t.add_argument('--kind', choices=KINDS, help='Only terms of this kind')
+    t.add_argument('--prefix', default='', help='Only terms whose value starts with this')
+    sub.add_parser('build', help='Refresh the index and print its size')
+    args = parser.parse_args(argv)
+
+    corpus = lesson_corpus.load()
+    for p, e in corpus.errors:
+        print('SKIP (parse error):', p, e, file=sys.stderr)
+    index = SqlIndex(args.index_path)
+    changed = index.refresh(corpus, full=args.rebuild)
+
+    try:
+        if args.command == 'build':
+            print(f'{len(index.files)} lessons, {len(index.all_docs())} examples, {len(index.postings)} terms '
+                  f'({len(changed)} lessons re-indexed) -> {args.index_path}')
+        elif args.command == 'query':
+            docs = sorted(index.query(args.expr), key=doc_order)
+            if args.count:
+                print(len(docs))
+            else:
+                sections = index.sections()
+                for doc in docs:
+                    print(f'{doc}  [{sections.get(doc, "")}]')
+                print(f'{len(docs)} example(s)', file=sys.stderr)
+        elif args.command == 'matrix':
+            features = args.features or FEATURES
+            hits = [index.query(f) for f in features]
+            width = max(len(f) for f in features)
+            names = sorted(index.files)
+            print(f"{'lesson':<24}" + ''.join(f'{i + 1:>5}' for i in range(len(features))))
+            for name in names:
+                cells = ''
+                for h in hits:
+                    n = sum(1 for d in h if d.partition(':')[0] == name)
+                    cells += f'{n or ".":>5}'
+                print(f'{name[:23]:<24}{cells}')
+            print(f"{'(lessons)':<24}" + ''.join(f"{len({d.partition(':')[0] for d in h}):>5}" for h in hits))
+            print()
+            for i, f in enumerate(features, 1):
+                print(f'{i:>4}  {f:<{width}}  {len(hits[i - 1])} example(s)')
+        elif args.command == 'terms':
+            rows = [(t, len(ids)) for t, ids in index.postings.items()
+                    if (not args.kind or t.startswith(args.kind + ':')) and t.partition(':')[2].lower().startswith(args.prefix.lower())]
+            for term, n in sorted(rows, key=lambda r: (-r[1], r[0])):
+                print(f'{n:6}  {term}')
+    except ValueError as e:
+        parser.error(str(e))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
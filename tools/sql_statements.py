@@ -0,0 +1,167 @@
+"""
+Split DuckDB SQL scripts into statements, and tokenize them.
+
+DuckDB's own `extract_statements` is not usable for per-statement execution: some statements
+are expanded by the parser (e.g. `ALTER TABLE ... ADD COLUMN ... DEFAULT` becomes BEGIN /
+ALTER / UPDATE / ALTER / COMMIT with empty query text), so statement indexes and texts no
+longer line up with the script. This tokenizer splits on top-level semicolons instead and
+understands everything a semicolon can hide in:
+
+    'single quoted' strings (with '' escapes), E'...' strings (with backslash escapes),
+    "quoted identifiers", -- line comments, /* block /* nested */ comments */, $$dollar$$ and
+    $tag$ quoting
+
+iter_tokens() walks the same lexical structure and yields the words, quoted identifiers and
+punctuation of a script, skipping comments and string literals (tools/sql_index.py).
+"""
+import re
+
+dollar_re = re.compile(r'\$([A-Za-z_][A-Za-z0-9_]*)?\$')
+# quick regex forms for pattern checks on a statement; split_statements() is the exact lexer
+comment_re = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+string_re = re.compile(r"'(?:[^']|'')*'")
+
+
+def sql_string(value):
+    """`value` as a single-quoted SQL string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _skip_quoted(sql, i, quote, backslash=False):
+    """Return the index just past the quoted literal that opens at sql[i]."""
+    n = len(sql)
+    i += 1
+    while i < n:
+        ch = sql[i]
+        if backslash and ch == '\\':
+            i += 2
+            continue
+        if ch == quote:
+            if i + 1 < n and sql[i + 1] == quote:
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return n
+
+
+def _skip_block_comment(sql, i):
+    """Return the index just past the /* comment */ that opens at sql[i]; comments nest."""
+    n = len(sql)
+    depth = 0
+    while i < n:
+        if sql.startswith('/*', i):
+            depth += 1
+            i += 2
+        elif sql.startswith('*/', i):
+            depth -= 1
+            i += 2
+            if not depth:
+                return i
+        else:
+            i += 1
+    return n
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+
+def split_statements(sql):
+    """Split a script into statements (without the trailing ';').
+
+    Comments stay attached to the statement that follows them; fragments made of nothing but
+    comments and whitespace are dropped.
+    """
+    stmts = []
+    n = len(sql)
+    i = 0
+    start = 0
+    has_code = False
+    while i < n:
+        ch = sql[i]
+        if ch == '-' and sql.startswith('--', i):
+            j = sql.find('\n', i)
+            i = n if j < 0 else j
+            continue
+        if ch == '/' and sql.startswith('/*', i):
+            i = _skip_block_comment(sql, i)
+            continue
+        if ch == ';':
+            if has_code:
+                stmts.append(sql[start:i].strip())
+            i = start = i + 1
+            has_code = False
+            continue
+        if not ch.isspace():
+            has_code = True
+        if ch == "'":
+            # E'..' strings honour backslash escapes; plain strings only '' doubling
+            backslash = i > 0 and sql[i - 1] in 'eE' and (i == 1 or not _is_word_char(sql[i - 2]))
+            i = _skip_quoted(sql, i, "'", backslash)
+            continue
+        if ch == '"':
+            i = _skip_quoted(sql, i, '"')
+            continue
+        if ch == '$' and not (i > 0 and _is_word_char(sql[i - 1])):
+            m = dollar_re.match(sql, i)
+            if m:
+                j = sql.find(m.group(0), m.end())
+                i = n if j < 0 else j + len(m.group(0))
+                continue
+        i += 1
+    if has_code:
+        stmts.append(sql[start:].strip())
+    return stmts
+
+
+def iter_tokens(sql):
+    """Yield (kind, text) tokens: 'word', 'ident' (quoted identifier, unquoted text), 'string',
+    'number' or 'punct' (one character). Comments and whitespace are skipped.
+    """
+    n = len(sql)
+    i = 0
+    while i < n:
+        ch = sql[i]
+        if ch.isspace():
+            i += 1
+        elif ch == '-' and sql.startswith('--', i):
+            j = sql.find('\n', i)
+            i = n if j < 0 else j
+        elif ch == '/' and sql.startswith('/*', i):
+            i = _skip_block_comment(sql, i)
+        elif ch == "'":
+            j = _skip_quoted(sql, i, "'")
+            yield 'string', sql[i + 1:j - 1].replace("''", "'")
+            i = j
+        elif ch == '"':
+            j = _skip_quoted(sql, i, '"')
+            yield 'ident', sql[i + 1:j - 1].replace('""', '"')
+            i = j
+        elif ch == '$' and dollar_re.match(sql, i):
+            m = dollar_re.match(sql, i)
+            j = sql.find(m.group(0), m.end())
+            j = n if j < 0 else j + len(m.group(0))
+            yield 'string', sql[m.end():j - len(m.group(0))]
+            i = j
+        elif ch.isdigit():
+            j = i
+            while j < n and (sql[j].isalnum() or sql[j] in '._'):
+                j += 1
+            yield 'number', sql[i:j]
+            i = j
+        elif _is_word_char(ch):
+            j = i
+            while j < n and _is_word_char(sql[j]):
+                j += 1
+            if sql[j:j + 1] == "'" and sql[i:j] in ('E', 'e'):
+                # E'...' string with backslash escapes
+                k = _skip_quoted(sql, j, "'", backslash=True)
+                yield 'string', sql[j + 1:k - 1]
+                i = k
+                continue
+            yield 'word', sql[i:j]
+            i = j
+        else:
+            yield 'punct', ch
+            i += 1
@@ -1,52 +1,16 @@
 """
 Sync headings from examples/*.html into examples/*.json by adding placeholder sections for missing headings.
 - Adds a safe placeholder example per missing heading (SELECT '<heading>' AS topic LIMIT 1;) so that examples execute.
-- Idempotent: skips headings already present.
+- Idempotent: skips headings already present. A heading is present when the closest JSON topic
+  scores at least --threshold on character-trigram similarity (--threshold 1 = exact match only),
+  so near-miss titles no longer get placeholder sections.
 
-Usage: python3 tools/sync_html_to_json.py
+Usage: python3 tools/sync_html_to_json.py [--threshold 0.8] [--html-dir DIR]
 """
+import argparse
 import re
-import json
-from pathlib import Path
 
-BASE = Path(__file__).resolve().parent.parent
-EX_DIR = BASE / 'examples'
-
-heading_re = re.compile(r'<h([1-6])[^>]*>(.*?)</h\1>', re.IGNORECASE|re.DOTALL)
-strip_tags = re.compile(r'<[^>]+>')
-
-
-def extract_headings(html_text):
-    hs = []
-    for m in heading_re.finditer(html_text):
-        txt = m.group(2)
-        txt = strip_tags.sub('', txt).strip()
-        if txt:
-            hs.append(txt)
-    return hs
-
-
-def normalize(s):
-    return re.sub(r'\s+', ' ', s.strip().lower())
-
-
-def json_topics(jsdata):
-    topics = set()
-    for sec in jsdata.get('sections', []):
-        if 'title' in sec:
-            topics.add(normalize(sec['title']))
-        for ex in sec.get('examples', []):
-            if 'name' in ex:
-                topics.add(normalize(ex['name']))
-            if 'description' in ex:
-                topics.add(normalize(ex['description']))
-            if 'nerd_notes' in ex:
-                topics.add(normalize(ex['nerd_notes']))
-    if 'title' in jsdata:
-        topics.add(normalize(jsdata['title']))
-    if 'description' in jsdata:
-        topics.add(normalize(jsdata['description']))
-    return topics
+from lesson_corpus import EXAMPLES_DIR, load, write_lesson
 
 
 def slugify(s):
@@ -78,38 +42,48 @@ def make_section_obj(title):
     }
 
 
-def process():
-    html_files = sorted(EX_DIR.glob('*.html'))
-    json_files = {p.stem: p for p in sorted(EX_DIR.glob('*.json'))}
+def add_missing_sections(lesson, page, threshold=0.8):
+    """Append a placeholder section to `lesson` for every heading of `page` it does not cover.
+
+    Returns the headings that were added.
+    """
+    jsdata = lesson.data
+    index = lesson.topic_index
+    added = []
+    for hh in page.headings:
+        if not index.covers(hh, threshold):
+            # append a new section
+            sec = make_section_obj(hh)
+            if 'sections' not in jsdata:
+                jsdata['sections'] = []
+            jsdata['sections'].append(sec)
+            index.add(hh)
+            added.append(hh)
+    return added
+
+
+def process(threshold=0.8, html_dir=EXAMPLES_DIR):
+    corpus = load(html_dir=html_dir)
     updated = []
-    for h in html_files:
-        name = h.stem
-        html_text = h.read_text(errors='replace')
-        headings = extract_headings(html_text)
-        jf = json_files.get(name)
-        if not jf:
+    for name, page in corpus.pages.items():
+        lesson = corpus.lessons.get(name)
+        if not lesson:
             print(f'NO JSON for {name}.html; skipping')
             continue
-        jsdata = json.loads(jf.read_text())
-        jtopics = json_topics(jsdata)
-        added = False
-        for hh in headings:
-            nh = normalize(hh)
-            if nh not in jtopics:
-                # append a new section
-                sec = make_section_obj(hh)
-                if 'sections' not in jsdata:
-                    jsdata['sections'] = []
-                jsdata['sections'].append(sec)
-                jtopics.add(nh)
-                added = True
-                print(f"Added placeholder section for '{hh}' into {jf.name}")
+        jf = lesson.path
+        added = add_missing_sections(lesson, page, threshold)
+        for hh in added:
+            print(f"Added placeholder section for '{hh}' into {jf.name}")
         if added:
-            jf.write_text(json.dumps(jsdata, indent=2, ensure_ascii=False) + '\n')
+            write_lesson(jf, lesson.data)
             updated.append(jf.name)
     print('\nSync complete. Files updated:', len(updated))
     for u in updated:
         print(' -', u)
 
 if __name__ == '__main__':
-    process()
+    ap = argparse.ArgumentParser(description='Add placeholder sections for HTML headings missing from the lesson JSON')
+    ap.add_argument('--threshold', type=float, default=0.8, help='Minimum similarity (0-1) for a heading to count as present (default: 0.8)')
+    ap.add_argument('--html-dir', default=str(EXAMPLES_DIR), help='Directory holding the <lesson>.html pages (default: examples/)')
+    args = ap.parse_args()
+    process(threshold=args.threshold, html_dir=args.html_dir)
@@ -0,0 +1,55 @@
+"""
+Tests for tools/sql_statements.py.
+
+    python -m pytest tools/test_sql_statements.py
+"""
+import duckdb
+import pytest
+
+import sql_statements
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ('SELECT 1; SELECT 2;', ['SELECT 1', 'SELECT 2']),
+    ("SELECT 'a;b'; SELECT 'it''s; fine'", ["SELECT 'a;b'", "SELECT 'it''s; fine'"]),
+    ('SELECT 1 AS "x;y"; SELECT 2', ['SELECT 1 AS "x;y"', 'SELECT 2']),
+    ("SELECT E'\\';'; SELECT 2", ["SELECT E'\\';'", 'SELECT 2']),
+    ("SELECT 'ends in \\'; SELECT 2", ["SELECT 'ends in \\'", 'SELECT 2']),
+    ('SELECT $$a;b$$; SELECT 2', ['SELECT $$a;b$$', 'SELECT 2']),
+    ('SELECT $fn$x;$$;$fn$; SELECT 2', ['SELECT $fn$x;$$;$fn$', 'SELECT 2']),
+    ('SELECT 1 -- not; here\n; SELECT 2', ['SELECT 1 -- not; here', 'SELECT 2']),
+    ('SELECT 1; /* a /* nested; */ still; */ SELECT 2', ['SELECT 1', '/* a /* nested; */ still; */ SELECT 2']),
+    ('SELECT 1;; ; -- trailing comment\n', ['SELECT 1']),
+])
+def test_split_statements(sql, expected):
+    assert sql_statements.split_statements(sql) == expected
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT E'\\';'; SELECT 2",
+    'SELECT $fn$x;$$;$fn$; SELECT 2',
+    'SELECT 1; /* a /* nested; */ still; */ SELECT 2',
+])
+def test_statements_match_duckdb(sql):
+    stmts = sql_statements.split_statements(sql)
+    assert len(stmts) == len(duckdb.extract_statements(sql))
+    con = duckdb.connect()
+    assert [con.execute(stmt).fetchall() for stmt in stmts][-1] == [(2,)]
+
+
+def test_add_column_default_keeps_its_text():
+    sql = 'CREATE TABLE t (a INT); ALTER TABLE t ADD COLUMN b TIMESTAMP DEFAULT now(); SELECT count(*) FROM t'
+    # DuckDB expands the ALTER into several statements with empty query text
+    assert '' in [stmt.query.strip() for stmt in duckdb.extract_statements(sql)]
+    stmts = sql_statements.split_statements(sql)
+    assert stmts == ['CREATE TABLE t (a INT)', 'ALTER TABLE t ADD COLUMN b TIMESTAMP DEFAULT now()', 'SELECT count(*) FROM t']
+    con = duckdb.connect()
+    for stmt in stmts:
+        res = con.execute(stmt)
+    assert res.fetchall() == [(0,)]
+
+
+def test_iter_tokens_skips_nested_comments_and_strings():
+    sql = "SELECT /* a /* b */ c */ 'x;y', \"q\" FROM t"
+    assert list(sql_statements.iter_tokens(sql)) == [
+        ('word', 'SELECT'), ('string', 'x;y'), ('punct', ','), ('ident', 'q'), ('word', 'FROM'), ('word', 't')]
@@ -1,91 +1,906 @@
 """
 Validate SQL examples stored in JSON files under examples/ against a local DuckDB instance.
-This script loads each JSON, iterates sections/examples, executes their `sql` field as a script,
-and reports any errors. It will stop at the first failing SQL statement per example but continues
-through all files to collect a full report.
+This script loads each JSON, iterates sections/examples, splits their `sql` field into statements
+(tools/sql_statements.py) and executes them one at a time, and reports any errors. It will stop at
+the first failing SQL statement per example (reporting its index and text) but continues through
+all files to collect a full report.
 
-Usage: python tools/validate_duckdb_examples.py
+Every statement is timed. --timings prints per-statement latency and the cumulative time of each
+section; --slow-ms N flags statements slower than N milliseconds (listed at the end of the run).
+
+Each lesson runs on its own fresh in-memory connection, so tables created by one lesson cannot
+hide a missing setup statement in another. With --jobs N lessons are validated in a process pool;
+the merged report keeps the same file order, summary and exit code as a sequential run.
+--persistent-db keeps the old behaviour of running every lesson on one shared database file.
+
+Results are cached in .cache/validate_examples.sqlite keyed by a hash of each example's SQL,
+the SQL before it in the same lesson and the DuckDB version (see tools/validation_cache.py);
+unchanged lessons are reported from the cache without executing. --refresh re-executes and
+rewrites the cache, --no-cache bypasses it entirely. The cache is not used with --persistent-db.
+
+After a lesson's setup section runs, its database state is snapshotted under .cache/snapshots
+(see tools/lesson_snapshot.py). When only examples after the setup changed, the lesson resumes
+from that snapshot instead of replaying the setup. --no-snapshot turns this off.
+
+--profile PATH records wall time, rows produced and DuckDB's JSON profile for every example and
+writes a report of the slowest examples and their most expensive operators to PATH (see
+tools/validation_profile.py). Profiling always executes; cached results are refreshed, not read.
+
+Lessons that scan Parquet (events_parquet/year=YYYY/*.parquet) read a hive-partitioned fixture
+built once per spec under .cache/fixtures/<spec hash> (see tools/parquet_fixtures.py); DuckDB's
+file_search_path points at it. --fixture KEY=VALUE changes the spec (rows, row_group_size,
+compression, ...), --no-fixtures skips it. With --profile, every Parquet scan is listed with
+files read/total, row groups read and files pruned.
+
+--fingerprint [auto|ordered|unordered] streams each example's final result as Arrow record
+batches, reduces it to a row count and hash, and compares both against
+examples/expected/fingerprints.json (see tools/result_fingerprint.py); a changed result is
+reported as `mismatch` and fails the run. --update-expected accepts the new fingerprints.
+Volatile examples (`"volatile": true` in the lesson, or so recorded by tools/determinism_check.py)
+are skipped.
+
+--watch keeps the process running with warm per-lesson sessions and re-executes only changed
+examples and the ones after them when examples/*.json change; --serve [HOST:]PORT also exposes
+the results as JSON over HTTP (see tools/validation_watch.py); --serve-origin ORIGIN lets that
+one page origin call it from a browser.
+
+--memory samples DuckDB's memory (duckdb_memory()), the database size and the process peak RSS
+around every example and lists the examples that grew them most; --memory-budget SIZE runs each
+lesson under memory_limit=SIZE and reports examples that exceed it as `over_budget` failures
+(see tools/validation_memory.py).
+
+--plans captures a normalized EXPLAIN plan for every query example, compares it with the plan
+recorded in examples/expected/plans.json for this DuckDB version (or the newest older one) and
+lists examples whose plan shape or operator details changed, with a before/after diff (see
+tools/plan_store.py). --update-plans accepts the new plans.
+
+--shard I/N validates a deterministic, balanced slice of the lessons for one CI node;
+--report-jsonl streams a JSON record per example as results come in, --junit writes JUnit XML,
+and --merge combines the shards' JSONL files into the usual report and exit code (see
+tools/validation_report.py).
+
+tools/example_deps.py works out which objects and files every example creates, reads, alters and
+drops and builds a dependency graph of the corpus. --only LESSON:EXAMPLE runs just that example
+and its transitive prerequisites (possibly from other lessons); --isolate, with --jobs, runs the
+independent example sets of each lesson as separate tasks. Lessons that pass files to each other
+always run in one worker, in corpus order, and on the same --shard.
+
+Lessons run with PRAGMA threads=1 so results and sample rows are reproducible. --threads N runs
+them on N threads, except the examples that tools/determinism_check.py has not recorded as
+deterministic (order- or thread-dependent, volatile, edited or never checked), which stay on one.
+
+Every run is appended to the run history in .cache/run_history.duckdb (commit, DuckDB version,
+host, threads, per-example status and time; see tools/run_history.py for trend and regression
+queries). --no-history skips it; shard runs are not recorded, their --merge is.
+
+Every example runs under a watchdog: after --timeout seconds (default 60) it calls
+con.interrupt(), the example is reported as `timeout` with its elapsed time, and validation
+continues with the next one. --global-timeout SECONDS caps the whole run; examples not reached
+in time are reported as `timeout` without executing. The --timeout value is part of the cache
+key, so changing it re-executes instead of reporting results computed under another limit;
+--global-timeout is not (a run it cuts short caches nothing past the cut).
+
+--seeds parquet|arrow loads the rows of every literal INSERT ... VALUES statement in bulk from
+columnar fixtures under .cache/seeds (read_parquet, or a memory-mapped Arrow IPC file registered
+with DuckDB) instead of executing the VALUES; tools/seed_fixtures.py builds them and --check
+verifies that both paths produce identical tables.
+
+Usage: python tools/validate_duckdb_examples.py [--jobs N] [--threads N] [--persistent-db PATH] [--no-cache | --refresh]
+       [--profile PATH [--profile-top N]] [--fingerprint [MODE] [--update-expected]]
+       [--shard I/N [--shard-weights PATH]] [--report-jsonl PATH] [--junit PATH] [--merge JSONL...] [--seeds parquet|arrow]
+       [--only LESSON:EXAMPLE ... | --isolate] [--plans [--update-plans]] [--memory [--memory-top N]] [--memory-budget SIZE] [--timeout SECONDS] [--global-timeout SECONDS]
 
 It requires duckdb package; if missing the script exits with instructions.
 """
-import json
-import glob
-import duckdb
 import sys
 import os
 import argparse
+import datetime
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-ROOT = os.path.dirname(os.path.dirname(__file__))
+try:
+    import duckdb
+except ImportError:
+    print('duckdb is required: pipenv install --dev (or pip install duckdb)', file=sys.stderr)
+    sys.exit(1)
+
+import example_deps
+import lesson_corpus
+import lesson_snapshot
+import parquet_fixtures
+import plan_store
+import result_fingerprint
+import run_history
+import sql_statements
+import validation_cache
+import validation_memory
+import validation_profile
+import validation_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 EXAMPLES_DIR = os.path.join(ROOT, 'examples')
 
-parser = argparse.ArgumentParser(description='Validate DuckDB SQL examples in examples/*.json')
-parser.add_argument('--persistent-db', dest='dbpath', default=':memory:', help='Path to persistent DuckDB file (default: in-memory)')
-args = parser.parse_args()
 
-files = sorted(glob.glob(os.path.join(EXAMPLES_DIR, '*.json')))
-if not files:
-    print('No JSON files found in', EXAMPLES_DIR)
-    sys.exit(1)
+def connect(dbpath=':memory:', search_path=None, memory_limit=None, threads=1):
+    con = duckdb.connect(database=dbpath)
+    con.execute(f'PRAGMA threads={threads}')
+    if memory_limit:
+        con.execute(f'SET memory_limit={sql_statements.sql_string(memory_limit)}')
+    if search_path:
+        # relative file paths in the lessons resolve against the fixture directory first
+        con.execute(f'SET file_search_path={sql_statements.sql_string(search_path)}')
+    return con
+
+
+def one_line(sql, width=120):
+    text = ' '.join(sql.split())
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+class Watchdog:
+    """Calls con.interrupt() once `limit` seconds have passed; `.fired` tells whether it did."""
+
+    def __init__(self, con, limit):
+        self.con = con
+        self.limit = limit
+        self.fired = False
+        self.done = False
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(limit, self._interrupt) if limit is not None else None
+
+    def _interrupt(self):
+        with self._lock:
+            # the guarded work may have finished after the timer went off
+            if self.done:
+                return
+            self.fired = True
+            self.con.interrupt()
 
-con = duckdb.connect(database=args.dbpath)
-con.execute('PRAGMA threads=1')
+    def __enter__(self):
+        if self._timer:
+            self._timer.daemon = True
+            self._timer.start()
+        return self
 
-report = []
+    def __exit__(self, *exc):
+        with self._lock:
+            self.done = True
+        if self._timer:
+            self._timer.cancel()
 
-for p in files:
-    with open(p, 'r') as f:
-        j = json.load(f)
+
+def time_limit(timeout=None, deadline=None):
+    """Seconds an example may run: the per-example `timeout`, capped by the global `deadline` (time.time())."""
+    limits = [t for t in (timeout, deadline - time.time() if deadline else None) if t is not None]
+    return min(limits) if limits else None
+
+
+def run_example(con, ex, profile_path=None, fingerprint=None, memory=False, timeout=None, deadline=None, plans=False, seeds=None):
+    """Run one example on `con` and return its result; `seeds` ({statement number: seed_fixtures.Seed})
+    load those INSERT ... VALUES statements from their fixtures."""
+    name = ex.get('name','<unnamed>')
+    sql = ex.get('sql','')
+    ex_r = {'name': name, 'status': 'ok', 'error': None, 'sample_row': None}
+    if not sql.strip():
+        ex_r['status'] = 'skipped'
+        return ex_r
+    limit = time_limit(timeout, deadline)
+    if limit is not None and limit <= 0:
+        ex_r.update(status='timeout', error='not run: the global timeout had already passed', wall_ms=0.0)
+        return ex_r
+    mem_before = validation_memory.sample(con) if memory else None
+    with Watchdog(con, limit) as watchdog:
+        _execute_example(con, ex_r, sql, profile_path, fingerprint, plans, seeds)
+    if watchdog.fired:
+        # the interrupt may land in a statement, a result fetch or between the two
+        ex_r['status'] = 'timeout'
+        which = f'timeout of {timeout:g}s' if timeout is not None and limit == timeout else 'global timeout'
+        ex_r['error'] = f"interrupted after {ex_r['wall_ms'] / 1000.0:.1f}s ({which})"
+    if memory:
+        ex_r['memory'] = validation_memory.delta(mem_before, validation_memory.sample(con))
+    return ex_r
+
+
+def _execute_example(con, ex_r, sql, profile_path=None, fingerprint=None, plans=False, seeds=None):
+    stmts = sql_statements.split_statements(sql)
+    ex_r['statements'] = []
+    res = None
+    t0 = time.perf_counter()
+    for i, stmt in enumerate(stmts, 1):
+        st_r = {'index': i, 'sql': stmt, 'ms': 0.0}
+        ex_r['statements'].append(st_r)
+        if plans and i == len(stmts) and plan_store.is_query(stmt):
+            # explained on the state the query itself runs against
+            ex_r['plan'] = plan_store.explain(con, stmt)
+        t1 = time.perf_counter()
+        try:
+            res = seeds[i].load(con) if seeds and i in seeds else con.execute(stmt)
+        except Exception as e:
+            # hitting memory_limit (--memory-budget) fails the example, not the run
+            ex_r['status'] = 'over_budget' if isinstance(e, duckdb.OutOfMemoryException) else 'error'
+            ex_r['error'] = str(e)
+            if len(stmts) > 1:
+                ex_r['error'] = f'statement {i}/{len(stmts)} failed: {e}  [SQL: {one_line(stmt)}]'
+            break
+        finally:
+            st_r['ms'] = (time.perf_counter() - t1) * 1000.0
+        # the last statement's profile is read once its result has been drained below
+        if profile_path and i < len(stmts):
+            # DuckDB writes a query's profile only once its result has been consumed
+            if res.description is not None:
+                try:
+                    res.fetchall()
+                except Exception:
+                    pass
+            st_r['profile'] = validation_profile.read(profile_path)
+    if ex_r['status'] == 'ok' and res is not None and res.description is not None:
+        t1 = time.perf_counter()
+        if fingerprint:
+            ordered = fingerprint == 'ordered' or (fingerprint == 'auto' and result_fingerprint.has_top_level_order_by(stmts[-1]))
+            try:
+                n, digest, sample_row = result_fingerprint.fingerprint(res, ordered)
+                ex_r['sample_row'] = sample_row
+                ex_r['rows'] = n
+                ex_r['fingerprint'] = {'rows': n, 'hash': digest, 'ordered': ordered}
+            except Exception:
+                pass
+        else:
+            # try to fetch a sample row if the last statement returned rows
+            try:
+                # when profiling, drain the result so the row count and timings cover the whole query
+                rows = res.fetchall() if profile_path else res.fetchmany(1)
+                if rows:
+                    ex_r['sample_row'] = rows[0]
+                if profile_path:
+                    ex_r['rows'] = len(rows)
+            except Exception:
+                pass
+        ex_r['statements'][-1]['ms'] += (time.perf_counter() - t1) * 1000.0
+    ex_r['wall_ms'] = (time.perf_counter() - t0) * 1000.0
+    if profile_path:
+        ex_r.setdefault('rows', 0)
+        if ex_r['status'] == 'ok' and ex_r['statements']:
+            ex_r['statements'][-1]['profile'] = validation_profile.read(profile_path)
+        ex_r['profile'] = [st.get('profile') for st in ex_r['statements']]
+
+
+def validate_file(con, p, j, profile_path=None, done=(), snapshot_to=None, snapshot_after=None, fingerprint=None, memory=False,
+                  timeout=None, deadline=None, plans=False, on_example=None, only=None, threads=1, pinned=(), seeds=None):
+    """Run every example of lesson `j` on `con` and return its file report.
+
+    The first len(done) examples are not executed; their cached (status, error, sample_row)
+    tuples are reported instead (the connection already holds their state). When
+    `snapshot_to` is set and examples 0..snapshot_after all succeed, the database is
+    snapshotted to that path right after example `snapshot_after`. `on_example(p, index,
+    section title, result)` is called as each example completes. With `only` (example indexes),
+    the other examples are neither run nor reported, and every result carries its `index`.
+    With `threads` > 1, the examples in `pinned` (indexes) run on one thread and the others on
+    `threads`. `seeds` ({example index: {statement number: seed_fixtures.Seed}}) are the
+    INSERT ... VALUES statements loaded from fixtures.
+    """
     title = j.get('title', os.path.basename(p))
     file_report = {'file': p, 'title': title, 'sections': []}
+    idx = 0
+    setup_ok = True
+    current = threads
     for s in j.get('sections', []):
         sec_r = {'title': s.get('title','<no-title>'), 'examples': []}
         for ex in s.get('examples', []):
-            name = ex.get('name','<unnamed>')
-            sql = ex.get('sql','')
-            ex_r = {'name': name, 'status': 'ok', 'error': None, 'sample_row': None}
-            if not sql.strip():
-                ex_r['status'] = 'skipped'
-                sec_r['examples'].append(ex_r)
+            if only is not None and idx not in only:
+                idx += 1
                 continue
-            try:
-                # execute as a script; duckdb-python allows executing multiple statements
-                res = con.execute(sql)
-                # try to fetch a sample row if the last statement returned rows
-                try:
-                    rows = res.fetchmany(1)
-                    if rows:
-                        ex_r['sample_row'] = rows[0]
-                except Exception:
-                    pass
-            except Exception as e:
-                ex_r['status'] = 'error'
-                ex_r['error'] = str(e)
+            if idx < len(done):
+                status, error, sample_row = done[idx]
+                ex_r = {'name': ex.get('name','<unnamed>'), 'status': status, 'error': error, 'sample_row': sample_row}
+            else:
+                want = 1 if idx in pinned else threads
+                if want != current:
+                    con.execute(f'SET threads={want}')
+                    current = want
+                ex_r = run_example(con, ex, profile_path, fingerprint, memory, timeout, deadline, plans, (seeds or {}).get(idx))
+            if only is not None:
+                ex_r['index'] = idx
             sec_r['examples'].append(ex_r)
+            if on_example:
+                on_example(p, idx, sec_r['title'], ex_r)
+            setup_ok = setup_ok and ex_r['status'] not in ('error', 'over_budget', 'timeout')
+            if snapshot_to and idx == snapshot_after and setup_ok:
+                try:
+                    lesson_snapshot.save(con, snapshot_to)
+                except Exception as e:
+                    print(f'WARNING: could not snapshot {p}: {e}', file=sys.stderr)
+            idx += 1
+        file_report['sections'].append(sec_r)
+    return file_report
+
+
+def validate_lesson(p, j, profile=False, done=(), restore=None, snapshot_to=None, snapshot_after=None, fingerprint=None, search_path=None,
+                    memory=False, memory_limit=None, timeout=None, deadline=None, plans=False, on_example=None, only=None, threads=1, pinned=None,
+                    seeds=None):
+    """Validate one lesson on its own in-memory connection (process pool entry point).
+
+    With `restore`, the connection starts from that setup snapshot and `done` holds the
+    cached results of the examples the snapshot already covers. `pinned` maps lesson names to
+    the examples that stay on one thread when `threads` > 1, and `seeds` to the lesson's
+    fixture-loaded statements (see run()).
+    """
+    name = validation_report.lesson_name(p)
+    pinned = (pinned or {}).get(name, ())
+    seeds = (seeds or {}).get(name)
+    con = connect(search_path=search_path, memory_limit=memory_limit, threads=threads)
+    profile_path = validation_profile.enable(con) if profile else None
+    try:
+        if restore:
+            try:
+                lesson_snapshot.restore(con, restore)
+            except Exception:
+                # unreadable snapshot: fall back to replaying the whole lesson
+                con.close()
+                con = connect(search_path=search_path, memory_limit=memory_limit, threads=threads)
+                done = ()
+        return validate_file(con, p, j, profile_path, done, snapshot_to, snapshot_after, fingerprint, memory, timeout, deadline, plans, on_example,
+                             only, threads, pinned, seeds)
+    finally:
+        con.close()
+        if profile_path:
+            os.remove(profile_path)
+
+
+def cached_report(p, j, results):
+    """Rebuild a file report from cached (status, error, sample_row) tuples."""
+    file_report = {'file': p, 'title': j.get('title', os.path.basename(p)), 'sections': []}
+    it = iter(results)
+    for s in j.get('sections', []):
+        sec_r = {'title': s.get('title','<no-title>'), 'examples': []}
+        for ex in s.get('examples', []):
+            status, error, sample_row = next(it)
+            sec_r['examples'].append({'name': ex.get('name','<unnamed>'), 'status': status, 'error': error, 'sample_row': sample_row})
         file_report['sections'].append(sec_r)
-    report.append(file_report)
-
-# print summary
-errs = 0
-for f in report:
-    for s in f['sections']:
-        for ex in s['examples']:
-            if ex['status'] == 'error':
-                errs += 1
-
-print('Checked', len(files), 'files — errors:', errs)
-for f in report:
-    print('\nFILE:', os.path.relpath(f['file'], ROOT), '-', f['title'])
-    for s in f['sections']:
-        print(' SECTION:', s['title'])
-        for ex in s['examples']:
-            status = ex['status']
-            line = f"  - {ex['name']}: {status}"
-            if status == 'error':
-                line += f"  (ERROR: {ex['error']})"
-            elif ex.get('sample_row') is not None:
-                line += f"  (sample_row: {ex['sample_row']})"
+    return file_report
+
+
+def example_results(file_report):
+    return [ex for s in file_report['sections'] for ex in s['examples']]
+
+
+def emit_lesson(file_report, on_example):
+    if on_example:
+        idx = 0
+        for s in file_report['sections']:
+            for ex in s['examples']:
+                on_example(file_report['file'], ex.get('index', idx), s['title'], ex)
+                idx += 1
+
+
+def validate_chain(tasks, **opts):
+    """Validate several lessons (or parts of lessons) one after the other in one worker.
+
+    Lessons that pass files to each other (see tools/example_deps.py) must run in order.
+    """
+    return [validate_lesson(**opts, **task) for task in tasks]
+
+
+def merge_parts(p, j, parts):
+    """One file report from the partial reports of the same lesson, in example order."""
+    by_index = {ex['index']: ex for part in parts for ex in example_results(part)}
+    complete = len(by_index) == sum(len(s.get('examples', [])) for s in j.get('sections', []))
+    file_report = {'file': p, 'title': j.get('title', os.path.basename(p)), 'sections': []}
+    idx = 0
+    for s in j.get('sections', []):
+        sec_r = {'title': s.get('title','<no-title>'), 'examples': []}
+        for _ in s.get('examples', []):
+            if idx in by_index:
+                sec_r['examples'].append(by_index[idx])
+            idx += 1
+        if sec_r['examples'] or complete:
+            file_report['sections'].append(sec_r)
+    return file_report
+
+
+def plan_lesson(lesson, keys, hits, snapshots=True):
+    """Build validate_lesson() kwargs for a lesson that is not fully cached."""
+    task = {'p': str(lesson.path), 'j': lesson.data}
+    end = lesson_snapshot.setup_end(lesson) if snapshots else None
+    if end is None:
+        return task
+    snap = lesson_snapshot.path_for(lesson.name, keys[end])
+    first_miss = next(i for i, h in enumerate(hits) if h is None)
+    if first_miss > end and os.path.exists(snap):
+        task['restore'] = snap
+        task['done'] = hits[:end + 1]
+    elif not os.path.exists(snap):
+        task['snapshot_to'] = snap
+        task['snapshot_after'] = end
+    return task
+
+
+def run(lessons, jobs=1, dbpath=None, cache=None, profile=False, snapshots=True, fingerprint=None, search_path=None,
+        memory=False, memory_limit=None, timeout=None, global_timeout=None, plans=False, on_example=None, groups=None, only=None,
+        threads=1, pinned=None, seeds=None):
+    """Validate `lessons` (lesson_corpus.Lesson objects) and return one file report per lesson.
+
+    `search_path` becomes DuckDB's file_search_path (the Parquet fixture directory); it is part
+    of the cache keys, so results computed against another fixture are never reused. The same
+    holds for `memory_limit` (--memory-budget): a budget changes which examples pass.
+
+    An example running longer than `timeout` seconds is interrupted and reported as `timeout`.
+    Once `global_timeout` seconds have passed, the running example is interrupted and every
+    example not yet run is reported as `timeout` without executing. Timed-out examples and the
+    ones after them in their lesson are not cached. `timeout` is part of the cache keys: an `ok`
+    computed under a longer limit says nothing about a shorter one.
+
+    `on_example(p, index, section title, result)` is called for every example as soon as its
+    result is known: right after it runs in this process, or when its lesson comes back from a
+    worker or from the cache.
+
+    `groups` (sets of lesson names, see example_deps.Graph.lesson_groups) are lessons that pass
+    files to each other: a worker validates them in corpus order, and they are re-executed
+    together when any of them is. `groups` may also be a callable returning them, called only
+    when some lesson executes and grouping can change the run. `only` ({lesson name: [sets of example indexes]}) restricts the
+    run to those examples and leaves the other lessons out; each set is independent of the others
+    and, with jobs > 1, runs as its own task. It is not combined with `cache`.
+
+    `threads` is DuckDB's thread count; the examples in `pinned` ({lesson name: example indexes},
+    see determinism_check.pinned_examples) run on one thread. Both are part of the cache keys.
+
+    `seeds` ({lesson name: {example index: {statement number: seed_fixtures.Seed}}}, see
+    seed_fixtures.load) replaces those INSERT ... VALUES statements with bulk loads from their
+    fixtures; the fixture format is part of the cache keys of the lessons it applies to.
+    """
+    deadline = time.time() + global_timeout if global_timeout else None
+    if only is not None:
+        lessons = [les for les in lessons if les.name in only]
+    files = [str(les.path) for les in lessons]
+    datas = [les.data for les in lessons]
+    if dbpath:
+        con = connect(dbpath, search_path, memory_limit, threads)
+        profile_path = validation_profile.enable(con) if profile else None
+        try:
+            return [validate_file(con, p, j, profile_path, fingerprint=fingerprint, memory=memory, timeout=timeout, deadline=deadline, plans=plans,
+                                  on_example=on_example, threads=threads, pinned=(pinned or {}).get(les.name, ()), seeds=(seeds or {}).get(les.name))
+                    for p, j, les in zip(files, datas, lessons)]
+        finally:
+            con.close()
+            if profile_path:
+                os.remove(profile_path)
+    report = [None] * len(files)
+    keys = {}
+    tasks = {}
+    version = duckdb.__version__ + (f'|{search_path}' if search_path else '') + (f'|memory_limit={memory_limit}' if memory_limit else '')
+    version += f'|timeout={timeout:g}' if timeout else ''
+    for i, (p, j) in enumerate(zip(files, datas)):
+        if cache is None:
+            tasks[i] = {'p': p, 'j': j}
+            continue
+        if threads > 1:
+            version_i = version + f'|threads={threads}|pinned={sorted((pinned or {}).get(lessons[i].name, ()))}'
+        else:
+            version_i = version
+        lesson_seeds = (seeds or {}).get(lessons[i].name)
+        if lesson_seeds:
+            version_i += '|seeds=' + ','.join(sorted({s.fmt for by_stmt in lesson_seeds.values() for s in by_stmt.values()}))
+        keys[i] = validation_cache.lesson_keys(j, version_i)
+        hits = cache.get_many(keys[i])
+        if all(h is not None for h in hits):
+            report[i] = cached_report(p, j, hits)
+        else:
+            # snapshots only pay off together with cached results, and are skipped while profiling
+            # or under a memory budget (writing the snapshot would count against it)
+            tasks[i] = plan_lesson(lessons[i], keys[i], hits, snapshots and not profile and not memory_limit)
+    if callable(groups):
+        # groups only matter when a cached lesson may have to re-execute, or to schedule workers
+        groups = groups() if tasks and (jobs > 1 or len(tasks) < len(lessons)) else None
+    slot = {les.name: i for i, les in enumerate(lessons)}
+    units = [[i] for i in range(len(lessons))]
+    for group in groups or ():
+        members = sorted(slot[name] for name in group if name in slot)
+        if len(members) < 2:
+            continue
+        units = [u for u in units if u[0] not in members] + [members]
+        if any(i in tasks for i in members):
+            # a lesson reading another lesson's files needs the writer to run first
+            for i in members:
+                if i not in tasks:
+                    report[i] = None
+                    tasks[i] = {'p': files[i], 'j': datas[i]}
+    for i, file_report in enumerate(report):
+        if file_report is not None:
+            emit_lesson(file_report, on_example)
+    units = sorted((u for u in units if u[0] in tasks), key=lambda u: u[0])
+    chains = []
+    for u in units:
+        if only is None:
+            chains.append([(i, tasks[i]) for i in u])
+        elif len(u) > 1 or jobs == 1:
+            chains.append([(i, dict(tasks[i], only=set().union(*only[lessons[i].name]))) for i in u])
+        else:
+            chains += [[(u[0], dict(tasks[u[0]], only=part))] for part in only[lessons[u[0]].name]]
+    opts = {'profile': profile, 'fingerprint': fingerprint, 'search_path': search_path, 'memory': memory, 'memory_limit': memory_limit,
+            'timeout': timeout, 'deadline': deadline, 'plans': plans, 'threads': threads, 'pinned': pinned,
+            'seeds': seeds}
+    parts = {}
+    if jobs > 1 and len(chains) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(validate_chain, [task for _, task in chain], **opts): k for k, chain in enumerate(chains)}
+            # stream lessons as they finish; the report itself is indexed, so its order matches a serial run
+            done = {}
+            for f in as_completed(futures):
+                done[futures[f]] = f.result()
+                for file_report in done[futures[f]]:
+                    emit_lesson(file_report, on_example)
+            for k, chain in enumerate(chains):
+                for (i, _), file_report in zip(chain, done[k]):
+                    parts.setdefault(i, []).append(file_report)
+    else:
+        for chain in chains:
+            for i, task in chain:
+                parts.setdefault(i, []).append(validate_lesson(on_example=on_example, **opts, **task))
+    for i in sorted(parts):
+        file_report = parts[i][0] if only is None else merge_parts(files[i], datas[i], parts[i])
+        report[i] = file_report
+        if cache is not None:
+            results = example_results(file_report)
+            # a timeout says nothing about the example's result, nor about the state later examples saw
+            n = next((k for k, ex in enumerate(results) if ex['status'] == 'timeout'), len(results))
+            cache.put_lesson(keys[i][:n], results[:n])
+    return report
+
+
+def example_keys(lesson):
+    """(store key, sql key) per example of `lesson`; keys look like `<lesson>:<example>[#n]`."""
+    sql_keys = validation_cache.lesson_keys(lesson.data, version='')
+    seen = {}
+    for sql_key, (_, _, ex) in zip(sql_keys, lesson.examples):
+        name = ex.get('name', '<unnamed>')
+        n = seen[name] = seen.get(name, 0) + 1
+        yield f'{lesson.name}:{name}' + (f'#{n}' if n > 1 else ''), sql_key
+
+
+def expected_keys(lesson, file_report):
+    """(store key, sql key, example result) per example of a complete lesson report."""
+    for (key, sql_key), ex in zip(example_keys(lesson), example_results(file_report)):
+        yield key, sql_key, ex
+
+
+def check_fingerprints(lessons, report, store, update=False, volatile=()):
+    """Compare fingerprints in `report` with `store`; mismatching examples become 'mismatch'.
+
+    Examples in `volatile` (store keys, see determinism_check.volatile_keys) are counted as
+    skipped and neither compared nor recorded.
+    """
+    counts = {}
+    for les, f in zip(lessons, report):
+        for key, sql_key, ex in expected_keys(les, f):
+            if ex['status'] != 'ok' or 'fingerprint' not in ex:
+                continue
+            if key in volatile:
+                counts['skipped'] = counts.get('skipped', 0) + 1
+                continue
+            fp = ex['fingerprint']
+            verdict = store.check(key, sql_key, fp['rows'], fp['hash'], update)
+            counts[verdict] = counts.get(verdict, 0) + 1
+            if verdict == 'mismatch':
+                exp = store.entries[key]
+                ex['status'] = 'mismatch'
+                ex['error'] = f"expected {exp['rows']} rows hash {exp['hash']}, got {fp['rows']} rows hash {fp['hash']}"
+    store.save()
+    return counts
+
+
+def check_plans(lessons, report, store, update=False):
+    """Compare captured plans with `store`; returns (counts, [(key, verdict, base_version, before, after)])."""
+    counts = {}
+    changed = []
+    version = duckdb.__version__
+    for les, f in zip(lessons, report):
+        for key, sql_key, ex in expected_keys(les, f):
+            if ex['status'] != 'ok' or not ex.get('plan'):
+                continue
+            verdict, base_version, base = store.check(key, sql_key, ex['plan'], version, update)
+            counts[verdict] = counts.get(verdict, 0) + 1
+            if verdict in ('shape', 'details'):
+                changed.append((key, verdict, base_version, base, ex['plan']))
+    store.save()
+    return counts, changed
+
+
+def slow_statements(report, slow_ms):
+    """(file, section, example, statement) tuples for every statement slower than `slow_ms`."""
+    out = []
+    for f in report:
+        for s in f['sections']:
+            for ex in s['examples']:
+                for st in ex.get('statements', ()):
+                    if st['ms'] > slow_ms:
+                        out.append((f, s, ex, st))
+    out.sort(key=lambda t: t[3]['ms'], reverse=True)
+    return out
+
+
+def print_report(report, timings=False, slow_ms=None):
+    errs = 0
+    for f in report:
+        for s in f['sections']:
+            for ex in s['examples']:
+                if ex['status'] in validation_report.FAILED:
+                    errs += 1
+
+    print('Checked', len(report), 'files — errors:', errs)
+    for f in report:
+        print('\nFILE:', os.path.relpath(f['file'], ROOT), '-', f['title'])
+        for s in f['sections']:
+            line = f" SECTION: {s['title']}"
+            if timings:
+                line += f"  [{sum(ex.get('wall_ms', 0.0) for ex in s['examples']):.2f} ms]"
             print(line)
+            for ex in s['examples']:
+                status = ex['status']
+                line = f"  - {ex['name']}: {status}"
+                if timings and 'wall_ms' in ex:
+                    line += f" [{ex['wall_ms']:.2f} ms]"
+                if status in validation_report.FAILED:
+                    line += f"  ({status.upper().replace('_', ' ')}: {ex['error']})"
+                elif ex.get('sample_row') is not None:
+                    line += f"  (sample_row: {ex['sample_row']})"
+                print(line)
+                statements = ex.get('statements', ())
+                for st in statements:
+                    slow = slow_ms is not None and st['ms'] > slow_ms
+                    if (timings and len(statements) > 1) or slow:
+                        print(f"      #{st['index']} {st['ms']:9.2f} ms{'  SLOW' if slow else ''}  {one_line(st['sql'], 80)}")
+    if slow_ms is not None:
+        slow = slow_statements(report, slow_ms)
+        print(f'\nSlow statements (> {slow_ms:g} ms): {len(slow)}')
+        for f, s, ex, st in slow:
+            print(f"  {st['ms']:9.2f} ms  {os.path.basename(f['file'])}:{ex['name']} #{st['index']}  {one_line(st['sql'], 80)}")
+    return errs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate DuckDB SQL examples in examples/*.json')
+    parser.add_argument('--persistent-db', dest='dbpath', default=None, help='Path to persistent DuckDB file shared by all lessons (default: one in-memory DB per lesson)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Validate lessons in N worker processes (default: 1)')
+    parser.add_argument('--threads', type=int, default=1, help='DuckDB threads per lesson; examples not recorded as deterministic stay on 1 (default: 1)')
+    parser.add_argument('--determinism-path', default=None, metavar='PATH', help='Verdicts written by tools/determinism_check.py --write (default: examples/expected/determinism.json)')
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--no-cache', action='store_true', help='Execute every example and do not read or write the result cache')
+    cache_group.add_argument('--refresh', action='store_true', help='Ignore cached results, re-execute everything and rewrite the cache')
+    parser.add_argument('--cache-path', default=validation_cache.DEFAULT_PATH, help='Result cache file (default: .cache/validate_examples.sqlite)')
+    parser.add_argument('--fingerprint', nargs='?', const='auto', choices=['auto', 'ordered', 'unordered'], default=None, help='Hash each result (streamed as Arrow batches) and compare with examples/expected/fingerprints.json')
+    parser.add_argument('--update-expected', action='store_true', help='With --fingerprint, overwrite stored fingerprints that no longer match')
+    parser.add_argument('--expected-path', default=result_fingerprint.EXPECTED_PATH, help='Expected-results file (default: examples/expected/fingerprints.json)')
+    parser.add_argument('--plans', action='store_true', help='EXPLAIN every query example and diff its plan against examples/expected/plans.json')
+    parser.add_argument('--update-plans', action='store_true', help='With --plans, overwrite plans recorded for this DuckDB version that changed')
+    parser.add_argument('--plans-path', default=plan_store.PLANS_PATH, help='Plan store file (default: examples/expected/plans.json)')
+    parser.add_argument('--no-snapshot', action='store_true', help='Do not create or resume from setup-section snapshots')
+    parser.add_argument('--no-fixtures', action='store_true', help='Do not build the Parquet fixtures or point file_search_path at them')
+    parser.add_argument('--fixture', action='append', metavar='KEY=VALUE', help=f'Parquet fixture setting ({", ".join(parquet_fixtures.DEFAULT_SPEC)}); repeatable')
+    parser.add_argument('--seeds', choices=['parquet', 'arrow'], default=None, help='Load literal INSERT ... VALUES rows from the fixtures of tools/seed_fixtures.py (built on first use)')
+    parser.add_argument('--watch', action='store_true', help='Keep running: re-validate changed examples (and the ones after them) whenever examples/*.json change')
+    parser.add_argument('--watch-interval', type=float, default=0.5, help='Seconds between polls of examples/ in --watch mode (default: 0.5)')
+    parser.add_argument('--serve', metavar='[HOST:]PORT', default=None, help='With --watch, serve status/report/validate as JSON over HTTP (default host: 127.0.0.1)')
+    parser.add_argument('--serve-origin', metavar='ORIGIN', default=None, help='With --serve, the page origin (e.g. http://localhost:8000) allowed to call it from a browser (default: none)')
+    parser.add_argument('--profile', metavar='PATH', default=None, help='Profile every example and write a JSON report (slowest examples, costliest operators) to PATH')
+    parser.add_argument('--timings', action='store_true', help='Print per-example and per-statement latency and the cumulative time of each section')
+    parser.add_argument('--slow-ms', type=float, default=None, metavar='MS', help='Flag statements that take longer than MS milliseconds and list them at the end')
+    parser.add_argument('--profile-top', type=int, default=10, help='How many of the slowest examples to list in the profile report (default: 10)')
+    parser.add_argument('--memory', action='store_true', help='Sample DuckDB memory, database size and peak RSS around every example and list the largest consumers')
+    parser.add_argument('--memory-budget', metavar='SIZE', default=None, help="Run every lesson with memory_limit=SIZE (e.g. 256MB); examples that exceed it fail as over_budget")
+    parser.add_argument('--memory-top', type=int, default=10, help='How many examples to list with --memory (default: 10)')
+    parser.add_argument('--timeout', type=float, default=60.0, metavar='SECONDS', help='Interrupt an example after SECONDS and report it as timeout (default: 60, 0 disables)')
+    parser.add_argument('--global-timeout', type=float, default=None, metavar='SECONDS', help='Interrupt the run after SECONDS; examples not yet run are reported as timeout')
+    parser.add_argument('--shard', metavar='I/N', default=None, help='Validate only the I-th of N balanced, disjoint slices of the lessons (1-based)')
+    parser.add_argument('--shard-weights', metavar='PATH', default=None, help='Lesson weights {lesson: ms} used to balance --shard (default: example counts)')
+    parser.add_argument('--save-weights', metavar='PATH', default=None, help='Merge the measured per-lesson wall time of this run (or --merge) into PATH')
+    parser.add_argument('--report-jsonl', metavar='PATH', default=None, help='Stream one JSON record per example to PATH as results come in')
+    parser.add_argument('--junit', metavar='PATH', default=None, help='Also write the results as JUnit XML to PATH')
+    parser.add_argument('--only', action='append', metavar='LESSON:EXAMPLE', default=None, help='Run only this example (name or index) and the examples it depends on; repeatable')
+    parser.add_argument('--isolate', action='store_true', help="With --jobs, run each lesson's independent example sets as separate tasks")
+    parser.add_argument('--history-path', default=run_history.HISTORY_PATH, help='Run history database (default: .cache/run_history.duckdb)')
+    parser.add_argument('--no-history', action='store_true', help='Do not append this run to the run history')
+    parser.add_argument('--merge', nargs='+', metavar='JSONL', default=None, help='Do not validate: combine --report-jsonl files from shards and report them like one run')
+    args = parser.parse_args(argv)
+    started_at = datetime.datetime.now()
+    if args.jobs < 1 or args.threads < 1:
+        parser.error('--jobs and --threads must be >= 1')
+    if args.timeout < 0 or (args.global_timeout is not None and args.global_timeout <= 0):
+        parser.error('--timeout must be >= 0 and --global-timeout > 0')
+    if args.update_expected and not args.fingerprint:
+        parser.error('--update-expected requires --fingerprint')
+    if args.update_plans and not args.plans:
+        parser.error('--update-plans requires --plans')
+    if args.fingerprint or args.seeds == 'arrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error(f"{'--fingerprint' if args.fingerprint else '--seeds arrow'} needs pyarrow: pip install pyarrow")
+    if args.dbpath and args.jobs > 1:
+        parser.error('--persistent-db shares one database file and cannot be combined with --jobs > 1')
+    if args.serve and not args.watch:
+        parser.error('--serve requires --watch')
+    if args.serve_origin and not args.serve:
+        parser.error('--serve-origin requires --serve')
+    if args.watch and (args.dbpath or args.jobs > 1 or args.threads > 1 or args.profile or args.fingerprint or args.memory or args.memory_budget or args.plans
+                       or args.seeds):
+        parser.error('--watch cannot be combined with --persistent-db, --jobs, --threads, --profile, --fingerprint, --plans, --seeds or --memory/--memory-budget')
+    if args.memory_budget:
+        try:
+            with duckdb.connect() as con:
+                con.execute(f'SET memory_limit={sql_statements.sql_string(args.memory_budget)}')
+        except duckdb.Error as e:
+            parser.error(f'--memory-budget: {e}')
+    if args.watch and (args.shard or args.report_jsonl or args.junit or args.merge or args.save_weights):
+        parser.error('--watch cannot be combined with --shard, --report-jsonl, --junit, --merge or --save-weights')
+    # a shard's own report is part of a merged run; record the merge instead
+    args.no_history = args.no_history or bool(args.shard)
+    if args.merge and (args.shard or args.report_jsonl or args.dbpath or args.fingerprint or args.plans or args.profile or args.memory):
+        parser.error('--merge only reads shard reports; it cannot be combined with options that validate')
+    if (args.only or args.isolate) and (args.dbpath or args.watch or args.merge or args.shard or args.fingerprint or args.plans):
+        parser.error('--only and --isolate cannot be combined with --persistent-db, --watch, --merge, --shard, --fingerprint or --plans')
+    if args.isolate and args.jobs < 2:
+        parser.error('--isolate requires --jobs > 1')
+    if args.shard_weights and not args.shard:
+        parser.error('--shard-weights requires --shard')
+    try:
+        shard = validation_report.parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    if args.fixture and args.no_fixtures:
+        parser.error('--fixture cannot be combined with --no-fixtures')
+    try:
+        fixture_spec = parquet_fixtures.parse_spec(args.fixture)
+    except ValueError as e:
+        parser.error(str(e))
+
+    corpus = lesson_corpus.load(EXAMPLES_DIR)
+    for p, e in corpus.errors:
+        print('ERROR: cannot parse', p, '-', e, file=sys.stderr)
+    lessons = list(corpus)
+    if not lessons:
+        print('No JSON files found in', EXAMPLES_DIR)
+        return 1
+
+    if args.merge:
+        headers, report = validation_report.merge(lessons, args.merge)
+        shards = sorted({h['shard'] for h in headers if h.get('shard')})
+        print(f"Merged {len(args.merge)} report(s)" + (f" (shards {', '.join(shards)})" if shards else ''))
+        return finish(args, report, lessons, started_at, source='merge')
+    # the dependency graph costs a replay of every example; a run that is not restricted or
+    # sharded only needs its lesson groups once some lesson actually executes (see run())
+    if args.only or args.isolate or shard:
+        graph = example_deps.build(lessons)
+        groups = graph.lesson_groups()
+    else:
+        def groups():
+            return example_deps.build(lessons).lesson_groups()
+    only = None
+    if args.only:
+        try:
+            needed = graph.prerequisites(example_deps.resolve(graph, args.only))
+        except ValueError as e:
+            parser.error(f'--only: {e}')
+        only = {}
+        for les in lessons:
+            indices = {n[1] for n in needed if n[0] == les.name}
+            parts = [set(comp) & indices for comp in graph.components(les.name)]
+            if indices:
+                only[les.name] = [part for part in parts if part]
+        print(f'--only: {len(needed)} example(s) in {len(only)} lesson(s)', file=sys.stderr)
+    elif args.isolate:
+        only = {les.name: [set(comp) for comp in graph.components(les.name)] for les in lessons}
+    if shard:
+        weights = validation_report.load_weights(args.shard_weights) if args.shard_weights else None
+        lessons = validation_report.shard_lessons(lessons, shard[0], shard[1], weights, groups)
+        print(f'Shard {args.shard}: {len(lessons)} lesson(s)', file=sys.stderr)
+
+    pinned = None
+    if args.threads > 1:
+        import determinism_check
+        pinned = determinism_check.pinned_examples(lessons, args.determinism_path or determinism_check.STORE_PATH)
+        n_pinned = sum(len(v) for v in pinned.values())
+        print(f'--threads {args.threads}: {n_pinned} example(s) without a deterministic verdict stay on 1 thread', file=sys.stderr)
+
+    search_path = None if args.no_fixtures else parquet_fixtures.build(fixture_spec)
+    if args.watch:
+        import validation_watch
+        try:
+            address = validation_watch.parse_address(args.serve) if args.serve else None
+        except ValueError:
+            parser.error('--serve expects [HOST:]PORT')
+        return validation_watch.watch(EXAMPLES_DIR, search_path, interval=args.watch_interval, address=address, timeout=args.timeout or None,
+                                      allow_origin=args.serve_origin)
+    seeds = None
+    if args.seeds:
+        import seed_fixtures
+        seeds = seed_fixtures.load(lessons, args.seeds, search_path=search_path, timeout=args.timeout or None)
+        n_seeds = sum(len(by_stmt) for by_example in seeds.values() for by_stmt in by_example.values())
+        print(f'--seeds {args.seeds}: {n_seeds} INSERT ... VALUES statement(s) load from fixtures', file=sys.stderr)
+
+    cache = None
+    # fingerprinting re-executes everything and its Arrow-derived sample rows stay out of the cache;
+    # --only/--isolate results come from partial lessons and are never cached
+    if not args.no_cache and not args.dbpath and not args.fingerprint and only is None:
+        # cached results carry no timings, memory samples or plans, so those runs re-execute everything
+        timed = bool(args.profile) or args.timings or args.slow_ms is not None or args.memory or args.plans
+        cache = validation_cache.ResultCache(args.cache_path, refresh=args.refresh or timed)
+    streamed = [les for les in lessons if only is None or les.name in only]
+    stream = validation_report.ReportStream(args.report_jsonl, streamed, args.shard, duckdb.__version__) if args.report_jsonl else None
+    try:
+        report = run(lessons, jobs=args.jobs, dbpath=args.dbpath, cache=cache, profile=bool(args.profile), snapshots=not args.no_snapshot, fingerprint=args.fingerprint, search_path=search_path,
+                     memory=args.memory, memory_limit=args.memory_budget, timeout=args.timeout or None, global_timeout=args.global_timeout,
+                     plans=args.plans, on_example=stream.example if stream else None, groups=groups, only=only,
+                     threads=args.threads, pinned=pinned, seeds=seeds)
+    finally:
+        if cache is not None:
+            cache.close()
+    if args.fingerprint:
+        import determinism_check
+        volatile = determinism_check.volatile_keys(lessons, args.determinism_path or determinism_check.STORE_PATH)
+        counts = check_fingerprints(lessons, report, result_fingerprint.ExpectedStore(args.expected_path), args.update_expected, volatile)
+        print('Fingerprints:', ', '.join(f'{k}={v}' for k, v in sorted(counts.items())) or 'none', '->', os.path.relpath(args.expected_path, ROOT))
+    if args.plans:
+        counts, changed = check_plans(lessons, report, plan_store.PlanStore(args.plans_path), args.update_plans)
+        print(f'Plans (DuckDB {duckdb.__version__}):', ', '.join(f'{k}={v}' for k, v in sorted(counts.items())) or 'none',
+              '->', os.path.relpath(args.plans_path, ROOT))
+        for key, verdict, base_version, before, after in changed:
+            print(f'  PLAN {verdict.upper()} CHANGED: {key} (recorded with DuckDB {base_version})')
+            for ln in plan_store.diff(before, after)[2:]:
+                print('    ' + ln)
+        print()
+    if args.profile:
+        prof = validation_profile.write_report(report, args.profile, top=args.profile_top, search_path=search_path)
+        print(f"Profile written to {args.profile} — {len(prof['examples'])} examples, {prof['total_ms']:.1f} ms total")
+        for e in prof['slowest']:
+            top_op = e['operators'][0]['operator'] if e['operators'] else '-'
+            print(f"  {e['wall_ms']:9.2f} ms  {e['file']}:{e['name']}  rows={e['rows']}  top_op={top_op}")
+        scans = [(e, sc) for e in prof['examples'] for sc in e['parquet_scans']]
+        if scans:
+            print('Parquet scans:')
+        for e, sc in scans:
+            ms = e['statement_ms'][sc['statement'] - 1] if sc['statement'] <= len(e['statement_ms']) else 0.0
+            print(f"  {e['file']}:{e['name']} #{sc['statement']}  files {sc['files_read']}/{sc['files_total']} "
+                  f"(pruned {sc['files_pruned']})  row_groups={sc['row_groups_read']}  rows={sc['rows']}  {ms:.2f} ms")
+        print()
+    if args.memory:
+        fmt = validation_memory.fmt_bytes
+        print('Largest memory consumers (peak RSS growth, DuckDB memory / temp / storage after the example):')
+        for f, ex in validation_memory.top_examples(report, 'rss_peak_delta', args.memory_top):
+            m = ex['memory']
+            print(f"  {fmt(m['rss_peak_delta']):>10}  {os.path.basename(f['file'])}:{ex['name']}  duckdb={fmt(m['duckdb_bytes'])} "
+                  f"({fmt(m.get('duckdb_bytes_delta'))})  temp={fmt(m['temp_bytes'])}  storage={fmt(m['storage_bytes'])}")
+        print()
+    if stream:
+        stream.finish(report)
+    return finish(args, report, lessons, started_at, partial=only is not None)
+
+
+def finish(args, report, lessons, started_at, source='run', partial=False):
+    """Write the --junit / --save-weights / history outputs, print the report and return the exit code."""
+    if args.junit:
+        validation_report.write_junit(report, args.junit)
+    if args.save_weights:
+        validation_report.save_weights(report, args.save_weights)
+    if not args.no_history:
+        sql_keys = {(les.name, i): sql_key for les in lessons for i, (_, sql_key) in enumerate(example_keys(les))}
+        # a merge that lost shards reports their examples as missing; it is not a full run
+        partial = partial or any(ex['status'] == 'missing' for f in report for ex in example_results(f))
+        # options that slow examples down; their timings stay out of trend and regressions
+        instrumentation = [name for name, on in (('profile', args.profile), ('memory', args.memory), ('memory_budget', args.memory_budget),
+                                                 ('plans', args.plans), ('fingerprint', args.fingerprint)) if on]
+        try:
+            run_history.record(report, sql_keys, args.history_path, started_at, threads=args.threads, jobs=args.jobs,
+                               shard=args.shard, source=source, partial=partial, instrumentation=instrumentation, seeds=args.seeds)
+        except Exception as e:
+            # e.g. another run holding the history database's lock
+            print(f'WARNING: could not record the run in {args.history_path}: {e}', file=sys.stderr)
+    errs = print_report(report, timings=args.timings, slow_ms=args.slow_ms)
+    if errs:
+        return 2
+    print('\nAll examples executed without error')
+    return 0
+
 
-if errs:
-    sys.exit(2)
-print('\nAll examples executed without error')
+if __name__ == '__main__':
+    sys.exit(main())
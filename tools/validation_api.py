@@ -0,0 +1,188 @@
+"""
+Importable API over tools/validate_duckdb_examples.py, for scripts and tools/pytest_lessons.py.
+
+    import validation_api
+
+    report = validation_api.validate(jobs=4)          # the validator's run, without argparse
+    validation_api.failures(report)                   # [(lesson, index, example result)]
+
+    ws = validation_api.Workspace()
+    ws.run('duckadv', 'cs_scan_csv_people_quick')     # that example and its prerequisites only
+    ws.run('duckadv', 'category_level_stats')         # reuses the warm duckadv connection
+    ws.close()
+
+validate() takes the options of the command line as keyword arguments and returns the same
+list of file reports; it reads and writes the result cache unless cache=False.
+
+A Workspace keeps one warm connection per lesson. Running an example first runs its transitive
+prerequisites (tools/example_deps.py) that the lesson's connection has not run yet, including
+examples of other lessons that write files it reads. Examples always execute in lesson order on
+a connection: when a prerequisite comes before an example that already ran, the lesson starts
+over on a fresh connection. Results of examples that already ran are returned as they are.
+"""
+import os
+
+import example_deps
+import lesson_corpus
+import parquet_fixtures
+import validate_duckdb_examples as validator
+import validation_cache
+import validation_report
+
+EXAMPLES_DIR = validator.EXAMPLES_DIR
+FAILED = validation_report.FAILED
+
+
+def load_lessons(examples_dir=EXAMPLES_DIR):
+    """Parsed lessons in validator order; raises ValueError listing files that do not parse."""
+    corpus = lesson_corpus.load(examples_dir)
+    if corpus.errors:
+        raise ValueError('cannot parse ' + ', '.join(f'{p}: {e}' for p, e in corpus.errors))
+    return list(corpus)
+
+
+def fixture_path(fixtures=True, spec=None):
+    """file_search_path for the lessons: the Parquet fixture directory, built on first use."""
+    return parquet_fixtures.build(spec or parquet_fixtures.parse_spec(None)) if fixtures else None
+
+
+def validate(lessons=None, jobs=1, cache=True, refresh=False, cache_path=validation_cache.DEFAULT_PATH, fixtures=True, fixture_spec=None,
+             timeout=60.0, global_timeout=None, threads=1, memory_limit=None, only=None, on_example=None, seeds=None):
+    """Validate `lessons` (default: every lesson) and return the validator's report.
+
+    `only` is a list of 'lesson:example' specs, run with their prerequisites and never cached.
+    `seeds` ('parquet' or 'arrow') loads INSERT ... VALUES rows from tools/seed_fixtures.py fixtures.
+    """
+    all_lessons = load_lessons()
+    lessons = all_lessons if lessons is None else [les if isinstance(les, lesson_corpus.Lesson) else
+                                                   next(x for x in all_lessons if x.name == les) for les in lessons]
+    graph = example_deps.build(all_lessons)
+    selected = None
+    if only:
+        needed = graph.prerequisites(example_deps.resolve(graph, only))
+        selected = {}
+        for node in needed:
+            selected.setdefault(node[0], [set()])[0].add(node[1])
+        # prerequisites may come from lessons outside `lessons`
+        names = {les.name for les in lessons} | set(selected)
+        lessons = [les for les in all_lessons if les.name in names]
+    pinned = None
+    if threads > 1:
+        import determinism_check
+        pinned = determinism_check.pinned_examples(lessons)
+    search_path = fixture_path(fixtures, fixture_spec)
+    if seeds:
+        import seed_fixtures
+        seeds = seed_fixtures.load(lessons, seeds, search_path=search_path, timeout=timeout or None)
+    store = validation_cache.ResultCache(cache_path, refresh=refresh) if cache and not only else None
+    try:
+        return validator.run(lessons, jobs=jobs, cache=store, search_path=search_path, memory_limit=memory_limit,
+                             timeout=timeout or None, global_timeout=global_timeout, on_example=on_example, groups=graph.lesson_groups(),
+                             only=selected, threads=threads, pinned=pinned, seeds=seeds)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def failures(report):
+    """(lesson, index, example result) for every failed example of `report`."""
+    out = []
+    for f in report:
+        for i, ex in enumerate(validator.example_results(f)):
+            if ex['status'] in FAILED:
+                out.append((validation_report.lesson_name(f['file']), ex.get('index', i), ex))
+    return out
+
+
+class LessonSession:
+    """Warm connection of one lesson; `results` maps example indexes to their results."""
+
+    def __init__(self, lesson, search_path=None, memory_limit=None):
+        self.lesson = lesson
+        self.examples = [ex for _, _, ex in lesson.examples]
+        self.con = validator.connect(search_path=search_path, memory_limit=memory_limit)
+        self.results = {}
+
+    def run(self, index, timeout=None):
+        self.results[index] = validator.run_example(self.con, self.examples[index], timeout=timeout)
+        return self.results[index]
+
+    def close(self):
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+
+class Workspace:
+    """Warm per-lesson sessions that run examples with just their prerequisites."""
+
+    def __init__(self, lessons=None, fixtures=True, fixture_spec=None, timeout=60.0, memory_limit=None):
+        self.lessons = {les.name: les for les in (lessons or load_lessons())}
+        self.graph = example_deps.build(list(self.lessons.values()))
+        self.search_path = fixture_path(fixtures, fixture_spec)
+        self.timeout = timeout or None
+        self.memory_limit = memory_limit
+        self.sessions = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def node(self, lesson, example):
+        """Graph node of `example` (name, 'name#n' or index) in `lesson`; raises ValueError."""
+        return example_deps.resolve(self.graph, [f'{lesson}:{example}'])[0]
+
+    def session(self, lesson, fresh=False):
+        sess = self.sessions.get(lesson)
+        if sess is None or fresh:
+            if sess is not None:
+                sess.close()
+            sess = self.sessions[lesson] = LessonSession(self.lessons[lesson], self.search_path, self.memory_limit)
+        return sess
+
+    def connection(self, lesson):
+        """The warm connection of `lesson`, e.g. to inspect its state after running examples."""
+        return self.session(lesson).con
+
+    def run(self, lesson, example):
+        """Run `example` of `lesson` after whatever of its prerequisites has not run; returns its result."""
+        target = self.node(lesson, example)
+        needed = {}
+        for name, index, _ in self.graph.prerequisites([target]):
+            needed.setdefault(name, []).append(index)
+        for name, indexes in needed.items():
+            sess = self.session(name)
+            todo = [i for i in indexes if i not in sess.results]
+            if todo and sess.results and todo[0] < max(sess.results):
+                # keep lesson order: replay the prerequisites on a fresh connection
+                sess = self.session(name, fresh=True)
+                todo = indexes
+            for i in todo:
+                sess.run(i, self.timeout)
+        return self.sessions[lesson].results[target[1]]
+
+    def close(self):
+        for sess in self.sessions.values():
+            sess.close()
+        self.sessions = {}
+
+
+def example_ids(lesson):
+    """(index, id) per example of `lesson`: its name, or 'name#n' for repeated names."""
+    seen = {}
+    out = []
+    for i, (_, _, ex) in enumerate(lesson.examples):
+        name = ex.get('name', '<unnamed>')
+        n = seen[name] = seen.get(name, 0) + 1
+        out.append((i, name if n == 1 else f'{name}#{n}'))
+    return out
+
+
+def lesson_for_path(path):
+    """Lesson name of an examples/<name>.json path, or None for other files."""
+    path = os.path.abspath(str(path))
+    if os.path.dirname(path) != os.path.abspath(EXAMPLES_DIR) or not path.endswith('.json'):
+        return None
+    return validation_report.lesson_name(path)
@@ -0,0 +1,77 @@
+"""
+Content-hash result cache for tools/validate_duckdb_examples.py.
+
+Results are stored in a small SQLite file (default: .cache/validate_examples.sqlite).
+Each example is keyed by a SHA-256 over the DuckDB version, the SQL of every example
+before it in the same lesson and its own SQL, so editing one example invalidates it and
+everything after it in that lesson while the rest of the corpus is served from cache.
+
+Lessons run on isolated connections, so a lesson is either served entirely from cache or
+re-executed (later examples need the state built by earlier ones) - from its first example,
+or from the end of its setup section when a setup snapshot exists (see lesson_snapshot.py).
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+
+import duckdb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(ROOT, '.cache', 'validate_examples.sqlite')
+
+
+def lesson_keys(lesson, version=None):
+    """Return one cache key per example of a parsed lesson, in section/example order.
+
+    `version` defaults to duckdb.__version__; pass '' for keys that survive DuckDB upgrades.
+    """
+    h = hashlib.sha256((duckdb.__version__ if version is None else version).encode())
+    keys = []
+    for s in lesson.get('sections', []):
+        for ex in s.get('examples', []):
+            sql = ex.get('sql', '')
+            h.update(len(sql).to_bytes(8, 'little'))
+            h.update(sql.encode())
+            keys.append(h.hexdigest())
+    return keys
+
+
+class ResultCache:
+    def __init__(self, path=DEFAULT_PATH, refresh=False):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.refresh = refresh
+        self.con = sqlite3.connect(path)
+        self.con.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, status TEXT, error TEXT, sample_row BLOB)')
+
+    def get_many(self, keys):
+        """Return cached (status, error, sample_row) per key, None where the key is missing."""
+        if self.refresh or not keys:
+            return [None] * len(keys)
+        found = {}
+        # chunk to stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            q = 'SELECT key, status, error, sample_row FROM results WHERE key IN ({})'.format(','.join('?' * len(chunk)))
+            for key, status, error, row in self.con.execute(q, chunk):
+                found[key] = (status, error, pickle.loads(row) if row is not None else None)
+        return [found.get(k) for k in keys]
+
+    def get_lesson(self, keys):
+        """Return cached results for every key, or None if any key is missing."""
+        hits = self.get_many(keys)
+        if not keys or any(h is None for h in hits):
+            return None
+        return hits
+
+    def put_lesson(self, keys, results):
+        rows = []
+        for key, ex_r in zip(keys, results):
+            row = ex_r.get('sample_row')
+            rows.append((key, ex_r['status'], ex_r['error'], pickle.dumps(row) if row is not None else None))
+        with self.con:
+            self.con.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', rows)
+
+    def close(self):
+        self.con.close()
@@ -0,0 +1,81 @@
+"""
+Memory accounting for tools/validate_duckdb_examples.py --memory / --memory-budget.
+
+Around every example the validator samples, on the example's own connection:
+
+    duckdb_bytes   sum(memory_usage_bytes) over duckdb_memory()  (buffer manager, all tags)
+    temp_bytes     sum(temporary_storage_bytes) over duckdb_memory()  (spilled to disk)
+    storage_bytes  total_blocks * block_size of the current database (pragma_database_size)
+
+and the process's peak RSS (resource.getrusage; unavailable on Windows). The deltas between
+the samples taken before and after the example are attributed to it. Peak RSS only grows, so
+its delta shows how much an example raised the high-water mark of the validator process.
+
+--memory-budget SIZE sets `memory_limit` on every lesson connection. DuckDB then spills or
+fails inside the query instead of exhausting the runner; an example that hits the limit is
+reported with status `over_budget` and counts as a failure.
+"""
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SAMPLE_SQL = """
+SELECT
+    (SELECT coalesce(sum(memory_usage_bytes), 0) FROM duckdb_memory())::BIGINT,
+    (SELECT coalesce(sum(temporary_storage_bytes), 0) FROM duckdb_memory())::BIGINT,
+    (SELECT coalesce(sum(total_blocks * block_size), 0) FROM pragma_database_size() WHERE database_name = current_database())::BIGINT
+"""
+
+
+def rss_peak():
+    """Peak resident set size of this process in bytes (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def sample(con):
+    """Current {'duckdb_bytes', 'temp_bytes', 'storage_bytes', 'rss_peak'} for `con`'s database."""
+    try:
+        duck, temp, storage = con.execute(SAMPLE_SQL).fetchone()
+    except Exception:
+        duck = temp = storage = None
+    return {'duckdb_bytes': duck, 'temp_bytes': temp, 'storage_bytes': storage, 'rss_peak': rss_peak()}
+
+
+def delta(before, after):
+    """Per-example memory entry: the values after the example and their change since `before`."""
+    out = dict(after)
+    for k in after:
+        if after[k] is not None and before.get(k) is not None:
+            out[k + '_delta'] = after[k] - before[k]
+    return out
+
+
+def fmt_bytes(n):
+    if n is None:
+        return '-'
+    sign = '-' if n < 0 else ''
+    n = abs(n)
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if n < 1024 or unit == 'GiB':
+            return f'{sign}{n:.0f}{unit}' if unit == 'B' else f'{sign}{n:.1f}{unit}'
+        n /= 1024.0
+
+
+def top_examples(report, key, top=10):
+    """The `top` examples with the largest `key` (e.g. 'rss_peak_delta') as (file, example) pairs."""
+    rows = []
+    for f in report:
+        for s in f['sections']:
+            for ex in s['examples']:
+                v = (ex.get('memory') or {}).get(key)
+                if v:
+                    rows.append((f, ex))
+    rows.sort(key=lambda t: t[1]['memory'][key], reverse=True)
+    return rows[:top]
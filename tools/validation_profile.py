@@ -0,0 +1,167 @@
+"""
+Profiling helpers for tools/validate_duckdb_examples.py --profile.
+
+While profiling, every example runs with `PRAGMA enable_profiling='json'` writing to a
+per-connection temp file. The validator executes examples statement by statement, so the JSON
+tree DuckDB leaves behind after each statement is attached to that statement; the example's
+report entry carries the list of trees together with wall time and the rows it produced.
+write_report() turns those entries into a machine-readable summary of the slowest examples
+and the most expensive operators inside each one.
+
+Parquet scans are summarised per example as well: files read against files matched (DuckDB
+reports hive-partition pruning as "Scanning Files: read/total"), the row groups contained in
+the files read (from parquet_metadata()), and the files pruned.
+"""
+import json
+import os
+import tempfile
+
+import duckdb
+
+import sql_statements
+
+
+def enable(con):
+    """Turn on JSON profiling for `con`; returns the file DuckDB writes each query profile to."""
+    fd, path = tempfile.mkstemp(prefix='duckdb_profile_', suffix='.json')
+    os.close(fd)
+    con.execute("PRAGMA enable_profiling='json'")
+    con.execute(f'PRAGMA profiling_output={sql_statements.sql_string(path)}')
+    return path
+
+
+def read(path):
+    """Read and reset the profile written for the last query (None if DuckDB wrote none)."""
+    try:
+        with open(path) as f:
+            text = f.read()
+    except OSError:
+        return None
+    # truncate so a statement that is not profiled (e.g. DDL) cannot pick up a stale tree
+    open(path, 'w').close()
+    if not text.strip():
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def operators(profile):
+    """Flatten a profile tree into (name, timing, cardinality) dicts, most expensive first."""
+    out = []
+    stack = list(profile.get('children', [])) if profile else []
+    while stack:
+        node = stack.pop()
+        name = node.get('operator_name') or node.get('name') or node.get('operator_type')
+        out.append({
+            'operator': (name or '?').strip(),
+            'timing': node.get('operator_timing', node.get('timing', 0.0)) or 0.0,
+            'cardinality': node.get('operator_cardinality', node.get('cardinality', 0)) or 0,
+            'extra_info': node.get('extra_info'),
+        })
+        stack.extend(node.get('children', []))
+    out.sort(key=lambda o: o['timing'], reverse=True)
+    return out
+
+
+def parquet_scans(profile):
+    """READ_PARQUET operators of a profile tree as {'files', 'files_read', 'files_total', 'rows'}."""
+    out = []
+    stack = list(profile.get('children', [])) if profile else []
+    while stack:
+        node = stack.pop()
+        stack.extend(node.get('children', []))
+        info = node.get('extra_info') or {}
+        if not isinstance(info, dict) or info.get('Function') != 'READ_PARQUET':
+            continue
+        files = [f.strip() for f in str(info.get('Filename(s)', '')).split(',') if f.strip()]
+        read = int(info.get('Total Files Read', len(files)) or 0)
+        total = read
+        scanning = str(info.get('Scanning Files', ''))
+        if '/' in scanning:
+            read, total = (int(x) for x in scanning.split('/', 1))
+        out.append({
+            'files': files,
+            'files_read': read,
+            'files_total': total,
+            'rows': node.get('operator_cardinality', 0) or 0,
+        })
+    return out
+
+
+_row_groups = {}
+
+
+def count_row_groups(files, search_path=None):
+    """Total row groups in `files` (paths or globs, resolved against `search_path`); None if unreadable."""
+    key = (tuple(files), search_path)
+    if key not in _row_groups:
+        con = duckdb.connect()
+        try:
+            if search_path:
+                con.execute(f'SET file_search_path={sql_statements.sql_string(search_path)}')
+            listed = ', '.join(sql_statements.sql_string(f) for f in files)
+            _row_groups[key] = con.execute(
+                f'SELECT count(*) FROM (SELECT DISTINCT file_name, row_group_id FROM parquet_metadata([{listed}]))').fetchone()[0]
+        except Exception:
+            _row_groups[key] = None
+        finally:
+            con.close()
+    return _row_groups[key]
+
+
+def example_scans(ex, search_path=None):
+    """Parquet scan summary for every profiled statement of a report entry."""
+    scans = []
+    for n, tree in enumerate(ex.get('profile') or [], 1):
+        for scan in parquet_scans(tree):
+            scan['statement'] = n
+            scan['row_groups_read'] = count_row_groups(scan['files'], search_path) if scan['files'] else 0
+            scan['files_pruned'] = scan['files_total'] - scan['files_read']
+            scans.append(scan)
+    return scans
+
+
+def write_report(report, path, top=10, top_operators=5, search_path=None):
+    """Write the profiling summary for a validator report to `path` as JSON and return it."""
+    examples = []
+    for f in report:
+        for s in f['sections']:
+            for ex in s['examples']:
+                if 'profile' not in ex:
+                    continue
+                ops = []
+                for n, tree in enumerate(ex['profile'], 1):
+                    for op in operators(tree):
+                        ops.append(dict(op, statement=n))
+                ops.sort(key=lambda o: o['timing'], reverse=True)
+                examples.append({
+                    'file': os.path.basename(f['file']),
+                    'section': s['title'],
+                    'name': ex['name'],
+                    'status': ex['status'],
+                    'wall_ms': ex['wall_ms'],
+                    'rows': ex.get('rows'),
+                    'statement_ms': [st['ms'] for st in ex.get('statements', [])],
+                    'operators': ops[:top_operators],
+                    'parquet_scans': example_scans(ex, search_path),
+                    'profile': ex.get('profile'),
+                })
+    slowest = sorted(examples, key=lambda e: e['wall_ms'], reverse=True)[:top]
+    per_file = {}
+    for e in examples:
+        per_file[e['file']] = per_file.get(e['file'], 0.0) + e['wall_ms']
+    out = {
+        'duckdb_version': duckdb.__version__,
+        'total_ms': sum(e['wall_ms'] for e in examples),
+        'per_file_ms': dict(sorted(per_file.items(), key=lambda kv: kv[1], reverse=True)),
+        'slowest': [{k: v for k, v in e.items() if k != 'profile'} for e in slowest],
+        'examples': examples,
+    }
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    with open(path, 'w') as fh:
+        json.dump(out, fh, indent=2, default=str)
+    return out
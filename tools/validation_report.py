@@ -0,0 +1,203 @@
+"""
+Sharding, streaming reports and report merging for tools/validate_duckdb_examples.py.
+
+--shard i/n validates the i-th of n disjoint slices of the lessons. Lessons are the unit of
+work (their examples share state) and are assigned largest-first to the least-loaded shard
+(ties by name), so every node computes the same partition from the same inputs. Lesson
+weights come from --shard-weights PATH ({lesson: ms}, as written by --save-weights); lessons
+missing from it, or every lesson without it, are weighted by their number of examples. All
+shards of a run must be given the same weights file. Lessons that pass files to each other
+(see tools/example_deps.py) are kept on the same shard.
+
+--report-jsonl PATH writes one JSON record per example as soon as it completes (lessons
+validated in worker processes and cached lessons are written when their lesson is done):
+
+    {"type": "run", "shard": "1/4", "lessons": [...], "duckdb": "1.5.6"}
+    {"type": "example", "lesson": "joins", "index": 0, "section": ..., "name": ...,
+     "status": "ok", "error": null, "sample_row": [...], "wall_ms": 0.42}
+    ...
+    {"type": "end", "examples": 143, "errors": 0}
+
+Statuses changed after execution (fingerprint mismatches) are written again; the last record
+for an example wins. --junit PATH writes JUnit XML (one testsuite per lesson).
+
+--merge FILE... rebuilds the usual report from shard JSONL files against the current corpus
+and exits like a normal run; examples without a record (a lost shard) count as `missing`.
+"""
+import json
+import os
+import xml.etree.ElementTree as ET
+
+FAILED = ('error', 'mismatch', 'over_budget', 'timeout', 'missing')
+
+
+def parse_shard(text):
+    """'i/n' -> (i, n) with 1 <= i <= n; raises ValueError."""
+    i, sep, n = text.partition('/')
+    i, n = int(i), int(n)
+    if not sep or n < 1 or not 1 <= i <= n:
+        raise ValueError(f'bad shard {text!r}; expected i/n with 1 <= i <= n')
+    return i, n
+
+
+def lesson_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def shard_lessons(lessons, i, n, weights=None, groups=None):
+    """The lessons of shard i of n (1-based), in corpus order; see the module docstring.
+
+    Each of `groups` (sets of lesson names that must run together) goes to a single shard.
+    """
+    weights = weights or {}
+    known = [les for les in lessons if les.name in weights]
+    count = sum(len(les.examples) for les in known)
+    per_example = sum(weights[les.name] for les in known) / count if count else 1.0
+
+    def weight(les):
+        return weights[les.name] if les.name in weights else per_example * max(len(les.examples), 1)
+
+    units = {}
+    for les in lessons:
+        group = next((g for g in groups or () if les.name in g), {les.name})
+        units.setdefault(min(group), []).append(les)
+    loads = [0.0] * n
+    shard_of = {}
+    for name, unit in sorted(units.items(), key=lambda u: (-sum(weight(les) for les in u[1]), u[0])):
+        k = min(range(n), key=lambda s: (loads[s], s))
+        loads[k] += sum(weight(les) for les in unit)
+        for les in unit:
+            shard_of[les.name] = k
+    return [les for les in lessons if shard_of[les.name] == i - 1]
+
+
+def load_weights(path):
+    with open(path) as f:
+        return {k: float(v) for k, v in json.load(f).items()}
+
+
+def save_weights(report, path):
+    """Merge the measured wall time of every fully executed lesson in `report` into `path`."""
+    weights = load_weights(path) if os.path.exists(path) else {}
+    for f in report:
+        results = [ex for s in f['sections'] for ex in s['examples'] if ex['status'] != 'skipped']
+        if results and all('wall_ms' in ex for ex in results):
+            weights[lesson_name(f['file'])] = round(sum(ex['wall_ms'] for ex in results), 3)
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    with open(path, 'w') as out:
+        json.dump(dict(sorted(weights.items())), out, indent=2)
+        out.write('\n')
+    return weights
+
+
+class ReportStream:
+    """Line-buffered JSONL writer; `example` is the run(on_example=...) callback."""
+
+    def __init__(self, path, lessons, shard=None, duckdb_version=None):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.f = open(path, 'w', buffering=1)
+        self.sent = {}
+        self._write({'type': 'run', 'shard': shard, 'lessons': [les.name for les in lessons], 'duckdb': duckdb_version})
+
+    def _write(self, record):
+        self.f.write(json.dumps(record, default=str) + '\n')
+
+    def example(self, path, index, section, ex_r):
+        lesson = lesson_name(path)
+        self.sent[(lesson, index)] = ex_r['status']
+        record = {'type': 'example', 'lesson': lesson, 'index': index, 'section': section}
+        for k in ('name', 'status', 'error', 'sample_row', 'wall_ms'):
+            if k in ex_r:
+                record[k] = ex_r[k]
+        self._write(record)
+
+    def finish(self, report):
+        """Re-send examples whose status changed since they were streamed, then the end record."""
+        errors = examples = 0
+        for f in report:
+            index = 0
+            for s in f['sections']:
+                for ex in s['examples']:
+                    key = ex.get('index', index)
+                    if self.sent.get((lesson_name(f['file']), key)) != ex['status']:
+                        self.example(f['file'], key, s['title'], ex)
+                    examples += 1
+                    errors += ex['status'] in FAILED
+                    index += 1
+        self._write({'type': 'end', 'examples': examples, 'errors': errors})
+        self.f.close()
+
+
+def read_records(paths):
+    """(run headers, {(lesson, index): last example record}) from JSONL shard reports."""
+    headers = []
+    records = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if rec.get('type') == 'run':
+                    headers.append(rec)
+                elif rec.get('type') == 'example':
+                    records[(rec['lesson'], rec['index'])] = rec
+    return headers, records
+
+
+def merge(lessons, paths):
+    """Rebuild a validator report for `lessons` (the corpus) from shard JSONL files."""
+    headers, records = read_records(paths)
+    report = []
+    for les in lessons:
+        file_report = {'file': str(les.path), 'title': les.title, 'sections': []}
+        index = 0
+        for s in les.sections:
+            sec_r = {'title': s.get('title', '<no-title>'), 'examples': []}
+            for ex in s.get('examples', []):
+                rec = records.get((les.name, index))
+                if rec is None:
+                    ex_r = {'name': ex.get('name', '<unnamed>'), 'status': 'missing', 'error': 'no result in the shard reports', 'sample_row': None}
+                else:
+                    ex_r = {'name': rec.get('name'), 'status': rec['status'], 'error': rec.get('error'), 'sample_row': rec.get('sample_row')}
+                    if 'wall_ms' in rec:
+                        ex_r['wall_ms'] = rec['wall_ms']
+                sec_r['examples'].append(ex_r)
+                index += 1
+            file_report['sections'].append(sec_r)
+        report.append(file_report)
+    return headers, report
+
+
+def write_junit(report, path):
+    """JUnit XML: one testsuite per lesson file, one testcase per example."""
+    root = ET.Element('testsuites', name='duckdb-examples')
+    totals = {'tests': 0, 'failures': 0, 'skipped': 0, 'time': 0.0}
+    for f in report:
+        suite = ET.SubElement(root, 'testsuite', name=lesson_name(f['file']))
+        counts = {'tests': 0, 'failures': 0, 'skipped': 0, 'time': 0.0}
+        for s in f['sections']:
+            for ex in s['examples']:
+                secs = ex.get('wall_ms', 0.0) / 1000.0
+                case = ET.SubElement(suite, 'testcase', classname=lesson_name(f['file']), name=ex['name'], time=f'{secs:.4f}')
+                if ex['status'] in FAILED:
+                    ET.SubElement(case, 'failure', type=ex['status'], message=str(ex.get('error') or ex['status']))
+                    counts['failures'] += 1
+                elif ex['status'] == 'skipped':
+                    ET.SubElement(case, 'skipped')
+                    counts['skipped'] += 1
+                counts['tests'] += 1
+                counts['time'] += secs
+        for k, v in counts.items():
+            suite.set(k, f'{v:.4f}' if k == 'time' else str(v))
+            totals[k] += v
+    for k, v in totals.items():
+        root.set(k, f'{v:.4f}' if k == 'time' else str(v))
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    ET.ElementTree(root).write(path, encoding='utf-8', xml_declaration=True)
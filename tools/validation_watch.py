@@ -0,0 +1,394 @@
+"""
+Watch mode for tools/validate_duckdb_examples.py (--watch, --serve).
+
+The process stays up with the lessons parsed and one warm DuckDB connection per lesson.
+After every example the session copies the database into an attached in-memory checkpoint
+(`COPY FROM DATABASE`, ~1 ms for lesson-sized data). When a lesson file changes, the
+cumulative example keys (validation_cache.lesson_keys) locate the first changed example; the
+session switches to a fresh in-memory database restored from the checkpoint just before it
+and re-executes only that example and everything after it.
+
+Examples that leave state a checkpoint cannot carry (TEMP objects, SET/PRAGMA, ATTACH/USE,
+see lesson_snapshot.snapshot_safe) end checkpointing for the rest of the lesson; changes after
+such an example replay the lesson on a new connection.
+
+examples/*.json are polled (mtime and size) every --watch-interval seconds. With --serve, a
+small JSON-over-HTTP endpoint is exposed (127.0.0.1 only by default):
+
+    GET  /status            error/example counts per lesson
+    GET  /report            the full validator report (same shape as --profile's input)
+    GET  /report/<lesson>   one lesson's report
+    POST /validate          {"sql": ...[, "lesson": name[, "example": name]]}
+                            runs `sql` on a scratch copy of the lesson's state just before
+                            `example` (or after the whole lesson), or on an empty database
+
+POST bodies must be sent as `Content-Type: application/json` (anything else gets 415), so a
+browser has to preflight the request. No CORS header is sent unless --serve-origin names the
+page origin allowed to call the endpoint; only that exact Origin is echoed back. The posted SQL
+runs on its own connection with `enable_external_access=false` and `lock_configuration=true`,
+so it can neither read nor write files nor turn that back on.
+
+Every request must carry a Host header naming localhost, 127.0.0.1, ::1 or the address the
+server is bound to (with or without the port); anything else gets 403. A page on another site
+whose DNS name is rebound to 127.0.0.1 sends its own name as Host and is turned away.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import duckdb
+
+import lesson_corpus
+import lesson_snapshot
+import validation_cache
+import validation_report
+import validate_duckdb_examples as validator
+
+
+def locked_connection(database=':memory:'):
+    """Connection for untrusted SQL: no file, extension or network access, settings locked."""
+    con = duckdb.connect(database)
+    con.execute('PRAGMA threads=1')
+    con.execute('SET enable_external_access=false')
+    con.execute('SET lock_configuration=true')
+    return con
+
+
+def run_locked(sql, timeout=None, database=':memory:'):
+    con = locked_connection(database)
+    try:
+        return validator.run_example(con, {'name': 'scratch', 'sql': sql}, timeout=timeout)
+    finally:
+        con.close()
+
+
+class LessonSession:
+    """Warm connection for one lesson with an in-memory checkpoint after each example."""
+
+    def __init__(self, search_path=None, timeout=None):
+        self.search_path = search_path
+        self.timeout = timeout
+        self.con = None
+        self.work = None
+        self.generation = 0
+        self.keys = []
+        self.results = []
+        self.checkpoints = {}
+
+    def close(self):
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+    def _fresh_db(self, source=None):
+        """Switch to a new empty working database, optionally restored from checkpoint `source`."""
+        self.generation += 1
+        alias = f'work_{self.generation}'
+        self.con.execute(f"ATTACH ':memory:' AS {alias}")
+        if source:
+            self.con.execute(f'COPY FROM DATABASE {source} TO {alias}')
+        self.con.execute(f'USE {alias}')
+        old, self.work = self.work, alias
+        self.con.execute(f'DETACH {old or "memory"}')
+
+    def _rewind(self, k):
+        """Restore the state after example k-1; returns the index execution continues from."""
+        for i in [i for i in self.checkpoints if i >= k]:
+            self.con.execute(f'DETACH {self.checkpoints.pop(i)}')
+        base = max((i for i in self.checkpoints if i < k), default=None)
+        if base is None:
+            # nothing to restore from: start over on a new connection (drops settings too)
+            self.close()
+            self.checkpoints = {}
+            self.con = validator.connect(search_path=self.search_path)
+            self.work = None
+            return 0
+        self._fresh_db(self.checkpoints[base])
+        return base + 1
+
+    def _checkpoint(self, i):
+        alias = f'ck_{i}'
+        try:
+            self.con.execute(f"ATTACH ':memory:' AS {alias}")
+            self.con.execute(f'COPY FROM DATABASE {self.work or "memory"} TO {alias}')
+            self.checkpoints[i] = alias
+        except Exception:
+            try:
+                self.con.execute(f'DETACH DATABASE IF EXISTS {alias}')
+            except Exception:
+                pass
+
+    def update(self, lesson):
+        """Re-execute the examples of `lesson` from its first changed one; returns (first, count)."""
+        keys = validation_cache.lesson_keys(lesson.data, version='')
+        examples = [ex for _, _, ex in lesson.examples]
+        k = next((i for i, (a, b) in enumerate(zip(keys, self.keys)) if a != b), min(len(keys), len(self.keys)))
+        if self.con is not None and k == len(keys) == len(self.keys):
+            return k, 0
+        start = self._rewind(k) if self.con is not None else None
+        if start is None:
+            self.con = validator.connect(search_path=self.search_path)
+            start = 0
+        results = self.results[:start]
+        safe = all(i in self.checkpoints for i in range(start))
+        for i in range(start, len(examples)):
+            ex_r = validator.run_example(self.con, examples[i], timeout=self.timeout)
+            results.append(ex_r)
+            safe = safe and lesson_snapshot.snapshot_safe(examples[i].get('sql', ''))
+            if safe:
+                self._checkpoint(i)
+        self.keys, self.results = keys, results
+        return start, len(examples) - start
+
+    def report(self, lesson):
+        it = iter(self.results)
+        file_report = {'file': str(lesson.path), 'title': lesson.title, 'sections': []}
+        for s in lesson.sections:
+            file_report['sections'].append({
+                'title': s.get('title', '<no-title>'),
+                'examples': [next(it) for _ in s.get('examples', [])],
+            })
+        return file_report
+
+    def scratch(self, sql, before=None):
+        """Run `sql` on a throwaway copy of the state before example `before` (None: current state)."""
+        if before is None:
+            source = self.work or 'memory'
+        elif before == 0:
+            source = None
+        elif before - 1 in self.checkpoints:
+            source = self.checkpoints[before - 1]
+        else:
+            return {'name': 'scratch', 'status': 'error', 'error': 'no checkpoint before this example (an earlier example changes settings or creates TEMP objects)'}
+        if source is None:
+            return run_locked(sql, self.timeout)
+        # locking down the lesson's own connection would be permanent, so the state is handed to
+        # a separate locked connection through a temporary database file
+        tmp = tempfile.mkdtemp(prefix='validate_scratch_')
+        path = os.path.join(tmp, 'scratch.duckdb')
+        alias = f'scratch_{self.generation}'
+        try:
+            self.con.execute(f"ATTACH '{path}' AS {alias}")
+            try:
+                self.con.execute(f'COPY FROM DATABASE {source} TO {alias}')
+            finally:
+                self.con.execute(f'DETACH {alias}')
+            return run_locked(sql, self.timeout, path)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class Watcher:
+    def __init__(self, examples_dir, search_path=None, timeout=None):
+        self.examples_dir = examples_dir
+        self.search_path = search_path
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.lessons = {}
+        self.sessions = {}
+        self.stamps = {}
+        self.errors = {}
+        self.updated = {}
+
+    def scan(self):
+        """Re-validate changed lesson files; returns [(name, first, count, ms)] for lessons re-run."""
+        seen = {}
+        for fn in sorted(os.listdir(self.examples_dir)):
+            if fn.endswith('.json'):
+                st = os.stat(os.path.join(self.examples_dir, fn))
+                seen[fn[:-5]] = (st.st_mtime_ns, st.st_size)
+        changed = []
+        with self.lock:
+            for name in [n for n in self.stamps if n not in seen]:
+                self.stamps.pop(name)
+                self.lessons.pop(name, None)
+                self.errors.pop(name, None)
+                session = self.sessions.pop(name, None)
+                if session:
+                    session.close()
+            for name, stamp in seen.items():
+                if self.stamps.get(name) == stamp:
+                    continue
+                self.stamps[name] = stamp
+                path = os.path.join(self.examples_dir, name + '.json')
+                try:
+                    lesson = lesson_corpus.load_lesson(path, use_cache=False)
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    changed.append((name, None, 0, 0.0))
+                    continue
+                self.errors.pop(name, None)
+                self.lessons[name] = lesson
+                session = self.sessions.setdefault(name, LessonSession(self.search_path, self.timeout))
+                t0 = time.perf_counter()
+                first, count = session.update(lesson)
+                if count:
+                    self.updated[name] = time.time()
+                    changed.append((name, first, count, (time.perf_counter() - t0) * 1000.0))
+        return changed
+
+    def report(self, name=None):
+        with self.lock:
+            names = [name] if name else sorted(self.sessions)
+            return [self.sessions[n].report(self.lessons[n]) for n in names if n in self.sessions]
+
+    def status(self):
+        with self.lock:
+            lessons = {}
+            for name, session in sorted(self.sessions.items()):
+                lessons[name] = {
+                    'examples': len(session.results),
+                    'errors': sum(1 for r in session.results if r['status'] in validation_report.FAILED),
+                    'updated': self.updated.get(name),
+                }
+            for name, err in self.errors.items():
+                lessons.setdefault(name, {})['parse_error'] = err
+            return {'lessons': lessons, 'errors': sum(v.get('errors', 0) for v in lessons.values())}
+
+    def validate(self, sql, lesson=None, example=None):
+        with self.lock:
+            if lesson is None:
+                return run_locked(sql, self.timeout)
+            if lesson not in self.sessions:
+                raise KeyError(f'unknown lesson {lesson!r}')
+            before = None
+            if example is not None:
+                names = [ex.get('name') for _, _, ex in self.lessons[lesson].examples]
+                if example not in names:
+                    raise KeyError(f'unknown example {lesson}:{example}')
+                before = names.index(example)
+            return self.sessions[lesson].scratch(sql, before)
+
+
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+
+def make_handler(watcher, allow_origin=None):
+    """Request handler class; `allow_origin` is the one page origin granted CORS access."""
+    class Handler(BaseHTTPRequestHandler):
+        def _host_ok(self):
+            """False (after answering 403) unless the Host header names this server."""
+            host = urlparse('//' + self.headers.get('Host', '')).hostname
+            if host in LOCAL_HOSTS or host == str(self.server.server_address[0]).lower():
+                return True
+            self._send(403, {'error': 'unexpected Host header'})
+            return False
+
+        def _cors(self):
+            if allow_origin and self.headers.get('Origin') == allow_origin:
+                self.send_header('Access-Control-Allow-Origin', allow_origin)
+                self.send_header('Vary', 'Origin')
+
+        def _send(self, code, payload):
+            body = json.dumps(payload, default=str).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self._cors()
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_OPTIONS(self):
+            if not self._host_ok():
+                return
+            self.send_response(204)
+            self._cors()
+            if allow_origin and self.headers.get('Origin') == allow_origin:
+                self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.end_headers()
+
+        def do_GET(self):
+            if not self._host_ok():
+                return
+            path = urlparse(self.path).path.rstrip('/')
+            if path == '/status':
+                return self._send(200, watcher.status())
+            if path == '/report':
+                return self._send(200, watcher.report())
+            if path.startswith('/report/'):
+                rep = watcher.report(path[len('/report/'):])
+                return self._send(200, rep[0]) if rep else self._send(404, {'error': 'unknown lesson'})
+            self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if not self._host_ok():
+                return
+            if urlparse(self.path).path.rstrip('/') != '/validate':
+                return self._send(404, {'error': 'not found'})
+            # text/plain and form posts skip the CORS preflight, so only JSON is accepted
+            if self.headers.get_content_type() != 'application/json':
+                return self._send(415, {'error': 'Content-Type must be application/json'})
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                if not isinstance(req, dict):
+                    raise ValueError('the body must be a JSON object')
+                if not isinstance(req.get('sql'), str):
+                    raise ValueError('"sql" (string) is required')
+                self._send(200, watcher.validate(req['sql'], req.get('lesson'), req.get('example')))
+            except KeyError as e:
+                self._send(404, {'error': e.args[0]})
+            except ValueError as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                self._send(500, {'error': f'{type(e).__name__}: {e}'})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve(watcher, address, allow_origin=None):
+    """Start the HTTP endpoint on `address` ((host, port)) in a daemon thread; returns the server."""
+    server = ThreadingHTTPServer(address, make_handler(watcher, allow_origin))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def watch(examples_dir, search_path=None, interval=0.5, address=None, timeout=None, allow_origin=None):
+    """Validate everything once, then re-validate changed lessons until interrupted."""
+    watcher = Watcher(examples_dir, search_path, timeout)
+    t0 = time.perf_counter()
+    watcher.scan()
+    st = watcher.status()
+    print(f"Validated {len(st['lessons'])} lessons in {time.perf_counter() - t0:.1f}s — errors: {st['errors']}")
+    if address:
+        server = serve(watcher, address, allow_origin)
+        print(f'Serving on http://{server.server_address[0]}:{server.server_address[1]}/ (status, report, validate)')
+    print(f'Watching {examples_dir} (Ctrl-C to stop)')
+    try:
+        while True:
+            time.sleep(interval)
+            for name, first, count, ms in watcher.scan():
+                stamp = time.strftime('%H:%M:%S')
+                if first is None:
+                    print(f'[{stamp}] {name}.json: cannot parse — {watcher.errors.get(name)}')
+                    continue
+                rep = watcher.report(name)[0]
+                results = validator.example_results(rep)
+                errs = [r for r in results[first:] if r['status'] in validation_report.FAILED]
+                print(f'[{stamp}] {name}.json: re-ran {count} example(s) from #{first + 1} in {ms:.0f} ms — errors: {len(errs)}')
+                for r in errs:
+                    print(f"    - {r['name']}: {r['error']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for session in watcher.sessions.values():
+            session.close()
+    return 0
+
+
+def parse_address(text):
+    host, sep, port = text.rpartition(':')
+    return (host if sep and host else '127.0.0.1', int(port))
+
+
+if __name__ == '__main__':
+    sys.exit(watch(validator.EXAMPLES_DIR))